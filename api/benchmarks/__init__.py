@@ -0,0 +1 @@
+"""Local load tests and benchmarks; run modules with ``python -m benchmarks.<name>``."""
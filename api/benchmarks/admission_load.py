@@ -0,0 +1,169 @@
+"""Load test for the booking waiting room.
+
+Serves the API from a local threaded server (SQLite in a temp dir unless
+``--database-url`` is given) and sends guest bookings for one headline
+event. Each scenario runs at a baseline number of concurrent clients and
+at ``--multiplier`` times that: first straight at
+``POST /api/bookings/guest``, then through the admission queue. Booking
+latency percentiles are printed per run; with the queue the p99 should
+stay flat as traffic grows, because the database only ever sees
+``--rate`` bookers per second.
+
+    cd api && python -m benchmarks.admission_load --clients 10 --multiplier 10 --rate 40
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from werkzeug.serving import make_server
+
+from delapre import create_app
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+class Client:
+    def __init__(self, base_url, token=None):
+        self.base_url = base_url
+        self.token = token
+
+    def call(self, method, path, payload=None):
+        """Returns ``(status, body, seconds)``."""
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        request.add_header("Content-Type", "application/json")
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            status, body = exc.code, exc.read()
+        elapsed = time.perf_counter() - started
+        return status, json.loads(body or b"{}"), elapsed
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(name, latencies, statuses, seconds):
+    ok = sum(1 for status in statuses if status == 201)
+    return {
+        "scenario": name,
+        "requests": len(statuses),
+        "booked": ok,
+        "errors": len(statuses) - ok,
+        "seconds": round(seconds, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def create_event(staff, day, capacity):
+    starts_at = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=day)
+    status, body, _ = staff.call("POST", "/api/events", {
+        "title": f"Headline on-sale {day}",
+        "location": "Main Hall",
+        "starts_at": starts_at.isoformat(),
+        "ends_at": (starts_at + timedelta(hours=2)).isoformat(),
+        "capacity": capacity,
+    })
+    if status != 201:
+        raise SystemExit(f"Could not create event: {status} {body}")
+    return body["id"]
+
+
+def run_scenario(base_url, event_id, clients, bookings_per_client, queued):
+    anonymous = Client(base_url)
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def book(n):
+        payload = {"event_id": event_id, "email": f"load{event_id}-{n}@example.com", "name": "Load Test"}
+        if queued:
+            _, joined, _ = anonymous.call("POST", f"/api/events/{event_id}/queue")
+            # Client and server share a clock here, so wait out the slot
+            # instead of polling /api/queue/status
+            time.sleep(max(0.0, joined["admit_at"] - time.time()))
+            payload["queue_token"] = joined["token"]
+        status, _, elapsed = anonymous.call("POST", "/api/bookings/guest", payload)
+        with lock:
+            latencies.append(elapsed)
+            statuses.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(book, range(clients * bookings_per_client)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=10, help="Baseline concurrent clients.")
+    parser.add_argument("--multiplier", type=int, default=10, help="Peak traffic as a multiple of the baseline.")
+    parser.add_argument("--bookings-per-client", type=int, default=5)
+    parser.add_argument("--rate", type=float, default=40.0, help="Queue admissions per second.")
+    parser.add_argument("--database-url", help="Database to load (default: a throwaway SQLite file).")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or "sqlite:///" + os.path.join(tmp, "load.db")
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": database_url, "SERVER_TIMING_HEADER": False, "SLOW_QUERY_MS": None,
+            "RATE_LIMITS_ENABLED": False,
+        })
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        staff = Client(base_url)
+        _, login, _ = staff.call("POST", "/api/auth/login", {"email": STAFF_EMAIL, "password": STAFF_PASSWORD})
+        staff.token = login["token"]
+
+        results = []
+        day = 30
+        for queued in (False, True):
+            for clients in (args.clients, args.clients * args.multiplier):
+                day += 1
+                total = clients * args.bookings_per_client
+                event_id = create_event(staff, day, capacity=total)
+                if queued:
+                    staff.call("PUT", f"/api/staff/events/{event_id}/queue", {"rate_per_second": args.rate})
+                name = f"{'queue' if queued else 'direct'} x{clients // args.clients}"
+                results.append(summarize(name, *run_scenario(
+                    base_url, event_id, clients, args.bookings_per_client, queued
+                )))
+                print(
+                    "{scenario:<12} {requests:>6} req {booked:>6} booked {errors:>5} err "
+                    "{seconds:>7}s  p50 {p50_ms:>8} ms  p95 {p95_ms:>8} ms  p99 {p99_ms:>8} ms".format(**results[-1])
+                )
+        server.shutdown()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Load test for the ASGI deployment (see ``delapre/asgi.py``).
+
+Serves the API from hypercorn twice on the same database (SQLite in a
+temp dir unless ``--database-url`` is given): once as the plain WSGI app
+on a fixed pool of ``--threads`` threads, the way a threaded worker runs
+it, and once as the ASGI app, where event lists, event details and
+check-ins run on the event loop. At each ``--connections`` level that
+many keep-alive clients hold a connection open and send a mix of
+``GET /api/events`` (70%), ``GET /api/events/<id>`` (20%) and staff
+check-ins (10%) for ``--seconds``. Requests/sec, latency percentiles,
+errors (timeouts, refused or dropped connections, 5xx) and how many of
+the connections got answered at all are printed per run; the WSGI app
+stops keeping up once the connections outnumber its threads.
+
+Waiting on the network is where asyncio pays off, so point
+``--database-url`` at a MySQL server (``mysql+pymysql://...``; the async
+run uses aiomysql) for representative numbers.
+
+    pip install -r requirements-async.txt
+    cd api && python -m benchmarks.async_load --connections 50,200,800 --seconds 10 --threads 8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+class Server:
+    """hypercorn serving an ASGI app from a thread of its own."""
+
+    def __init__(self, app, threads: int):
+        self.app = app
+        self.threads = threads
+        self.port = _free_port()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+
+    async def _serve(self):
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+
+        loop = asyncio.get_running_loop()
+        # The WSGI side runs on the loop's default executor
+        loop.set_default_executor(ThreadPoolExecutor(self.threads))
+        config = Config()
+        config.bind = [f"127.0.0.1:{self.port}"]
+        config.backlog = 4096
+        config.keep_alive_timeout = 60
+        self._loop = loop
+        self._stop = asyncio.Event()
+        self._ready.set()
+        await serve(self.app, config, shutdown_trigger=self._stop.wait)
+
+    def __enter__(self):
+        self._thread.start()
+        self._ready.wait()
+        _wait_for_port(self.port)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(timeout=30)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise SystemExit(f"Server did not start on port {port}")
+
+
+class Connection:
+    """A minimal keep-alive HTTP/1.1 client over one connection."""
+
+    def __init__(self, port: int, timeout: float):
+        self.port = port
+        self.timeout = timeout
+        self._reader = self._writer = None
+
+    async def request(self, method, path, payload=None, headers=None):
+        """Returns the status code; reconnects if the connection was closed."""
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection("127.0.0.1", self.port), self.timeout
+            )
+        body = json.dumps(payload).encode() if payload is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: 127.0.0.1:{self.port}", f"Content-Length: {len(body)}"]
+        if payload is not None:
+            lines.append("Content-Type: application/json")
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        self._writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        try:
+            status, close = await asyncio.wait_for(self._read_response(), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+        if close:
+            self.close()
+        return status
+
+    async def _read_response(self):
+        head = await self._reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await self._reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            await self._reader.readexactly(int(headers.get("content-length", "0")))
+        return int(status_line.split(" ", 2)[1]), headers.get("connection", "").lower() == "close"
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+async def run_level(port, connections, seconds, timeout, event_ids, codes, staff_headers):
+    latencies, errors, answered = [], [0], set()
+    deadline = time.monotonic() + seconds
+    code_iter = itertools.cycle(codes)
+
+    async def client(n):
+        conn = Connection(port, timeout)
+        rng = random.Random(n)
+        while time.monotonic() < deadline:
+            roll = rng.random()
+            if roll < 0.7:
+                call = ("GET", "/api/events", None, None)
+            elif roll < 0.9:
+                call = ("GET", f"/api/events/{rng.choice(event_ids)}", None, None)
+            else:
+                call = ("POST", "/api/staff/checkin", {"confirmation_code": next(code_iter)}, staff_headers)
+            started = time.perf_counter()
+            try:
+                status = await conn.request(*call)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                errors[0] += 1
+                await asyncio.sleep(0.05)
+                continue
+            if status >= 500:
+                errors[0] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            answered.add(n)
+        conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(connections)))
+    elapsed = time.perf_counter() - started
+    return {
+        "connections": connections,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "errors": errors[0],
+        "answered": len(answered),
+        "p50_ms": round((percentile(latencies, 0.50) or 0) * 1000, 1),
+        "p99_ms": round((percentile(latencies, 0.99) or 0) * 1000, 1),
+    }
+
+
+def seed(flask_app, events: int, users: int):
+    """Events and bookings through the API; returns ``(event_ids, codes, staff_headers)``."""
+    client = flask_app.test_client()
+    login = client.post("/api/auth/login", json={"email": STAFF_EMAIL, "password": STAFF_PASSWORD})
+    staff_headers = {"Authorization": f"Bearer {login.get_json()['token']}"}
+    event_ids = []
+    for day in range(1, events + 1):
+        starts_at = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=day)
+        response = client.post("/api/events", headers=staff_headers, json={
+            "title": f"Async load {day}",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=2)).isoformat(),
+            "capacity": users + 10,
+        })
+        if response.status_code != 201:
+            raise SystemExit(f"Could not create event: {response.status_code} {response.get_data(as_text=True)}")
+        event_ids.append(response.get_json()["id"])
+    codes = []
+    for n in range(users):
+        token = client.post("/api/auth/register", json={
+            "email": f"asyncload{n}@example.com", "password": "pw", "first_name": "Load", "last_name": str(n),
+        }).get_json()["token"]
+        for event_id in event_ids:
+            booking = client.post(
+                "/api/bookings", json={"event_id": event_id}, headers={"Authorization": f"Bearer {token}"}
+            ).get_json()
+            codes.append(booking["confirmation_code"])
+    return event_ids, codes, staff_headers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--connections", default="50,200,800", help="Comma-separated concurrent connection counts.")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration of each run.")
+    parser.add_argument("--threads", type=int, default=8, help="Threads for the WSGI app (and the ASGI fallback).")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds before a request counts as failed.")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10, help="Users booking every event (check-in codes).")
+    parser.add_argument("--database-url", help="Database to load (default: a throwaway SQLite file).")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    from hypercorn.middleware import AsyncioWSGIMiddleware
+
+    from delapre.asgi import create_asgi_app
+
+    levels = [int(value) for value in args.connections.split(",") if value.strip()]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or "sqlite:///" + os.path.join(tmp, "load.db")
+        asgi_app = create_asgi_app({
+            "SQLALCHEMY_DATABASE_URI": database_url, "SERVER_TIMING_HEADER": False, "SLOW_QUERY_MS": None,
+            "RATE_LIMITS_ENABLED": False, "COMPRESSION_ENABLED": False,
+        })
+        logging.getLogger("hypercorn.error").setLevel(logging.WARNING)
+        event_ids, codes, staff_headers = seed(asgi_app.flask_app, args.events, args.users)
+
+        for mode, app in (("wsgi", AsyncioWSGIMiddleware(asgi_app.flask_app)), ("asgi", asgi_app)):
+            with Server(app, args.threads) as server:
+                for connections in levels:
+                    result = asyncio.run(run_level(
+                        server.port, connections, args.seconds, args.timeout, event_ids, codes, staff_headers
+                    ))
+                    results.append({"mode": mode, **result})
+                    print(
+                        "{mode:<5} {connections:>6} conn {requests:>7} req {rps:>8} req/s {errors:>6} err "
+                        "{answered:>6} answered  p50 {p50_ms:>8} ms  p99 {p99_ms:>8} ms".format(**results[-1])
+                    )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
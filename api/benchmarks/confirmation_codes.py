@@ -0,0 +1,81 @@
+"""Confirmation code generation throughput.
+
+Measures codes per second for the old ``uuid4().hex[:8]`` codes, for
+encoding alone (the keyed permutation plus check character) and for
+:func:`delapre.confirmation_codes.new_confirmation_code` end to end,
+including the block claims, with a commit every ``--per-commit`` codes
+the way bookings commit. Every code generated is checked for duplicates.
+
+    cd api && python -m benchmarks.confirmation_codes --count 200000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from delapre import create_app
+from delapre.confirmation_codes import CodeAllocator, new_confirmation_code
+from delapre.extensions import db
+
+
+def timed(name, count, generate):
+    started = time.perf_counter()
+    codes = generate()
+    seconds = time.perf_counter() - started
+    return {
+        "scenario": name,
+        "codes": count,
+        "unique": len(set(codes)),
+        "seconds": round(seconds, 3),
+        "codes_per_second": round(count / seconds),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--per-commit", type=int, default=1, help="Codes per transaction in the allocator run.")
+    parser.add_argument("--database-url", help="Database for the allocator run (default: a throwaway SQLite file).")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+    count = args.count
+
+    results = [
+        timed("uuid4 hex", count, lambda: [uuid.uuid4().hex[:8].upper() for _ in range(count)]),
+    ]
+    codes = CodeAllocator("benchmark")
+    results.append(timed("encode", count, lambda: [codes.encode(n) for n in range(count)]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or "sqlite:///" + os.path.join(tmp, "codes.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": database_url, "SLOW_QUERY_MS": None})
+
+        def allocate():
+            issued = []
+            with app.app_context():
+                for n in range(count):
+                    issued.append(new_confirmation_code())
+                    if (n + 1) % args.per_commit == 0:
+                        db.session.commit()
+                db.session.commit()
+            return issued
+
+        results.append(timed(f"allocator, {args.per_commit}/commit", count, allocate))
+
+    for result in results:
+        print(
+            "{scenario:<22} {codes:>8} codes {unique:>8} unique {seconds:>8}s "
+            "{codes_per_second:>10} codes/s".format(**result)
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Synthetic data for benchmarks.
+
+Seeds users, locations, categories and weekly recurring series, half in
+the past and half still to come, then books them up with a mix of
+account and guest bookings (some with named guests, past ones mostly
+checked in). The same arguments and ``--seed`` always give the same
+rows, so results from different commits can be compared.
+
+Rows are bulk inserted with explicit ids, which needs a database with
+no events in it yet: a new SQLite file or an empty local MySQL schema.
+
+    cd api && python -m benchmarks.dataset --database-url sqlite:////tmp/bench.db --bookings 200000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from werkzeug.security import generate_password_hash
+
+from delapre import create_app
+from delapre.confirmation_codes import BLOCK_SIZE, allocator
+from delapre.extensions import db
+from delapre.models import (
+    Booking,
+    BookingGuest,
+    Category,
+    ConfirmationCodeBlock,
+    Event,
+    Location,
+    User,
+)
+
+PASSWORD = "benchmark-password"
+CHUNK_SIZE = 5000
+CAPACITIES = (20, 40, 60, 100, 200)
+GUEST_COUNTS = (1, 1, 1, 2, 2, 3, 4)
+TICKET_TYPES = ("Adult", "Adult", "Child", "Concession")
+
+DEFAULTS = {
+    "users": 20000,
+    "locations": 20,
+    "categories": 8,
+    "series": 200,
+    "weeks": 26,
+    "bookings": 200000,
+    "seed": 1,
+}
+
+
+def _next_id(model) -> int:
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def seed(users, locations, categories, series, weeks, bookings, seed=1, now=None) -> dict:
+    """Insert the dataset in the current app context; returns row counts."""
+    if db.session.scalar(select(func.count(Event.id))):
+        raise RuntimeError("The database already has events; seed an empty one")
+    rng = random.Random(seed)
+    now = now or datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    # One cheap hash for everyone; seeding is not a password benchmark
+    password_hash = generate_password_hash(PASSWORD, "pbkdf2:sha256:1")
+
+    first_user = _next_id(User)
+    user_ids = list(range(first_user, first_user + users))
+    _insert(User, [
+        {
+            "id": user_id,
+            "email": f"bench{user_id}@example.com",
+            "password_hash": password_hash,
+            "first_name": "Bench",
+            "last_name": str(user_id),
+            "email_opt_in": rng.random() < 0.8,
+            "sms_opt_in": False,
+            "is_staff": False,
+        }
+        for user_id in user_ids
+    ])
+
+    first_location = _next_id(Location)
+    location_ids = list(range(first_location, first_location + locations))
+    _insert(Location, [{"id": i, "name": f"Bench location {i}"} for i in location_ids])
+    first_category = _next_id(Category)
+    category_ids = list(range(first_category, first_category + categories))
+    _insert(Category, [{"id": i, "name": f"bench-{i}"} for i in category_ids])
+
+    events = []
+    event_id = _next_id(Event)
+    first_week = now - timedelta(weeks=weeks // 2)
+    for n in range(series):
+        starts_at = first_week.replace(hour=rng.randrange(9, 18)) + timedelta(days=rng.randrange(7))
+        capacity = rng.choice(CAPACITIES)
+        price = rng.choice((0, 0, 5, 12.5, 20))
+        group_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        for week in range(weeks):
+            event_starts = starts_at + timedelta(weeks=week)
+            events.append({
+                "id": event_id,
+                "title": f"Bench series {n} week {week}",
+                "description": "A synthetic event for benchmarks. " * rng.randrange(1, 8),
+                "starts_at": event_starts,
+                "ends_at": event_starts + timedelta(hours=rng.choice((1, 2, 3))),
+                "location_id": rng.choice(location_ids),
+                "category_id": rng.choice(category_ids),
+                "is_free": price == 0,
+                "price": price,
+                "capacity": capacity,
+                "group_id": group_id,
+                "recurrence_type": "weekly",
+            })
+            event_id += 1
+    _insert(Event, events)
+
+    # Spread the bookings over events in proportion to capacity, leaving
+    # each event room for the booking benchmarks
+    total_capacity = sum(event["capacity"] for event in events) or 1
+    codes = allocator()
+    first_block = _next_id(ConfirmationCodeBlock)
+    sequence = first_block * BLOCK_SIZE
+    booking_id = _next_id(Booking)
+    booking_rows, guest_rows = [], []
+    for event in events:
+        wanted = round(bookings * event["capacity"] / total_capacity)
+        past = event["starts_at"] < now
+        seats = 0
+        for user_id in rng.sample(user_ids, min(wanted, len(user_ids))):
+            guest_count = rng.choice(GUEST_COUNTS)
+            if seats + guest_count > event["capacity"] * 0.9:
+                break
+            seats += guest_count
+            cancelled = rng.random() < 0.05
+            checked_in = past and not cancelled and rng.random() < 0.85
+            booked_at = min(now, event["starts_at"]) - timedelta(minutes=rng.randrange(60, 60 * 24 * 60))
+            guest = rng.random() < 0.1
+            booking_rows.append({
+                "id": booking_id,
+                "user_id": None if guest else user_id,
+                "event_id": event["id"],
+                "status": "cancelled" if cancelled else "confirmed",
+                "guest_count": guest_count,
+                "guest_email": f"guest{booking_id}@example.com" if guest else None,
+                "guest_name": f"Guest {booking_id}" if guest else None,
+                "confirmation_code": codes.encode(sequence),
+                "booked_at": booked_at,
+                "cancelled_at": booked_at + timedelta(days=1) if cancelled else None,
+                "checked_in": checked_in,
+                "checked_in_at": event["starts_at"] if checked_in else None,
+            })
+            if guest_count > 1 and rng.random() < 0.5:
+                guest_rows.extend(
+                    {
+                        "booking_id": booking_id,
+                        "position": position,
+                        "name": f"Guest {booking_id}-{position}",
+                        "ticket_type": rng.choice(TICKET_TYPES),
+                    }
+                    for position in range(guest_count)
+                )
+            booking_id += 1
+            sequence += 1
+    # Claim the code blocks used above so the app allocates after them
+    blocks = -(-(sequence - first_block * BLOCK_SIZE) // BLOCK_SIZE)
+    _insert(ConfirmationCodeBlock, [
+        {"id": block_id, "created_at": now} for block_id in range(first_block, first_block + blocks)
+    ])
+    _insert(Booking, booking_rows)
+    _insert(BookingGuest, guest_rows)
+    db.session.commit()
+    return {
+        "users": len(user_ids),
+        "locations": len(location_ids),
+        "categories": len(category_ids),
+        "events": len(events),
+        "bookings": len(booking_rows),
+        "booking_guests": len(guest_rows),
+    }
+
+
+def add_arguments(parser):
+    for name, default in DEFAULTS.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+
+
+def dataset_options(args) -> dict:
+    return {name: getattr(args, name) for name in DEFAULTS}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", required=True)
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url, "SLOW_QUERY_MS": None})
+    started = time.perf_counter()
+    with app.app_context():
+        rows = seed(**dataset_options(args))
+    print(json.dumps({"rows": rows, "seconds": round(time.perf_counter() - started, 1)}, indent=2))
+    return rows
+
+
+if __name__ == "__main__":
+    main()
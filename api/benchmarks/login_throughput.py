@@ -0,0 +1,130 @@
+"""Login throughput.
+
+Serves the API from a local threaded server (SQLite in a temp dir) with
+``--users`` accounts and sends ``--logins`` sign-ins from ``--clients``
+concurrent clients, once per ``--workers`` setting of
+``PASSWORD_HASH_WORKERS``. Prints logins/sec, latency percentiles and
+how many were turned away with 503. A last run sends wrong passwords
+for one account to show how fast throttled attempts are rejected.
+
+    cd api && python -m benchmarks.login_throughput --clients 16 --logins 400 --workers 1,2,4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.models import User
+
+from .admission_load import Client, percentile
+
+PASSWORD = "benchmark-password"
+
+
+def serve(database_url, method, workers, users):
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "SERVER_TIMING_HEADER": False,
+        "SLOW_QUERY_MS": None,
+        "RATE_LIMITS_ENABLED": False,
+        "PASSWORD_HASH_METHOD": method,
+        "PASSWORD_HASH_WORKERS": workers,
+    })
+    with app.app_context():
+        if not User.query.filter(User.email.like("login%@example.com")).first():
+            password_hash = generate_password_hash(PASSWORD, method)
+            db.session.add_all(
+                User(email=f"login{n}@example.com", password_hash=password_hash, first_name="Load", last_name=str(n))
+                for n in range(users)
+            )
+            db.session.commit()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def run_logins(base_url, clients, logins, users, password=PASSWORD):
+    client = Client(base_url)
+    latencies, statuses = [], []
+    lock = threading.Lock()
+
+    def login(n):
+        status, _, elapsed = client.call(
+            "POST", "/api/auth/login", {"email": f"login{n % users}@example.com", "password": password}
+        )
+        with lock:
+            latencies.append(elapsed)
+            statuses.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(login, range(logins)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def summarize(name, latencies, statuses, seconds):
+    counts = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    return {
+        "scenario": name,
+        "requests": len(statuses),
+        "statuses": {str(status): count for status, count in sorted(counts.items())},
+        "seconds": round(seconds, 2),
+        "per_second": round(len(statuses) / seconds, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated PASSWORD_HASH_WORKERS values.")
+    parser.add_argument("--method", default="scrypt:32768:8:1", help="PASSWORD_HASH_METHOD.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = "sqlite:///" + os.path.join(tmp, "logins.db")
+        for workers in [int(value) for value in args.workers.split(",")]:
+            server, base_url = serve(database_url, args.method, workers, args.users)
+            results.append(summarize(
+                f"{workers} hash worker(s)", *run_logins(base_url, args.clients, args.logins, args.users)
+            ))
+            server.shutdown()
+        # Everyone guessing at one account: only the first few attempts hash
+        server, base_url = serve(database_url, args.method, 1, args.users)
+        results.append(summarize(
+            "wrong password", *run_logins(base_url, args.clients, args.logins, 1, password="wrong")
+        ))
+        server.shutdown()
+
+    for result in results:
+        print(
+            "{scenario:<20} {requests:>6} req {per_second:>8}/s  p50 {p50_ms:>8} ms  p99 {p99_ms:>8} ms  "
+            "{statuses}".format(**result)
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
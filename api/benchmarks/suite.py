@@ -0,0 +1,265 @@
+"""Benchmarks for the hot paths against a seeded dataset.
+
+Seeds :mod:`benchmarks.dataset` into a throwaway SQLite file (or
+``--database-url``, e.g. an empty local MySQL schema; ``--reuse`` runs
+against one seeded earlier) and times these through the app in-process,
+``--clients`` at a time:
+
+- ``list_events``: ``GET /api/events``
+- ``list_upcoming_events``: ``GET /api/staff/events/upcoming``
+- ``attendance_csv``: ``GET /api/staff/events/<id>/attendance`` for the
+  busiest events (needs the PDF/QR dependencies, skipped without them)
+- ``create_booking``: ``POST /api/bookings`` by fresh accounts
+- ``staff_checkin``: ``POST /api/staff/checkin`` for upcoming bookings
+
+Each scenario reports requests/sec, latency percentiles and database
+queries per request (from the ``Server-Timing`` header). ``--json``
+saves the results; ``--compare`` checks them against a saved run and
+exits with status 1 if any scenario makes more queries or its p95 got
+slower by more than ``--tolerance``.
+
+    cd api && python -m benchmarks.suite --json bench.json
+    cd api && python -m benchmarks.suite --compare bench.json --tolerance 0.25
+"""
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import sqlalchemy
+from sqlalchemy import func, select
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.models import Booking, Event, User
+from delapre.security import token_for_user
+
+from . import dataset
+from .admission_load import STAFF_EMAIL, percentile
+
+SERVER_TIMING = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def measure(app, name, requests, clients, warmup=False):
+    """Send ``(method, path, json, headers)`` requests and summarize them."""
+    local = threading.local()
+    latencies, statuses, queries = [], [], []
+    lock = threading.Lock()
+
+    def send(spec):
+        method, path, payload, headers = spec
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        started = time.perf_counter()
+        response = local.client.open(path, method=method, json=payload, headers=headers)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        match = SERVER_TIMING.search(response.headers.get("Server-Timing", ""))
+        return elapsed, response.status_code, int(match.group(1)) if match else None
+
+    def record(spec):
+        elapsed, status, count = send(spec)
+        with lock:
+            latencies.append(elapsed)
+            statuses.append(status)
+            if count is not None:
+                queries.append(count)
+
+    if warmup and requests:
+        send(requests[0])
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(record, requests))
+    seconds = time.perf_counter() - started
+    counts = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    return {
+        "scenario": name,
+        "requests": len(statuses),
+        "statuses": {str(status): count for status, count in sorted(counts.items())},
+        "seconds": round(seconds, 3),
+        "per_second": round(len(statuses) / seconds, 1) if seconds else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "queries_mean": round(sum(queries) / len(queries), 1) if queries else None,
+        "queries_max": max(queries) if queries else None,
+    }
+
+
+def bearer(user):
+    return {"Authorization": f"Bearer {token_for_user(user)}"}
+
+
+def booking_requests(count, now):
+    """``POST /api/bookings`` by new accounts, spread over upcoming events."""
+    first = (db.session.scalar(select(func.max(User.id))) or 0) + 1
+    accounts = [
+        User(id=first + n, email=f"suite{first + n}@example.com", password_hash="-", first_name="Suite", last_name=str(n))
+        for n in range(count)
+    ]
+    db.session.add_all(accounts)
+    db.session.commit()
+    event_ids = db.session.scalars(
+        select(Event.id).where(Event.starts_at >= now).order_by(Event.capacity.desc(), Event.id).limit(50)
+    ).all()
+    return [
+        ("POST", "/api/bookings", {"event_id": event_ids[n % len(event_ids)]}, bearer(user))
+        for n, user in enumerate(accounts)
+    ]
+
+
+def checkin_requests(count, now, headers):
+    codes = db.session.scalars(
+        select(Booking.confirmation_code)
+        .join(Event)
+        .where(Event.starts_at >= now, Booking.status == "confirmed", Booking.checked_in.is_(False))
+        .order_by(Booking.id)
+        .limit(count)
+    ).all()
+    return [("POST", "/api/staff/checkin", {"confirmation_code": code}, headers) for code in codes]
+
+
+def busiest_events(count):
+    return db.session.scalars(
+        select(Booking.event_id)
+        .group_by(Booking.event_id)
+        .order_by(func.count(Booking.id).desc(), Booking.event_id)
+        .limit(count)
+    ).all()
+
+
+def run(app, args):
+    now = datetime.utcnow()
+    with app.app_context():
+        staff = User.query.filter_by(email=STAFF_EMAIL).one()
+        headers = bearer(staff)
+        attendance = [
+            ("GET", f"/api/staff/events/{event_id}/attendance", None, headers)
+            for event_id in busiest_events(args.reads)
+        ]
+        bookings = booking_requests(args.writes, now)
+        checkins = checkin_requests(args.writes, now, headers)
+
+    scenarios = [
+        ("list_events", [("GET", "/api/events", None, None)] * args.reads, True),
+        ("list_upcoming_events", [("GET", "/api/staff/events/upcoming", None, headers)] * args.reads, True),
+        ("attendance_csv", attendance, True),
+        ("create_booking", bookings, False),
+        ("staff_checkin", checkins, False),
+    ]
+    results = []
+    for name, requests, warmup in scenarios:
+        if name == "attendance_csv" and importlib.util.find_spec("fpdf") is None:
+            results.append({"scenario": name, "skipped": "fpdf/qrcode are not installed"})
+        else:
+            results.append(measure(app, name, requests, args.clients, warmup=warmup))
+    return results
+
+
+def environment(app):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "dialect": dialect,
+    }
+
+
+def compare(baseline, results, tolerance):
+    """Print the change from ``baseline`` per scenario; returns the regressions."""
+    before = {r["scenario"]: r for r in baseline["scenarios"] if "skipped" not in r}
+    regressions = []
+    for result in results:
+        old = before.get(result["scenario"])
+        if old is None or "skipped" in result:
+            continue
+        print(
+            "{:<22} p95 {:>8} -> {:>8} ms  {:>8} -> {:>8}/s  queries {} -> {}".format(
+                result["scenario"], old["p95_ms"], result["p95_ms"],
+                old["per_second"], result["per_second"], old["queries_max"], result["queries_max"],
+            )
+        )
+        if (result["queries_max"] or 0) > (old["queries_max"] or 0):
+            regressions.append(f"{result['scenario']}: queries {old['queries_max']} -> {result['queries_max']}")
+        if result["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{result['scenario']}: p95 {old['p95_ms']} -> {result['p95_ms']} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", help="Database to seed (default: a throwaway SQLite file).")
+    parser.add_argument("--reuse", action="store_true", help="Use the data already in --database-url.")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--reads", type=int, default=20, help="Requests per read scenario.")
+    parser.add_argument("--writes", type=int, default=500, help="Requests per write scenario.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    parser.add_argument("--compare", help="Results file from an earlier run to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 slowdown for --compare.")
+    dataset.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or "sqlite:///" + os.path.join(tmp, "suite.db")
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": database_url,
+            "SLOW_QUERY_MS": None,
+            "RATE_LIMITS_ENABLED": False,
+        })
+        options = dataset.dataset_options(args)
+        seeded = {"options": options}
+        if not args.reuse:
+            started = time.perf_counter()
+            with app.app_context():
+                seeded["rows"] = dataset.seed(**options)
+            seeded["seconds"] = round(time.perf_counter() - started, 1)
+            print(f"Seeded {seeded['rows']} in {seeded['seconds']}s")
+        results = run(app, args)
+        report = {"dataset": seeded, "environment": environment(app), "scenarios": results}
+
+    for result in results:
+        if "skipped" in result:
+            print("{scenario:<22} skipped: {skipped}".format(**result))
+            continue
+        print(
+            "{scenario:<22} {requests:>5} req {per_second:>8}/s  p50 {p50_ms:>8} ms  p95 {p95_ms:>8} ms  "
+            "p99 {p99_ms:>8} ms  queries {queries_mean}/{queries_max}  {statuses}".format(**result)
+        )
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+    return report
+
+
+if __name__ == "__main__":
+    main()
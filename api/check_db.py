@@ -1,4 +1,5 @@
-from app import app, db, Booking
+from app import app
+from delapre.extensions import db
 from sqlalchemy import text
 
 with app.app_context():
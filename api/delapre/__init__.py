@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from .config import Config
+
+
+def create_app(config=None) -> Flask:
+    """Build the API application.
+
+    ``config`` may be a mapping or an object/class with upper-case
+    attributes; it is applied on top of :class:`Config`.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    if app.config["TRUSTED_PROXY_COUNT"]:
+        proxies = app.config["TRUSTED_PROXY_COUNT"]
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
+    from .compression import init_compression
+    from .extensions import cors, db
+    from .instrumentation import init_instrumentation
+    from .jsonprovider import configure_json
+    from .ratelimit import init_rate_limits
+    from .replicas import LAST_WRITE_HEADER, configure_replica_binds, init_replicas
+
+    configure_json(app)
+    init_compression(app)
+    configure_replica_binds(app.config)
+    db.init_app(app)
+    init_replicas(app)
+    init_instrumentation(app)
+    init_rate_limits(app)
+    cors.init_app(
+        app,
+        resources={r"/api/*": {"origins": app.config["CORS_ORIGINS"]}},
+        supports_credentials=True,
+        expose_headers=[LAST_WRITE_HEADER],
+    )
+
+    from .blueprints import register_blueprints
+    from .cli import register_commands
+
+    register_blueprints(app, app.config["BLUEPRINTS"])
+    register_commands(app)
+
+    if app.config["PREPARE_DATABASE"]:
+        from .schema import prepare_database
+
+        with app.app_context():
+            prepare_database()
+
+    return app
@@ -0,0 +1,220 @@
+"""Optional per-event waiting rooms for high-demand on-sales.
+
+Staff give an event an admission rate (clients per second). Clients
+join the queue and get a signed queue token with their position and the
+time they will be admitted. The scheduler runs in process: each worker
+spaces admission times ``ADMISSION_WORKERS / rate`` seconds apart, so
+joining never touches the database. Holds and bookings for a queued
+event require an admitted token, which is checked from its signature
+alone, so clients that are still waiting are turned away before any
+capacity query or row lock.
+
+A token belongs to whoever joined the queue (the signed-in user, else the
+client address) and buys one booking: its ``jti`` is recorded in
+``admission_token_uses`` in the same transaction as the booking, so a
+token passed on to someone else or replayed after booking is refused.
+Holds only check the token, since the booking that follows spends it.
+
+Which events have a queue is read from ``admission_queues`` at most once
+per ``ADMISSION_CONFIG_TTL`` seconds per worker.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import jwt
+from flask import current_app, request
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import AdmissionQueue, AdmissionTokenUse, Event
+from .replicas import request_identity
+from .reservations import BookingError
+
+TOKEN_AUDIENCE = "admission"
+
+
+class AdmissionError(BookingError):
+    def __init__(self, message: str, status: int = 400, retry_after: int | None = None):
+        super().__init__(message, status)
+        self.retry_after = retry_after
+
+
+class AdmissionScheduler:
+    """Queue settings and admission slots for this process."""
+
+    def __init__(self, ttl: float, workers: int = 1):
+        self.ttl = ttl
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._rates = {}
+        self._loaded_at = None
+        # event_id -> (next admission time, clients issued)
+        self._slots = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def rates(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded_at is not None and now - self._loaded_at < self.ttl:
+                return self._rates
+        rates = dict(db.session.query(AdmissionQueue.event_id, AdmissionQueue.rate_per_second))
+        with self._lock:
+            self._rates, self._loaded_at = rates, now
+            for event_id in set(self._slots) - set(rates):
+                del self._slots[event_id]
+        return rates
+
+    def next_slot(self, event_id: int):
+        """Return ``(position, admit_at)`` for a new client, or ``None``."""
+        rate = self.rates().get(event_id)
+        if rate is None:
+            return None
+        now = time.time()
+        with self._lock:
+            admit_at, issued = self._slots.get(event_id, (now, 0))
+            admit_at = max(now, admit_at)
+            self._slots[event_id] = (admit_at + self.workers / rate, issued + 1)
+        return issued + 1, admit_at
+
+
+def scheduler() -> AdmissionScheduler:
+    extensions = current_app.extensions
+    if "admission" not in extensions:
+        extensions["admission"] = AdmissionScheduler(
+            current_app.config["ADMISSION_CONFIG_TTL"], current_app.config["ADMISSION_WORKERS"]
+        )
+    return extensions["admission"]
+
+
+def join_queue(event_id: int) -> dict:
+    slot = scheduler().next_slot(event_id)
+    if slot is None:
+        raise AdmissionError("This event has no waiting room", 404)
+    position, admit_at = slot
+    claims = {
+        "aud": TOKEN_AUDIENCE,
+        "jti": str(uuid.uuid4()),
+        "sub": request_identity(),
+        "event_id": event_id,
+        "position": position,
+        "admit_at": admit_at,
+        "exp": int(admit_at) + current_app.config["ADMISSION_WINDOW_SECONDS"],
+    }
+    return queue_status(jwt.encode(claims, current_app.config["JWT_SECRET"], algorithm="HS256"))
+
+
+def _decode(token: str) -> dict:
+    try:
+        return jwt.decode(
+            token, current_app.config["JWT_SECRET"], algorithms=["HS256"], audience=TOKEN_AUDIENCE
+        )
+    except jwt.ExpiredSignatureError:
+        raise AdmissionError("Your place in the queue has expired, please join again", 428)
+    except jwt.InvalidTokenError:
+        raise AdmissionError("Invalid queue token")
+
+
+def queue_status(token: str) -> dict:
+    claims = _decode(token)
+    wait = max(0.0, claims["admit_at"] - time.time())
+    return {
+        "token": token,
+        "event_id": claims["event_id"],
+        "position": claims["position"],
+        "admit_at": claims["admit_at"],
+        "admitted": wait == 0,
+        "wait_seconds": math.ceil(wait),
+    }
+
+
+def check_admission(items, consume: bool = False):
+    """Raise :class:`AdmissionError` unless every queued event in ``items``
+    carries an admitted ``queue_token`` issued to this caller. Items that
+    failed parsing are skipped.
+
+    ``consume`` records the tokens as used in the current transaction, so
+    they are spent when the booking commits and free again if it rolls back.
+    """
+    rates = scheduler().rates()
+    if not rates:
+        return
+    identities = {request_identity(), f"ip:{request.remote_addr}"}
+    uses = {}
+    for item in items:
+        if not isinstance(item, dict) or item["event_id"] not in rates:
+            continue
+        if not item.get("queue_token"):
+            raise AdmissionError("This event has a waiting room, please join the queue first", 428)
+        claims = _decode(item["queue_token"])
+        if claims["event_id"] != item["event_id"] or claims.get("sub") not in identities:
+            raise AdmissionError("Invalid queue token")
+        wait = claims["admit_at"] - time.time()
+        if wait > 0:
+            raise AdmissionError("You are still in the queue", 429, retry_after=math.ceil(wait))
+        if claims["jti"] in uses:
+            raise AdmissionError("This queue token has already been used", 409)
+        uses[claims["jti"]] = AdmissionTokenUse(
+            jti=claims["jti"], event_id=claims["event_id"], expires_at=datetime.utcfromtimestamp(claims["exp"])
+        )
+    if consume and uses:
+        db.session.add_all(uses.values())
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            raise AdmissionError("This queue token has already been used", 409)
+
+
+def forget_used_tokens(batch_size: int, now=None) -> int:
+    """Delete uses of tokens that have expired anyway, ``batch_size`` rows
+    at a time; returns the count."""
+    now = now or datetime.utcnow()
+    deleted = 0
+    while True:
+        jtis = [
+            jti
+            for (jti,) in db.session.query(AdmissionTokenUse.jti)
+            .filter(AdmissionTokenUse.expires_at <= now)
+            .order_by(AdmissionTokenUse.expires_at)
+            .limit(batch_size)
+        ]
+        if not jtis:
+            return deleted
+        AdmissionTokenUse.query.filter(AdmissionTokenUse.jti.in_(jtis)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(jtis)
+
+
+def open_queue(event_id: int, rate_per_second: float) -> AdmissionQueue:
+    if not db.session.get(Event, event_id):
+        raise AdmissionError("Event not found", 404)
+    queue = db.session.get(AdmissionQueue, event_id)
+    if queue is None:
+        queue = AdmissionQueue(event_id=event_id)
+        db.session.add(queue)
+    queue.rate_per_second = rate_per_second
+    db.session.commit()
+    scheduler().invalidate()
+    return queue
+
+
+def close_queue(event_id: int):
+    AdmissionQueue.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+    db.session.commit()
+    scheduler().invalidate()
+
+
+def queue_to_dict(queue: AdmissionQueue):
+    return {
+        "event_id": queue.event_id,
+        "rate_per_second": queue.rate_per_second,
+        "opened_at": queue.created_at.isoformat() if queue.created_at else None,
+    }
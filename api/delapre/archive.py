@@ -0,0 +1,120 @@
+"""Moving bookings for long-finished events out of the hot tables.
+
+``flask archive`` copies bookings (and their guests) for events that
+ended before a cutoff into ``bookings_archive`` and
+``booking_guests_archive``, then deletes them from ``bookings``. It works
+in id order, one short transaction per batch, so it never holds locks
+on more than ``batch_size`` bookings at a time and can be stopped and
+started again. Events themselves stay where they are: they are a small
+fraction of the rows and waitlists, holds and notifications point at
+them.
+
+Reads only include archived bookings when asked to (``include_archived``
+on the history endpoints), so everyday queries only touch recent rows.
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import delete, insert, literal, select, update
+from sqlalchemy.orm import contains_eager
+
+from .extensions import db
+from .models import (
+    ArchivedBooking,
+    ArchivedBookingGuest,
+    Booking,
+    BookingGuest,
+    Event,
+    Notification,
+    WaitlistEntry,
+)
+
+BOOKING_COLUMNS = (
+    "id",
+    "user_id",
+    "event_id",
+    "status",
+    "guest_count",
+    "guest_names",
+    "guest_email",
+    "guest_name",
+    "guest_phone",
+    "confirmation_code",
+    "booked_at",
+    "cancelled_at",
+    "checked_in",
+    "checked_in_at",
+)
+GUEST_COLUMNS = ("id", "booking_id", "position", "name", "ticket_type", "checked_in_at")
+
+
+def _copy(source, target, columns, where, archived_at=None):
+    selected = [getattr(source, name) for name in columns]
+    names = list(columns)
+    if archived_at is not None:
+        selected.append(literal(archived_at, type_=target.archived_at.type))
+        names.append("archived_at")
+    db.session.execute(insert(target).from_select(names, select(*selected).where(where)))
+
+
+def archive_batch(cutoff: datetime, batch_size: int, after_id: int = 0):
+    """Archive up to ``batch_size`` bookings with ids above ``after_id``.
+
+    Returns ``(bookings moved, last id looked at)``; the id is ``None``
+    when nothing is left.
+    """
+    ids = db.session.scalars(
+        select(Booking.id)
+        .join(Event, Event.id == Booking.event_id)
+        .where(Booking.id > after_id, Event.ends_at < cutoff)
+        .order_by(Booking.id)
+        .limit(batch_size)
+    ).all()
+    if not ids:
+        return 0, None
+    now = datetime.utcnow()
+    _copy(Booking, ArchivedBooking, BOOKING_COLUMNS, Booking.id.in_(ids), archived_at=now)
+    _copy(BookingGuest, ArchivedBookingGuest, GUEST_COLUMNS, BookingGuest.booking_id.in_(ids))
+    # Outbox and waitlist rows keep their history without the link
+    for model in (Notification, WaitlistEntry):
+        db.session.execute(
+            update(model).where(model.booking_id.in_(ids)).values(booking_id=None)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.execute(
+        delete(BookingGuest).where(BookingGuest.booking_id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    db.session.execute(delete(Booking).where(Booking.id.in_(ids)).execution_options(synchronize_session=False))
+    db.session.commit()
+    return len(ids), ids[-1]
+
+
+def archive_bookings(cutoff: datetime, batch_size: int = 1000, pause: float = 0, progress=None) -> int:
+    """Archive every booking for events that ended before ``cutoff``."""
+    moved, last_id = 0, 0
+    while True:
+        count, last_id = archive_batch(cutoff, batch_size, last_id)
+        if last_id is None:
+            return moved
+        moved += count
+        if progress is not None:
+            progress(moved)
+        if pause:
+            time.sleep(pause)
+
+
+def include_archived_from_request() -> bool:
+    return request.args.get("include_archived") in {"1", "true", "True"}
+
+
+def archived_bookings(*criteria) -> list:
+    """Archived bookings matching ``criteria``, with their events loaded."""
+    return (
+        ArchivedBooking.query.join(Event, Event.id == ArchivedBooking.event_id)
+        .filter(*criteria)
+        .options(contains_eager(ArchivedBooking.event))
+        .all()
+    )
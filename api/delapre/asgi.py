@@ -0,0 +1,256 @@
+"""ASGI deployment: the hot endpoints on asyncio, the rest on the Flask app.
+
+A WSGI worker holds a thread for the whole of every request, including
+the time it spends waiting on MySQL, so the number of open connections
+a box can serve is its thread count. :func:`create_asgi_app` builds an
+ASGI application (for hypercorn or uvicorn) that answers
+
+- ``GET /api/events`` and ``GET /api/events/<id>``
+- ``POST /api/staff/checkin``
+
+natively with Quart and SQLAlchemy's asyncio extension (``aiomysql`` on
+MySQL, ``aiosqlite`` on SQLite), so a waiting query costs a coroutine
+rather than a thread. They use the same models, serializers, token
+checks, check-in rules (:mod:`delapre.checkin`), rate limit buckets and
+allowed CORS origins (``CORS_ORIGINS``) as the Flask views. Every other request, including ``POST /api/bookings`` and
+check-ins carrying an ``Idempotency-Key``, goes to the regular Flask
+app in a thread pool: booking keeps its single implementation (row
+locks, holds, waiting list, code allocation, notifications) and its
+writes are serialized on the event row anyway, while the open
+connections waiting for them are not holding threads.
+
+Catalogue snapshots, Server-Timing and the live counts streams are left
+to nginx and the Flask side. The native check-in commits inside the
+Flask app's context, so the :mod:`delapre.changes` hooks and
+:func:`delapre.live.counts_changed` run for it as for the Flask view.
+
+    pip install -r requirements-async.txt
+    hypercorn asgi:app --bind 0.0.0.0:8080 --workers 2
+"""
+from __future__ import annotations
+
+from flask_cors.core import sanitize_regex_param, try_match_any
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import joinedload, selectinload
+from werkzeug.exceptions import HTTPException
+
+from . import create_app
+from .compression import COMPRESSIBLE_MIMETYPES, choose_encoding, compress
+from .checkin import CheckInError, check_in, checkin_code
+from .confirmation_codes import booking_by_code_statement
+from .live import counts_changed
+from .models import Booking, Event, User
+from .ratelimit import client_address, rate_limit_wait, retry_after
+from .security import bearer_payload
+from .serializers import (
+    EVENT_FIELDS,
+    booking_to_dict,
+    event_to_dict,
+    events_to_list,
+    parse_fields,
+    reserved_seats_statement,
+    wants_spots,
+)
+
+try:
+    from quart import Blueprint, Quart, jsonify, request
+except ImportError:  # pragma: no cover - depends on the environment
+    Quart = None
+
+try:
+    from hypercorn.middleware import AsyncioWSGIMiddleware
+except ImportError:  # pragma: no cover - depends on the environment
+    AsyncioWSGIMiddleware = None
+
+ASYNC_DRIVERS = {"mysql": "aiomysql", "sqlite": "aiosqlite"}
+
+
+def async_database_uri(uri: str) -> str:
+    """``uri`` with its dialect's asyncio driver (``mysql+pymysql`` ->
+    ``mysql+aiomysql``, ``sqlite`` -> ``sqlite+aiosqlite``)."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver known for {backend}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def create_async_engine_for(config):
+    uri = config["ASYNC_DATABASE_URL"] or async_database_uri(config["SQLALCHEMY_DATABASE_URI"])
+    options = {"pool_pre_ping": True}
+    if make_url(uri).get_backend_name() != "sqlite":
+        options.update(pool_size=config["ASYNC_POOL_SIZE"], max_overflow=config["ASYNC_MAX_OVERFLOW"])
+    return create_async_engine(uri, **options)
+
+
+class HotPathDispatcher:
+    """ASGI app sending requests Quart has a route for to Quart and the
+    rest (plus CORS preflights and idempotent retries) to the WSGI app."""
+
+    def __init__(self, async_app, flask_app):
+        self.async_app = async_app
+        self.flask_app = flask_app
+        self.wsgi_app = AsyncioWSGIMiddleware(flask_app)
+        self._routes = async_app.url_map.bind("localhost")
+
+    def is_native(self, scope) -> bool:
+        method = scope["method"]
+        if method == "OPTIONS":
+            return False
+        if method == "POST" and any(name == b"idempotency-key" for name, _ in scope["headers"]):
+            return False
+        try:
+            self._routes.match(scope["path"], method=method)
+        except HTTPException:
+            return False
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan" or (scope["type"] == "http" and self.is_native(scope)):
+            await self.async_app(scope, receive, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+
+def create_asgi_app(config=None):
+    """Build the ASGI application; ``config`` is as for :func:`create_app`."""
+    if Quart is None or AsyncioWSGIMiddleware is None:
+        raise RuntimeError("The ASGI deployment needs quart and hypercorn (see requirements-async.txt)")
+    flask_app = create_app(config)
+    settings = flask_app.config
+    engine = create_async_engine_for(settings)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+    app = Quart(__name__)
+    app.config["JWT_SECRET"] = settings["JWT_SECRET"]
+    app.extensions["async_engine"] = engine
+    # The patterns cors.init_app gets, matched the way flask-cors does
+    allowed_origins = sanitize_regex_param(settings["CORS_ORIGINS"])
+
+    def json_error(message: str, status: int = 400):
+        return jsonify({"message": message}), status
+
+    async def reserved_counts(session, event_ids) -> dict:
+        event_ids = list(set(event_ids))
+        if not event_ids:
+            return {}
+        rows = await session.execute(reserved_seats_statement(event_ids))
+        return {event_id: int(total or 0) for event_id, total in rows}
+
+    async def staff_user(session):
+        """``(user, None)`` or ``(None, error_response)``, as ``require_staff``."""
+        payload, message = bearer_payload(request.headers.get("Authorization", ""), settings["JWT_SECRET"])
+        if message:
+            return None, json_error(message, 401)
+        user = await session.get(User, int(payload["sub"]))
+        if not user:
+            return None, json_error("User not found", 401)
+        if not user.is_staff:
+            return None, json_error("Forbidden", 403)
+        return user, None
+
+    @app.before_request
+    async def check_rate_limits():
+        backend = flask_app.extensions.get("rate_limits")
+        if backend is None or request.endpoint is None:
+            return None
+
+        address = client_address(
+            request.remote_addr, request.headers.get("X-Forwarded-For"), settings["TRUSTED_PROXY_COUNT"]
+        )
+
+        def identity():
+            payload, _ = bearer_payload(request.headers.get("Authorization", ""), settings["JWT_SECRET"])
+            if payload and "sub" in payload:
+                return f"user:{payload['sub']}"
+            return f"ip:{address}"
+
+        wait = rate_limit_wait(settings, backend, request.endpoint, address, identity)
+        if wait > 0:
+            response, status = json_error("Too many requests, please slow down", 429)
+            response.headers["Retry-After"] = retry_after(wait)
+            return response, status
+        return None
+
+    @app.after_request
+    async def finish_response(response):
+        origin = request.headers.get("Origin")
+        if origin and try_match_any(origin, allowed_origins):
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.vary.add("Origin")
+        if settings["COMPRESSION_ENABLED"] and response.mimetype in COMPRESSIBLE_MIMETYPES:
+            data = await response.get_data()
+            if len(data) >= settings["COMPRESSION_MIN_BYTES"]:
+                response.vary.add("Accept-Encoding")
+                encoding = choose_encoding(request.accept_encodings)
+                if encoding is not None:
+                    response.set_data(compress(data, encoding, settings))
+                    response.headers["Content-Encoding"] = encoding
+        return response
+
+    @app.after_serving
+    async def dispose_engine():
+        await engine.dispose()
+
+    catalogue = Blueprint("catalogue", __name__)
+
+    @catalogue.get("/api/events")
+    async def list_events():
+        try:
+            fields = parse_fields(request.args.get("fields"), EVENT_FIELDS)
+        except ValueError as exc:
+            return json_error(str(exc))
+        statement = select(Event).order_by(Event.starts_at.asc())
+        if request.args.get("free") in {"1", "true", "True"}:
+            statement = statement.filter_by(is_free=True)
+        async with sessions() as session:
+            events = (await session.scalars(statement)).unique().all()
+            reserved = await reserved_counts(session, (event.id for event in events)) if wants_spots(fields) else {}
+        return jsonify(events_to_list(events, fields=fields, reserved=reserved))
+
+    @catalogue.get("/api/events/<int:event_id>")
+    async def event_details(event_id: int):
+        try:
+            fields = parse_fields(request.args.get("fields"), EVENT_FIELDS)
+        except ValueError as exc:
+            return json_error(str(exc))
+        async with sessions() as session:
+            event = await session.get(Event, event_id)
+            if not event:
+                return json_error("Event not found", 404)
+            reserved = await reserved_counts(session, [event.id]) if wants_spots(fields) else {}
+        return jsonify(event_to_dict(event, fields=fields, reserved=reserved.get(event.id, 0)))
+
+    staff = Blueprint("staff", __name__)
+
+    @staff.post("/api/staff/checkin")
+    async def staff_checkin():
+        async with sessions() as session:
+            _, error = await staff_user(session)
+            if error:
+                return error
+            try:
+                confirmation_code = checkin_code(await request.get_json(silent=True) or {})
+                booking = await session.scalar(
+                    booking_by_code_statement(confirmation_code)
+                    .options(joinedload(Booking.event), selectinload(Booking.guests))
+                )
+                check_in(booking)
+            except CheckInError as exc:
+                return json_error(exc.message, exc.status)
+            # In the Flask app's context, so the commit hooks (calendar feeds,
+            # snapshots) and the live counts feed see it as they would the
+            # Flask view's
+            with flask_app.app_context():
+                await session.commit()
+                counts_changed([booking.event_id])
+            reserved = await reserved_counts(session, [booking.event_id])
+        event = event_to_dict(booking.event, reserved=reserved.get(booking.event_id, 0))
+        return jsonify(booking_to_dict(booking, event=event))
+
+    app.register_blueprint(catalogue)
+    app.register_blueprint(staff)
+    return HotPathDispatcher(app, flask_app)
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from importlib import import_module
+
+# Blueprint name -> module; modules are only imported when enabled so a
+# lightweight instance does not pay for code it never serves.
+BLUEPRINT_MODULES = {
+    "catalogue": "delapre.blueprints.catalogue",
+    "auth": "delapre.blueprints.auth",
+    "bookings": "delapre.blueprints.bookings",
+    "staff": "delapre.blueprints.staff",
+    "documents": "delapre.blueprints.documents",
+    "calendar": "delapre.blueprints.calendar",
+}
+
+
+def register_blueprints(app, names):
+    for name in names:
+        if name not in BLUEPRINT_MODULES:
+            raise ValueError(f"Unknown blueprint: {name}")
+        module = import_module(BLUEPRINT_MODULES[name])
+        app.register_blueprint(module.bp)
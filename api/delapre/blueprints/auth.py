@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import re
+
+from flask import Blueprint, jsonify, request
+
+from ..extensions import db
+from ..models import User
+from ..passwords import HasherBusy, hasher, login_throttle
+from ..replicas import also_written_by
+from ..security import require_auth, token_for_user, user_to_dict
+from ..utils import json_error
+
+bp = Blueprint("auth", __name__)
+
+
+def hasher_busy():
+    response, status = json_error("Too many sign-ins right now, please try again", 503)
+    response.headers["Retry-After"] = "1"
+    return response, status
+
+
+@bp.post("/api/auth/register")
+def register_user():
+    payload = request.get_json(silent=True) or {}
+    email = (payload.get("email") or "").strip().lower()
+    password = payload.get("password") or ""
+    first_name = (payload.get("first_name") or "").strip()
+    last_name = (payload.get("last_name") or "").strip()
+    phone = (payload.get("phone") or "").strip() or None
+    email_opt_in = bool(payload.get("email_opt_in", True))
+    sms_opt_in = bool(payload.get("sms_opt_in", False))
+
+    if not email or not password or not first_name or not last_name:
+        return json_error("Email, password, first name, and last name are required")
+
+    if User.query.filter_by(email=email).first():
+        return json_error("Email already registered", 409)
+
+    try:
+        password_hash = hasher().hash(password)
+    except HasherBusy:
+        return hasher_busy()
+
+    user = User(
+        email=email,
+        password_hash=password_hash,
+        first_name=first_name,
+        last_name=last_name,
+        phone=phone,
+        email_opt_in=email_opt_in,
+        sms_opt_in=sms_opt_in,
+    )
+    db.session.add(user)
+    db.session.commit()
+    also_written_by(user.id)
+
+    token = token_for_user(user)
+    return (
+        jsonify({"token": token, "user": user_to_dict(user)}),
+        201,
+    )
+
+
+@bp.post("/api/auth/login")
+def login_user():
+    payload = request.get_json(silent=True) or {}
+    email = (payload.get("email") or "").strip().lower()
+    password = payload.get("password") or ""
+    if not email or not password:
+        return json_error("Email and password are required")
+
+    throttle = login_throttle()
+    address = request.remote_addr or ""
+    retry_after = throttle.retry_after(address, email)
+    if retry_after is not None:
+        response, status = json_error("Too many failed sign-in attempts, please try again later", 429)
+        response.headers["Retry-After"] = str(retry_after)
+        return response, status
+
+    user = User.query.filter_by(email=email).first()
+    passwords = hasher()
+    try:
+        valid = user is not None and passwords.verify(user.password_hash, password)
+    except HasherBusy:
+        return hasher_busy()
+    if not valid:
+        throttle.failed(address, email)
+        return json_error("Invalid credentials", 401)
+    throttle.succeeded(email)
+
+    # Move hashes made with older settings to the configured method
+    if passwords.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = passwords.hash(password)
+            db.session.commit()
+            also_written_by(user.id)
+        except HasherBusy:
+            pass
+
+    token = token_for_user(user)
+    return jsonify({"token": token, "user": user_to_dict(user)})
+
+
+@bp.get("/api/user/preferences")
+@require_auth
+def get_user_preferences(current_user: User):
+    return jsonify({
+        "phone": current_user.phone,
+        "email_opt_in": bool(current_user.email_opt_in),
+        "sms_opt_in": bool(current_user.sms_opt_in),
+    })
+
+
+@bp.put("/api/user/preferences")
+@require_auth
+def update_user_preferences(current_user: User):
+    payload = request.get_json(silent=True) or {}
+    phone = (payload.get("phone") or "").strip() or None
+    email_opt_in = payload.get("email_opt_in")
+    sms_opt_in = payload.get("sms_opt_in")
+
+    # Basic phone validation
+    if phone and not re.match(r'^[\d\s\-\+\(\)]{7,20}$', phone):
+        return json_error("Please enter a valid phone number")
+
+    if email_opt_in is not None:
+        current_user.email_opt_in = bool(email_opt_in)
+    if sms_opt_in is not None:
+        current_user.sms_opt_in = bool(sms_opt_in)
+
+    current_user.phone = phone
+    db.session.commit()
+    also_written_by(current_user.id)
+
+    return jsonify({
+        "phone": current_user.phone,
+        "email_opt_in": bool(current_user.email_opt_in),
+        "sms_opt_in": bool(current_user.sms_opt_in),
+    })
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy.orm import contains_eager
+
+from ..admission import AdmissionError, check_admission, join_queue, queue_status
+from ..archive import archived_bookings, include_archived_from_request
+from ..extensions import db
+from ..holds import hold_to_dict, place_hold
+from ..idempotency import idempotent
+from ..live import counts_changed
+from ..models import ArchivedBooking, Booking, Event, SeatHold, User, WaitlistEntry
+from ..replicas import replica_reads
+from ..reservations import (
+    MAX_BATCH_ITEMS,
+    BookingError,
+    parse_guest_contact,
+    parse_guest_count,
+    parse_item,
+    reserve,
+)
+from ..security import require_auth, user_from_request
+from ..serializers import (
+    booking_history_statement,
+    booking_options_from_request,
+    booking_to_dict,
+    bookings_to_payload,
+    reserved_guest_counts,
+)
+from ..utils import json_error
+from ..waitlist import join_waitlist, promote_waitlist, waitlist_entry_to_dict, waitlist_position
+
+bp = Blueprint("bookings", __name__)
+
+
+@bp.get("/api/bookings")
+@replica_reads
+@require_auth
+def list_bookings(current_user: User):
+    try:
+        options = booking_options_from_request()
+    except ValueError as exc:
+        return json_error(str(exc))
+    now = datetime.utcnow()
+    bookings = (
+        Booking.query.join(Event)
+        .filter(
+            Booking.user_id == current_user.id,
+            Booking.status == "confirmed",
+            Event.starts_at >= now,
+        )
+        .options(contains_eager(Booking.event))
+        .order_by(Event.starts_at.asc())
+        .all()
+    )
+    return jsonify(bookings_to_payload(bookings, **options))
+
+
+@bp.post("/api/bookings")
+@idempotent
+@require_auth
+def create_booking(current_user: User):
+    payload = request.get_json(silent=True) or {}
+    try:
+        item = parse_item(payload)
+        check_admission([item], consume=True)
+    except BookingError as exc:
+        return booking_error(exc)
+
+    result = reserve([item], user=current_user)[0]
+    if isinstance(result, BookingError):
+        db.session.rollback()
+        return json_error(result.message, result.status)
+    db.session.commit()
+    counts_changed([result.event_id])
+    return jsonify(booking_to_dict(result)), 201
+
+
+@bp.post("/api/bookings/guest")
+@idempotent
+def create_guest_booking():
+    payload = request.get_json(silent=True) or {}
+    try:
+        item = parse_item(payload)
+        contact = parse_guest_contact(payload)
+        check_admission([item], consume=True)
+    except BookingError as exc:
+        return booking_error(exc)
+
+    result = reserve([item], contact=contact)[0]
+    if isinstance(result, BookingError):
+        db.session.rollback()
+        return json_error(result.message, result.status)
+    db.session.commit()
+    counts_changed([result.event_id])
+    return jsonify(booking_to_dict(result)), 201
+
+
+def booking_error(exc: BookingError):
+    response, status = json_error(exc.message, exc.status)
+    if getattr(exc, "retry_after", None) is not None:
+        response.headers["Retry-After"] = str(exc.retry_after)
+    return response, status
+
+
+def _batch_items(payload):
+    items = payload.get("items")
+    if not isinstance(items, list) or not items:
+        raise BookingError("Items are required")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise BookingError(f"Cannot book more than {MAX_BATCH_ITEMS} events at once")
+    parsed = []
+    for item in items:
+        try:
+            parsed.append(parse_item(item if isinstance(item, dict) else {}))
+        except BookingError as exc:
+            parsed.append(exc)
+    return parsed
+
+
+def _batch_response(items, results):
+    """All-or-nothing: commit and return 201, or roll back and report per item."""
+    failed = [r for r in results if isinstance(r, BookingError)]
+    payload_results = []
+    for item, result in zip(items, results):
+        event_id = item["event_id"] if isinstance(item, dict) else None
+        if isinstance(result, BookingError):
+            payload_results.append({
+                "event_id": event_id, "ok": False, "status": result.status, "message": result.message,
+            })
+        else:
+            payload_results.append({"event_id": event_id, "ok": True, "status": 201})
+
+    if failed:
+        db.session.rollback()
+        first = failed[0]
+        return jsonify({"message": first.message, "results": payload_results}), first.status
+
+    db.session.commit()
+    counts_changed(booking.event_id for booking in results)
+    for entry, booking in zip(payload_results, results):
+        entry["booking"] = booking_to_dict(booking)
+    return jsonify({"results": payload_results}), 201
+
+
+@bp.post("/api/bookings/batch")
+@idempotent
+@require_auth
+def create_booking_batch(current_user: User):
+    payload = request.get_json(silent=True) or {}
+    try:
+        items = _batch_items(payload)
+        check_admission(items, consume=True)
+    except BookingError as exc:
+        return booking_error(exc)
+    return _batch_response(items, reserve(items, user=current_user))
+
+
+@bp.post("/api/bookings/guest/batch")
+@idempotent
+def create_guest_booking_batch():
+    payload = request.get_json(silent=True) or {}
+    try:
+        contact = parse_guest_contact(payload)
+        items = _batch_items(payload)
+        check_admission(items, consume=True)
+    except BookingError as exc:
+        return booking_error(exc)
+    return _batch_response(items, reserve(items, contact=contact))
+
+
+@bp.post("/api/events/<int:event_id>/queue")
+def join_event_queue(event_id: int):
+    try:
+        return jsonify(join_queue(event_id)), 201
+    except AdmissionError as exc:
+        return booking_error(exc)
+
+
+@bp.get("/api/queue/status")
+def queue_position():
+    """Where a queue token stands; answered from the token alone."""
+    try:
+        return jsonify(queue_status(request.args.get("token", "")))
+    except AdmissionError as exc:
+        return booking_error(exc)
+
+
+@bp.post("/api/events/<int:event_id>/waitlist")
+@require_auth
+def join_event_waitlist(current_user: User, event_id: int):
+    payload = request.get_json(silent=True) or {}
+    try:
+        entry = join_waitlist(parse_item({**payload, "event_id": event_id}), user=current_user)
+    except BookingError as exc:
+        return booking_error(exc)
+    db.session.commit()
+    return jsonify(waitlist_entry_to_dict(entry, position=waitlist_position(entry))), 201
+
+
+@bp.post("/api/events/<int:event_id>/waitlist/guest")
+def join_event_waitlist_as_guest(event_id: int):
+    payload = request.get_json(silent=True) or {}
+    try:
+        item = parse_item({**payload, "event_id": event_id})
+        entry = join_waitlist(item, contact=parse_guest_contact(payload))
+    except BookingError as exc:
+        return booking_error(exc)
+    db.session.commit()
+    return jsonify(waitlist_entry_to_dict(entry, position=waitlist_position(entry))), 201
+
+
+@bp.get("/api/waitlist")
+@require_auth
+def list_waitlist(current_user: User):
+    entries = (
+        WaitlistEntry.query.filter_by(user_id=current_user.id, status="waiting")
+        .order_by(WaitlistEntry.created_at)
+        .all()
+    )
+    return jsonify([waitlist_entry_to_dict(e, position=waitlist_position(e)) for e in entries])
+
+
+@bp.delete("/api/waitlist/<int:entry_id>")
+@require_auth
+def leave_waitlist(current_user: User, entry_id: int):
+    entry = WaitlistEntry.query.filter_by(id=entry_id, user_id=current_user.id).first()
+    if not entry:
+        return json_error("Waitlist entry not found", 404)
+    if entry.status == "waiting":
+        entry.status = "left"
+        db.session.commit()
+    return jsonify(waitlist_entry_to_dict(entry))
+
+
+def _optional_user():
+    """The signed-in user, ``None`` for anonymous requests, or an error response."""
+    if not request.headers.get("Authorization"):
+        return None, None
+    return user_from_request()
+
+
+def _hold_response(hold, status=200):
+    reserved = reserved_guest_counts([hold.event_id]).get(hold.event_id, 0)
+    spots_left = max(0, hold.event.capacity - reserved)
+    return jsonify(hold_to_dict(hold, spots_left=spots_left)), status
+
+
+@bp.post("/api/holds")
+def create_hold():
+    user, error = _optional_user()
+    if error:
+        return error
+    payload = request.get_json(silent=True) or {}
+    try:
+        item = parse_item(payload)
+        check_admission([item])
+        hold = place_hold(item["event_id"], item["guest_count"], user=user, client_address=request.remote_addr)
+    except BookingError as exc:
+        db.session.rollback()
+        return booking_error(exc)
+    db.session.commit()
+    counts_changed([hold.event_id])
+    return _hold_response(hold, 201)
+
+
+@bp.patch("/api/holds/<token>")
+def update_hold(token: str):
+    """Resize a hold and restart its timer."""
+    hold = SeatHold.query.filter_by(token=token).first()
+    if not hold:
+        return json_error("Hold not found", 404)
+    payload = request.get_json(silent=True) or {}
+    try:
+        guest_count = parse_guest_count(payload)
+        place_hold(hold.event_id, guest_count, hold=hold)
+    except BookingError as exc:
+        db.session.rollback()
+        return booking_error(exc)
+    db.session.commit()
+    counts_changed([hold.event_id])
+    return _hold_response(hold)
+
+
+@bp.delete("/api/holds/<token>")
+def release_hold(token: str):
+    event_id = db.session.query(SeatHold.event_id).filter_by(token=token).scalar()
+    if event_id is not None:
+        SeatHold.query.filter_by(token=token).delete(synchronize_session=False)
+        promote_waitlist([event_id])
+        db.session.commit()
+        counts_changed([event_id])
+    return "", 204
+
+
+@bp.get("/api/bookings/history")
+@replica_reads
+@require_auth
+def booking_history(current_user: User):
+    try:
+        options = booking_options_from_request()
+    except ValueError as exc:
+        return json_error(str(exc))
+    bookings = db.session.scalars(booking_history_statement(current_user.id)).all()
+    if include_archived_from_request():
+        bookings += archived_bookings(ArchivedBooking.user_id == current_user.id)
+        bookings.sort(key=lambda booking: booking.booked_at or datetime.min, reverse=True)
+    return jsonify(bookings_to_payload(bookings, **options))
+
+
+@bp.delete("/api/bookings/<int:booking_id>")
+@require_auth
+def cancel_booking(current_user: User, booking_id: int):
+    booking = Booking.query.filter_by(id=booking_id, user_id=current_user.id).first()
+    if not booking:
+        return json_error("Booking not found", 404)
+    if booking.status == "cancelled":
+        return jsonify(booking_to_dict(booking))
+
+    # Prevent cancellation within 24 hours of event start
+    event = booking.event
+    now = datetime.utcnow()
+    if event and event.starts_at:
+        try:
+            if event.starts_at - now <= timedelta(hours=24):
+                return json_error("Cannot cancel within 24 hours of the event start", 409)
+        except Exception:
+            # if comparison fails for any reason, fall back to disallowing close cancellations
+            pass
+
+    booking.status = "cancelled"
+    booking.cancelled_at = datetime.utcnow()
+    promote_waitlist([booking.event_id])
+    db.session.commit()
+    counts_changed([booking.event_id])
+    return jsonify(booking_to_dict(booking))
@@ -0,0 +1,134 @@
+"""iCalendar feeds: the catalogue, one category, one location, or a user's bookings."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, current_app, jsonify, request, url_for
+
+from ..calendars import (
+    booking_fingerprint,
+    event_fingerprint,
+    feed_cache,
+    feed_token,
+    render_calendar,
+    user_id_for_token,
+)
+from ..extensions import db
+from ..models import Booking, Category, Event, Location, User
+from ..security import require_auth
+from ..utils import json_error
+
+bp = Blueprint("calendar", __name__)
+
+
+def _since() -> datetime:
+    # Whole days, so the window only moves (and changes the ETag) once a day
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=current_app.config["CALENDAR_PAST_DAYS"])
+
+
+def _feed(key, name, fingerprint, load_events, private=False):
+    cache = feed_cache()
+    host = request.host.split(":")[0]
+    # Per host as well, since the UIDs in the body name it
+    cache_key = f"{key}@{host}"
+    etag = cache.etag(cache_key, fingerprint)
+    cache_control = f"{'private' if private else 'public'}, max-age={current_app.config['CALENDAR_MAX_AGE']}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        body = cache.body(cache_key, etag)
+        if body is None:
+            body = render_calendar(name, load_events(), host=host)
+            cache.store_body(cache_key, etag, body)
+        response = Response(body, mimetype="text/calendar")
+        response.headers["Content-Disposition"] = f'inline; filename="{key.replace(":", "-")}.ics"'
+    # Weak: the gzip and identity bodies differ byte for byte
+    response.set_etag(etag, weak=True)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def _events(since, **filters):
+    return lambda: (
+        Event.query.filter(Event.starts_at >= since).filter_by(**filters).order_by(Event.starts_at, Event.id).all()
+    )
+
+
+@bp.get("/api/calendar/events.ics")
+def catalogue_feed():
+    since = _since()
+    return _feed("events", "Delapre Abbey events", lambda: event_fingerprint(since), _events(since))
+
+
+@bp.get("/api/calendar/categories/<int:category_id>.ics")
+def category_feed(category_id: int):
+    category = db.session.get(Category, category_id)
+    if not category:
+        return json_error("Category not found", 404)
+    since = _since()
+    return _feed(
+        f"category:{category_id}",
+        f"Delapre Abbey: {category.name}",
+        lambda: event_fingerprint(since, category_id=category_id),
+        _events(since, category_id=category_id),
+    )
+
+
+@bp.get("/api/calendar/locations/<int:location_id>.ics")
+def location_feed(location_id: int):
+    location = db.session.get(Location, location_id)
+    if not location:
+        return json_error("Location not found", 404)
+    since = _since()
+    return _feed(
+        f"location:{location_id}",
+        f"Delapre Abbey: {location.name}",
+        lambda: event_fingerprint(since, location_id=location_id),
+        _events(since, location_id=location_id),
+    )
+
+
+@bp.get("/api/calendar/users/<token>.ics")
+def user_feed(token: str):
+    user_id = user_id_for_token(token)
+    if user_id is None:
+        return json_error("Calendar not found", 404)
+    since = _since()
+
+    def load_events():
+        return (
+            Event.query.join(Booking)
+            .filter(Booking.user_id == user_id, Booking.status == "confirmed", Event.starts_at >= since)
+            .order_by(Event.starts_at, Event.id)
+            .all()
+        )
+
+    return _feed(
+        f"user:{user_id}",
+        "My Delapre Abbey bookings",
+        lambda: booking_fingerprint(user_id, since),
+        load_events,
+        private=True,
+    )
+
+
+def _feed_urls(user: User):
+    url = url_for("calendar.user_feed", token=feed_token(user), _external=True)
+    return jsonify({"url": url, "webcal_url": "webcal://" + url.split("://", 1)[1]})
+
+
+@bp.get("/api/calendar/feed")
+@require_auth
+def my_calendar_feed(current_user: User):
+    """The signed-in user's personal feed URL, to paste into a calendar app."""
+    return _feed_urls(current_user)
+
+
+@bp.post("/api/calendar/feed/rotate")
+@require_auth
+def rotate_calendar_feed(current_user: User):
+    """Revoke the user's feed URLs and return a new one."""
+    current_user.calendar_feed_version = (current_user.calendar_feed_version or 0) + 1
+    db.session.commit()
+    return _feed_urls(current_user)
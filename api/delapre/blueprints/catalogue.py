@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, request, send_from_directory
+
+from ..event_import import overlapping_events_statement
+from ..extensions import db
+from ..live import PUBLIC_FIELDS, counts_changed, counts_stream
+from ..models import Event, User
+from ..replicas import replica_reads
+from ..security import require_auth, require_staff
+from ..serializers import event_fields_from_request, event_to_dict, events_to_list
+from ..snapshots import snapshot_response
+from ..taxonomy import category_by_id, location_by_id, location_for, taxonomy
+from ..utils import json_error
+from ..waitlist import promote_waitlist
+
+bp = Blueprint("catalogue", __name__)
+
+
+@bp.get("/api/health")
+def health_check():
+    return jsonify({"status": "ok"})
+
+
+@bp.get("/api/docs/openapi.json")
+def openapi_spec():
+    return send_from_directory(os.path.dirname(current_app.root_path), "openapi.json")
+
+
+@bp.get("/api/events")
+@replica_reads
+def list_events():
+    snapshot = snapshot_response("events.json")
+    if snapshot is not None:
+        return snapshot
+    try:
+        fields = event_fields_from_request()
+    except ValueError as exc:
+        return json_error(str(exc))
+    free_only = request.args.get("free") in {"1", "true", "True"}
+    query = Event.query
+    if free_only:
+        query = query.filter_by(is_free=True)
+    events = query.order_by(Event.starts_at.asc()).all()
+    return jsonify(events_to_list(events, fields=fields))
+
+
+@bp.get("/api/events/live")
+def live_event_counts():
+    """Server-Sent Events stream of ``spots_left`` changes, optionally for
+    ``?event_ids=1,2`` only (see :func:`delapre.live.counts_stream`)."""
+    return counts_stream(PUBLIC_FIELDS)
+
+
+@bp.get("/api/events/<int:event_id>")
+@replica_reads
+def event_details(event_id: int):
+    snapshot = snapshot_response(f"events/{event_id}.json")
+    if snapshot is not None:
+        return snapshot
+    try:
+        fields = event_fields_from_request()
+    except ValueError as exc:
+        return json_error(str(exc))
+    event = db.session.get(Event, event_id)
+    if not event:
+        return json_error("Event not found", 404)
+    return jsonify(event_to_dict(event, fields=fields))
+
+
+@bp.get("/api/categories")
+@replica_reads
+def list_categories():
+    snapshot = snapshot_response("categories.json")
+    if snapshot is not None:
+        return snapshot
+    return jsonify(taxonomy().categories_list)
+
+
+@bp.get("/api/locations")
+@replica_reads
+def list_locations():
+    snapshot = snapshot_response("locations.json")
+    if snapshot is not None:
+        return snapshot
+    return jsonify(taxonomy().locations_list)
+
+
+@bp.post("/api/events")
+@require_auth
+def create_event(current_user: User):
+    # In a real app we'd check current_user.is_staff
+    payload = request.get_json(silent=True) or {}
+    
+    title = (payload.get("title") or "").strip()
+    description = (payload.get("description") or "").strip()
+    # location can be provided as a string (legacy) or a location_id (preferred)
+    location = (payload.get("location") or "").strip()
+    location_id = payload.get("location_id")
+    try:
+        starts_at = datetime.fromisoformat(payload.get("starts_at", ""))
+        ends_at = datetime.fromisoformat(payload.get("ends_at", ""))
+    except ValueError:
+        return json_error("Invalid date format")
+
+    if not title or not starts_at or not ends_at:
+        return json_error("Title, start time, and end time are required")
+
+    if location_id:
+        try:
+            location_id = int(location_id)
+        except (ValueError, TypeError):
+            return json_error("Invalid location id", 400)
+        if location_by_id(location_id) is None:
+            return json_error("Invalid location id", 400)
+    elif location:
+        # The numeric id (legacy clients) or a name, created if it is new
+        location_id = location_for(location)
+    else:
+        return json_error("Location is required")
+
+    capacity = payload.get("capacity", 0)
+    try:
+        capacity = int(capacity)
+    except (ValueError, TypeError):
+        return json_error("Capacity must be a number")
+
+    is_free = payload.get("is_free", False)
+    price = payload.get("price", 0.0)
+    try:
+        price = float(price)
+    except (ValueError, TypeError):
+        return json_error("Price must be a number")
+
+    if is_free:
+        price = 0.0
+
+    category_id = payload.get("category_id")
+    if category_id:
+        try:
+            category_id = int(category_id)
+        except (ValueError, TypeError):
+            return json_error("Invalid category ID", 400)
+        if category_by_id(category_id) is None:
+            return json_error("Invalid category ID", 400)
+
+    recurrence = payload.get("recurrence", {})
+    recurrence_type = (recurrence.get("type") or "").strip().lower()
+    recurrence_end_date = recurrence.get("end_date")
+    
+    events_created = []
+    group_id = None
+
+    # Helper: check for overlapping events at the same location
+    def has_conflict(loc_id, start_dt, end_dt):
+        # overlap if existing.starts_at < new.ends_at and existing.ends_at > new.starts_at
+        conflict = db.session.execute(overlapping_events_statement([loc_id], start_dt, end_dt).limit(1)).first()
+        return conflict is not None
+
+    if recurrence_type == "weekly" and recurrence_end_date:
+        try:
+            end_date_obj = datetime.fromisoformat(recurrence_end_date)
+            # Ensure end date includes time if only date provided, or assume end of day? No, just compare dates.
+            # Usually end_date comes as YYYY-MM-DD
+        except ValueError:
+            return json_error("Invalid recurrence end date")
+            
+        group_id = str(uuid.uuid4())
+        
+        # Create instances
+        current_start = starts_at
+        current_end = ends_at
+        
+        while current_start <= end_date_obj:
+            # Check for time/location conflicts before adding
+            if has_conflict(location_id, current_start, current_end):
+                return json_error(
+                    f"Location is already booked for {current_start.date()} {current_start.time()} - {current_end.time()}",
+                    409,
+                )
+
+            event = Event(
+                title=title,
+                description=description or "No description provided.",
+                starts_at=current_start,
+                ends_at=current_end,
+                location_id=location_id,
+                is_free=bool(is_free),
+                price=price,
+                capacity=capacity,
+                category_id=category_id,
+                group_id=group_id,
+                recurrence_type=recurrence_type,
+            )
+            db.session.add(event)
+            events_created.append(event)
+            
+            # Add 7 days
+            current_start += timedelta(days=7)
+            current_end += timedelta(days=7)
+            
+    else:
+        # Single event
+        # Check for conflict at this location/time
+        if has_conflict(location_id, starts_at, ends_at):
+            return json_error("Location is already booked at that time", 409)
+
+        event = Event(
+            title=title,
+            description=description or "No description provided.",
+            starts_at=starts_at,
+            ends_at=ends_at,
+            location_id=location_id,
+            is_free=bool(is_free),
+            price=price,
+            capacity=capacity,
+            category_id=category_id,
+            group_id=None,
+            recurrence_type=None,
+        )
+        db.session.add(event)
+        events_created.append(event)
+
+    db.session.commit()
+    
+    # Return the first event created
+    return jsonify(event_to_dict(events_created[0])), 201
+
+
+@bp.route("/api/events/<int:event_id>", methods=["PUT"])
+@require_staff
+def update_event(current_user: User, event_id: int):
+    event = db.session.get(Event, event_id)
+    if not event:
+        return json_error("Event not found", 404)
+
+    payload = request.get_json(silent=True) or {}
+    
+    # Update fields if provided
+    if "title" in payload:
+        event.title = payload["title"].strip()
+    if "description" in payload:
+        event.description = payload["description"].strip()
+    if "location_id" in payload:
+        try:
+            location_id = int(payload["location_id"])
+        except (ValueError, TypeError):
+            return json_error("Invalid location id", 400)
+        if location_by_id(location_id) is None:
+            return json_error("Invalid location id", 400)
+        event.location_id = location_id
+    elif "location" in payload:
+        location = str(payload["location"] or "").strip()
+        if not location:
+            return json_error("Location is required")
+        event.location_id = location_for(location)
+    if "starts_at" in payload:
+        try:
+            event.starts_at = datetime.fromisoformat(payload["starts_at"])
+        except ValueError:
+            return json_error("Invalid start date", 400)
+    if "ends_at" in payload:
+        try:
+            event.ends_at = datetime.fromisoformat(payload["ends_at"])
+        except ValueError:
+            return json_error("Invalid end date", 400)
+    if "price" in payload:
+        try:
+            event.price = float(payload["price"])
+        except ValueError:
+            return json_error("Invalid price", 400)
+    previous_capacity = event.capacity
+    if "capacity" in payload:
+        try:
+            event.capacity = int(payload["capacity"])
+        except ValueError:
+            return json_error("Invalid capacity", 400)
+    if "is_free" in payload:
+        event.is_free = bool(payload["is_free"])
+    if "category_id" in payload:
+        try:
+            category_id = int(payload["category_id"])
+        except (ValueError, TypeError):
+            pass # Ignore invalid category id type if weird
+        else:
+            if category_by_id(category_id) is None:
+                return json_error("Invalid category ID", 400)
+            event.category_id = category_id
+
+    if previous_capacity > 0 and (event.capacity <= 0 or event.capacity > previous_capacity):
+        promote_waitlist([event.id])
+
+    db.session.commit()
+    if event.capacity != previous_capacity:
+        counts_changed([event.id])
+    return jsonify(event_to_dict(event))
@@ -0,0 +1,110 @@
+"""Receipt, confirmation and attendance report downloads.
+
+The renderers live in ``delapre.documents`` and are imported inside each
+handler so that fpdf, qrcode and PIL are only loaded on first use.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from flask import Blueprint, Response
+from sqlalchemy.orm import joinedload
+
+from ..archive import include_archived_from_request
+from ..extensions import db
+from ..guests import booking_guest_entries, guests_by_booking
+from ..models import ArchivedBooking, ArchivedBookingGuest, Booking, Event, User
+from ..replicas import replica_reads
+from ..security import require_auth, require_staff
+from ..utils import json_error
+
+bp = Blueprint("documents", __name__)
+
+
+def _find_booking(booking_id: int):
+    """The booking, or its archived copy once ``flask archive`` moved it."""
+    return db.session.get(Booking, booking_id) or db.session.get(ArchivedBooking, booking_id)
+
+
+@bp.get("/api/bookings/<int:booking_id>/receipt")
+@require_auth
+def generate_receipt(current_user: User, booking_id: int):
+    booking = _find_booking(booking_id)
+    if not booking:
+        return json_error("Booking not found", 404)
+    if not current_user.is_staff and booking.user_id != current_user.id:
+        return json_error("Unauthorized", 403)
+
+    from ..documents import render_receipt_pdf
+
+    pdf_bytes = render_receipt_pdf(booking, current_user)
+    return Response(
+        pdf_bytes,
+        mimetype="application/pdf",
+        headers={"Content-Disposition": f"attachment;filename=receipt_{booking_id}.pdf"}
+    )
+
+
+@bp.get("/api/bookings/<int:booking_id>/confirmation")
+@require_auth
+def generate_confirmation(current_user: User, booking_id: int):
+    booking = _find_booking(booking_id)
+    if not booking:
+        return json_error("Booking not found", 404)
+    if not current_user.is_staff and booking.user_id != current_user.id:
+        return json_error("Unauthorized", 403)
+
+    from ..documents import render_confirmation_pdf
+
+    pdf_bytes = render_confirmation_pdf(booking, current_user)
+    return Response(
+        pdf_bytes,
+        mimetype="application/pdf",
+        headers={"Content-Disposition": f"attachment;filename=confirmation_{booking_id}.pdf"}
+    )
+
+
+@bp.get("/api/staff/events/<int:event_id>/attendance")
+@replica_reads
+@require_staff
+def download_attendance_report(current_user: User, event_id: int):
+    event = db.session.get(Event, event_id)
+    if not event:
+        return json_error("Event not found", 404)
+
+    bookings = (
+        Booking.query
+        .filter_by(event_id=event.id)
+        .options(joinedload(Booking.user))
+        .order_by(Booking.booked_at.asc())
+        .all()
+    )
+
+    guests = guests_by_booking(booking.id for booking in bookings)
+    guest_entries = {
+        booking.id: booking_guest_entries(booking, guests.get(booking.id, []))
+        for booking in bookings
+    }
+    if include_archived_from_request():
+        archived = (
+            ArchivedBooking.query
+            .filter_by(event_id=event.id)
+            .options(joinedload(ArchivedBooking.user))
+            .all()
+        )
+        guests = guests_by_booking((booking.id for booking in archived), model=ArchivedBookingGuest)
+        guest_entries.update(
+            (booking.id, booking_guest_entries(booking, guests.get(booking.id, [])))
+            for booking in archived
+        )
+        # Booking order across both tables, as the live query above
+        bookings = sorted(bookings + archived, key=lambda booking: (booking.booked_at or datetime.min, booking.id))
+
+    from ..documents import render_attendance_csv
+
+    filename = f"attendance_event_{event.id}.csv"
+    return Response(
+        render_attendance_csv(bookings, guest_entries),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f"attachment;filename={filename}"}
+    )
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import literal, select, union_all
+
+from ..admission import AdmissionError, close_queue, open_queue, queue_to_dict
+from ..archive import include_archived_from_request
+from ..checkin import CheckInError, check_in, checkin_code
+from ..confirmation_codes import booking_by_code_statement
+from ..event_import import EventImportError, export_csv, export_json, import_events, read_rows
+from ..extensions import db
+from ..idempotency import idempotent
+from ..live import STAFF_FIELDS, counts_changed, counts_stream, stream_token, user_id_for_stream_token
+from ..models import ArchivedBooking, Booking, Event, User, WaitlistEntry
+from ..replicas import replica_reads
+from ..security import require_staff
+from ..serializers import (
+    attendance_counts,
+    booking_options_from_request,
+    booking_to_dict,
+    event_to_dict,
+    reserved_guest_counts,
+    stream_bookings_payload,
+    upcoming_events_statement,
+)
+from ..streaming import server_side_chunks
+from ..utils import json_error
+from ..waitlist import waitlist_entry_to_dict
+
+bp = Blueprint("staff", __name__)
+
+
+@bp.get("/api/staff/bookings")
+@require_staff
+def list_all_bookings(current_user: User):
+    # Not on a replica: the chunks below are loaded while the response
+    # streams, after replica_reads would have let go of the replica
+    try:
+        options = booking_options_from_request()
+    except ValueError as exc:
+        return json_error(str(exc))
+    ordered = [_ordered_ids(Booking, False)]
+    if include_archived_from_request():
+        ordered.append(_ordered_ids(ArchivedBooking, True))
+    rows = union_all(*ordered).subquery()
+    statement = select(rows.c.id, rows.c.archived, rows.c.event_id).order_by(
+        rows.c.starts_at.desc(), rows.c.booked_at.desc(), rows.c.id.desc()
+    )
+    events = {}
+    chunks = (_load_bookings(chunk, events) for chunk in server_side_chunks(statement))
+    return Response(stream_with_context(stream_bookings_payload(chunks, **options)), mimetype="application/json")
+
+
+def _ordered_ids(model, archived: bool):
+    return select(
+        model.id.label("id"),
+        literal(archived).label("archived"),
+        model.event_id.label("event_id"),
+        Event.starts_at.label("starts_at"),
+        model.booked_at.label("booked_at"),
+    ).join(Event, Event.id == model.event_id)
+
+
+def _load_bookings(rows, events: dict):
+    """The bookings (live or archived) for ``(id, archived, event_id)``
+    rows, in order.
+
+    ``events`` keeps the events loaded for earlier chunks, so each is
+    loaded once; bookings then find theirs in the session without a join.
+    """
+    missing = {event_id for _, _, event_id in rows} - events.keys()
+    if missing:
+        events.update((event.id, event) for event in Event.query.filter(Event.id.in_(missing)))
+    loaded = {}
+    for model, archived in ((Booking, False), (ArchivedBooking, True)):
+        ids = [booking_id for booking_id, is_archived, _ in rows if bool(is_archived) == archived]
+        if ids:
+            for booking in model.query.filter(model.id.in_(ids)):
+                loaded[booking.id, archived] = booking
+    # Bookings archived (ids are kept) since the ids were read
+    moved = [booking_id for booking_id, archived, _ in rows if not archived and (booking_id, False) not in loaded]
+    if moved:
+        for booking in ArchivedBooking.query.filter(ArchivedBooking.id.in_(moved)):
+            loaded[booking.id, False] = booking
+    # Anything deleted meanwhile is left out
+    return [
+        loaded[booking_id, bool(archived)] for booking_id, archived, _ in rows
+        if (booking_id, bool(archived)) in loaded
+    ]
+
+
+@bp.get("/api/staff/events/upcoming")
+@replica_reads
+@require_staff
+def list_upcoming_events(current_user: User):
+    events = db.session.scalars(upcoming_events_statement(datetime.utcnow())).all()
+
+    event_ids = [event.id for event in events]
+    counts = attendance_counts(event_ids)
+    reserved = reserved_guest_counts(event_ids)
+    payload = []
+    for event in events:
+        confirmed, checked_in = counts.get(event.id, (0, 0))
+        payload.append({
+            **event_to_dict(event, reserved=reserved.get(event.id, 0)),
+            "booked_count": confirmed,
+            "held_count": reserved.get(event.id, 0) - confirmed,
+            "checked_in_count": checked_in,
+        })
+
+    return jsonify(payload)
+
+
+@bp.get("/api/staff/events/live")
+def live_event_attendance():
+    """The live counts stream with ``booked_count`` and ``checked_in_count``
+    as well as ``spots_left``.
+
+    Takes a bearer token, or (for ``EventSource``, which cannot send
+    headers) ``?token=`` from ``POST /api/staff/events/live/token``.
+    """
+    if "token" not in request.args:
+        return require_staff(lambda current_user: counts_stream(STAFF_FIELDS))()
+    user_id = user_id_for_stream_token(request.args["token"])
+    user = db.session.get(User, user_id) if user_id is not None else None
+    if user is None or not user.is_staff:
+        return json_error("Invalid or expired stream token", 401)
+    return counts_stream(STAFF_FIELDS)
+
+
+@bp.post("/api/staff/events/live/token")
+@require_staff
+def live_event_attendance_token(current_user: User):
+    """A short-lived token for opening the staff stream from a browser."""
+    return jsonify({
+        "token": stream_token(current_user.id),
+        "expires_in": current_app.config["LIVE_TOKEN_SECONDS"],
+    })
+
+
+@bp.put("/api/staff/events/<int:event_id>/queue")
+@require_staff
+def open_event_queue(current_user: User, event_id: int):
+    """Put an event behind a waiting room that admits ``rate_per_second`` clients."""
+    payload = request.get_json(silent=True) or {}
+    try:
+        rate = float(payload.get("rate_per_second"))
+    except (TypeError, ValueError):
+        return json_error("Rate per second must be a number")
+    if not 0 < rate <= 1000:
+        return json_error("Rate per second must be between 0 and 1000")
+    try:
+        queue = open_queue(event_id, rate)
+    except AdmissionError as exc:
+        return json_error(exc.message, exc.status)
+    return jsonify(queue_to_dict(queue))
+
+
+@bp.delete("/api/staff/events/<int:event_id>/queue")
+@require_staff
+def close_event_queue(current_user: User, event_id: int):
+    close_queue(event_id)
+    return "", 204
+
+
+@bp.get("/api/staff/events/<int:event_id>/waitlist")
+@require_staff
+def event_waitlist(current_user: User, event_id: int):
+    entries = (
+        WaitlistEntry.query.filter_by(event_id=event_id, status="waiting")
+        .order_by(WaitlistEntry.created_at, WaitlistEntry.id)
+        .all()
+    )
+    return jsonify([
+        waitlist_entry_to_dict(entry, position=position)
+        for position, entry in enumerate(entries, start=1)
+    ])
+
+
+@bp.post("/api/staff/checkin")
+@idempotent
+@require_staff
+def staff_checkin(current_user: User):
+    try:
+        confirmation_code = checkin_code(request.get_json(silent=True) or {})
+        booking = db.session.scalar(booking_by_code_statement(confirmation_code))
+        check_in(booking)
+    except CheckInError as exc:
+        return json_error(exc.message, exc.status)
+    db.session.commit()
+    counts_changed([booking.event_id])
+    return jsonify(booking_to_dict(booking))
+
+
+@bp.post("/api/staff/events/import")
+@require_staff
+def import_event_programme(current_user: User):
+    """Create many events from CSV or JSON; failing rows are reported and skipped.
+
+    ``?dry_run=1`` validates without saving.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        body = upload.read().decode("utf-8", errors="replace")
+        content_type = "text/csv" if (upload.filename or "").lower().endswith(".csv") else upload.mimetype
+    else:
+        body = request.get_data(as_text=True)
+        content_type = request.mimetype
+    dry_run = request.args.get("dry_run") in {"1", "true", "True"}
+    try:
+        created, errors = import_events(read_rows(body, content_type), dry_run=dry_run)
+    except EventImportError as exc:
+        return json_error(exc.message, exc.status)
+
+    if dry_run or not created:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    payload = {
+        "created": 0 if dry_run else created,
+        "valid": created,
+        "errors": [{"row": row, "message": message} for row, message in errors.items()],
+    }
+    if not created:
+        payload["message"] = "No events could be imported"
+        return jsonify(payload), 400
+    return jsonify(payload), 200 if dry_run else 201
+
+
+@bp.get("/api/staff/events/export")
+@require_staff
+def export_event_programme(current_user: User):
+    """Stream events as CSV (default) or JSON, optionally between ``from`` and ``to``."""
+    export_format = request.args.get("format", "csv")
+    if export_format not in {"csv", "json"}:
+        return json_error("Format must be csv or json")
+    query = Event.query
+    try:
+        if request.args.get("from"):
+            query = query.filter(Event.starts_at >= datetime.fromisoformat(request.args["from"]))
+        if request.args.get("to"):
+            query = query.filter(Event.starts_at < datetime.fromisoformat(request.args["to"]))
+    except ValueError:
+        return json_error("Invalid date format")
+    events = query.order_by(Event.starts_at, Event.id).yield_per(500)
+
+    if export_format == "json":
+        return Response(stream_with_context(export_json(events)), mimetype="application/json")
+    return Response(
+        stream_with_context(export_csv(events)),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment;filename=events.csv"},
+    )
@@ -0,0 +1,212 @@
+"""iCalendar (``.ics``) feeds for calendar subscriptions.
+
+Calendar apps poll every few minutes, almost always for a feed that has
+not changed, so each feed is served as a conditional response. Its ETag
+comes from a fingerprint of the rows it covers, read with one aggregate
+query (row count, latest id, ``updated_at`` and the sum of the events'
+``version`` counters, which catch edits within the same second). A client
+whose ETag still matches gets a 304 without the feed being built, and
+rendered feeds are kept in an in-process LRU keyed by feed and host (the
+host is part of each event's UID) and checked against the ETag. The ETag
+is weak, since the same feed is sent both compressed and uncompressed.
+
+Each worker also skips the fingerprint query for ``CALENDAR_CHECK_SECONDS``
+after the last one, unless this process has itself committed a change to
+events, bookings, locations or categories since (tracked with
+:func:`delapre.changes.on_commit`). Changes made by other workers therefore show up within that
+many seconds.
+
+Personal feeds are addressed by a signed token in the URL instead of a
+bearer token, because calendar apps cannot send headers. The token also
+signs the user's ``calendar_feed_version``; bumping it (``POST
+/api/calendar/feed/rotate``) revokes every URL handed out before.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import func, select
+
+from .changes import on_commit
+from .extensions import db
+from .models import Booking, Category, Event, Location, User
+
+PRODID = "-//Delapre Abbey//Events//EN"
+TRACKED_MODELS = (Event, Booking, Location, Category)
+
+# Bumped after each commit in this process that touches a tracked model
+_generation = 0
+
+
+class FeedCache:
+    """LRU of ``feed key -> (fingerprint, generation, checked_at, etag, body)``."""
+
+    def __init__(self, size: int, check_seconds: float):
+        self.size = size
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def etag(self, key: str, fingerprint) -> str:
+        """The feed's current ETag; ``fingerprint()`` is only called when due."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[1] == _generation and now - entry[2] < self.check_seconds:
+            return entry[3]
+        generation = _generation
+        value = repr(fingerprint())
+        etag = hashlib.sha1(f"{key}|{value}".encode()).hexdigest()
+        with self._lock:
+            body = entry[4] if entry is not None and entry[3] == etag else None
+            self._store(key, (value, generation, now, etag, body))
+        return etag
+
+    def body(self, key: str, etag: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] == etag:
+                return entry[4]
+        return None
+
+    def store_body(self, key: str, etag: str, body: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] == etag:
+                self._store(key, entry[:4] + (body,))
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+
+def feed_cache() -> FeedCache:
+    extensions = current_app.extensions
+    if "calendar_feeds" not in extensions:
+        config = current_app.config
+        extensions["calendar_feeds"] = FeedCache(config["CALENDAR_CACHE_SIZE"], config["CALENDAR_CHECK_SECONDS"])
+    return extensions["calendar_feeds"]
+
+
+def _bump_generation():
+    global _generation
+    _generation += 1
+
+
+on_commit(TRACKED_MODELS, _bump_generation)
+
+
+def _serializer() -> URLSafeSerializer:
+    return URLSafeSerializer(current_app.config["JWT_SECRET"], salt="calendar-feed")
+
+
+def feed_token(user: User) -> str:
+    return _serializer().dumps([user.id, user.calendar_feed_version or 0])
+
+
+def user_id_for_token(token: str):
+    """The user the token was issued to, or ``None`` if it is forged or revoked."""
+    try:
+        payload = _serializer().loads(token)
+    except BadSignature:
+        return None
+    # Tokens issued before feed versions carried only the user id
+    if isinstance(payload, int):
+        payload = [payload, 0]
+    if not (isinstance(payload, list) and len(payload) == 2 and all(isinstance(part, int) for part in payload)):
+        return None
+    user_id, version = payload
+    current = db.session.scalar(select(User.calendar_feed_version).where(User.id == user_id))
+    return user_id if current is not None and current == version else None
+
+
+def event_fingerprint(since: datetime, **filters):
+    return db.session.query(
+        func.count(Event.id), func.max(Event.id), func.max(Event.updated_at), func.sum(Event.version)
+    ).filter(Event.starts_at >= since).filter_by(**filters).one()
+
+
+def booking_fingerprint(user_id: int, since: datetime):
+    return (
+        db.session.query(
+            func.count(Booking.id),
+            func.max(Booking.id),
+            func.max(Booking.cancelled_at),
+            func.max(Event.updated_at),
+            func.sum(Event.version),
+        )
+        .join(Event)
+        .filter(Booking.user_id == user_id, Event.starts_at >= since)
+        .one()
+    )
+
+
+def _escape(text) -> str:
+    return (
+        str(text or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _fold(line: str) -> str:
+    """Split content lines longer than 75 octets (RFC 5545, 3.1)."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, start = [], 0
+    while start < len(encoded):
+        end = min(start + (75 if not parts else 74), len(encoded))
+        # Do not split a UTF-8 sequence
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+    return "\r\n ".join(parts)
+
+
+def _stamp(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def render_calendar(name: str, events, host: str = "delapre") -> str:
+    """A VCALENDAR with one VEVENT per event, in floating local time."""
+    now = _stamp(datetime.utcnow()) + "Z"
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(name)}",
+    ]
+    for event in events:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:event-{event.id}@{host}",
+            f"DTSTAMP:{now}",
+            f"DTSTART:{_stamp(event.starts_at)}",
+            f"DTEND:{_stamp(event.ends_at)}",
+            f"SUMMARY:{_escape(event.title)}",
+            f"DESCRIPTION:{_escape(event.description)}",
+        ]
+        if event.location is not None:
+            lines.append(f"LOCATION:{_escape(event.location.name)}")
+        if event.category is not None:
+            lines.append(f"CATEGORIES:{_escape(event.category.name)}")
+        if event.updated_at is not None:
+            lines.append(f"LAST-MODIFIED:{_stamp(event.updated_at)}Z")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
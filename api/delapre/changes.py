@@ -0,0 +1,53 @@
+"""Callbacks run after this process commits changes to given models.
+
+The in-process caches (calendar feeds, catalogue snapshots, locations and
+categories) must notice their own worker's writes straight away. Each
+registers with :func:`on_commit`; one set of session listeners notes
+which registrations a flush or bulk ``insert``/``update``/``delete``
+touched, runs their callbacks once the transaction commits and forgets
+them if it rolls back.
+"""
+from __future__ import annotations
+
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+_CHANGED = "changed_hooks"
+
+# [(models, callback)] in registration order
+_hooks = []
+
+
+def on_commit(models, callback):
+    """Call ``callback()`` after each commit that changed any of ``models``."""
+    _hooks.append((tuple(models), callback))
+    return callback
+
+
+def _note(session, cls):
+    for index, (models, _) in enumerate(_hooks):
+        if issubclass(cls, models):
+            session.info.setdefault(_CHANGED, set()).add(index)
+
+
+@sa_event.listens_for(Session, "after_flush")
+def _note_flushed_changes(session, flush_context):
+    for cls in {type(obj) for obj in (*session.new, *session.dirty, *session.deleted)}:
+        _note(session, cls)
+
+
+@sa_event.listens_for(Session, "do_orm_execute")
+def _note_bulk_changes(state):
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is not None:
+        _note(state.session, state.bind_mapper.class_)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _run_callbacks(session):
+    for index in sorted(session.info.pop(_CHANGED, ())):
+        _hooks[index][1]()
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _forget_changes(session):
+    session.info.pop(_CHANGED, None)
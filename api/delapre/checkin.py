@@ -0,0 +1,42 @@
+"""Staff check-in by confirmation code.
+
+Shared by the Flask view and the native one in :mod:`delapre.asgi`,
+which only differ in how they load the booking (sync or asyncio session)
+and commit.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from .confirmation_codes import is_valid_code, normalize_code
+from .reservations import BookingError
+
+
+class CheckInError(BookingError):
+    pass
+
+
+def checkin_code(payload: dict) -> str:
+    """The normalized confirmation code from a check-in request body."""
+    code = normalize_code(payload.get("confirmation_code") or "")
+    if not code:
+        raise CheckInError("Confirmation code is required")
+    # Mistyped or misread codes fail the check character without a query
+    if not is_valid_code(code):
+        raise CheckInError("Invalid confirmation code")
+    return code
+
+
+def check_in(booking) -> None:
+    """Mark ``booking`` (``None`` if no booking has the code) as checked in.
+
+    Raises :class:`CheckInError` if it cannot be; the caller commits.
+    """
+    if booking is None:
+        raise CheckInError("Booking not found", 404)
+    if booking.status != "confirmed":
+        raise CheckInError("Booking is not confirmed", 409)
+    if booking.checked_in:
+        raise CheckInError("Booking already checked in", 409)
+    booking.checked_in = True
+    booking.checked_in_at = datetime.utcnow()
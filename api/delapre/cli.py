@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .admission import forget_used_tokens
+from .archive import archive_bookings
+from .extensions import db
+from .guests import migrate_guest_names
+from .holds import sweep_expired_holds
+from .idempotency import purge_expired_keys
+from .models import Booking, Event
+from .notifications import deliver_pending
+from .query_plans import explain_hot_queries
+from .schema import ensure_indexes
+from .snapshots import snapshot_publisher
+
+
+@click.command("send-reminders")
+@with_appcontext
+def send_reminders():
+    """Generates TXT notification files for events in the next 24 hours."""
+    now = datetime.now()
+    tomorrow = now + timedelta(days=1)
+    
+    # Query pending confirmations in the next 24 hours
+    upcoming_bookings = Booking.query.join(Event).filter(
+        Event.starts_at >= now,
+        Event.starts_at <= tomorrow,
+        Booking.status == 'confirmed'
+    ).all()
+    
+    if not upcoming_bookings:
+        print("No upcoming events in the next 24 hours.")
+        return
+
+    notifications_dir = current_app.config["NOTIFICATIONS_DIR"]
+    if not os.path.exists(notifications_dir):
+        os.makedirs(notifications_dir)
+
+    for booking in upcoming_bookings:
+        # Determine recipient and opt-in
+        if booking.user:
+            # Respect user preferences
+            if not booking.user.email_opt_in:
+                continue
+            email = booking.user.email
+            name = f"{booking.user.first_name} {booking.user.last_name}"
+        else:
+            # Guest booking
+            email = booking.guest_email
+            name = booking.guest_name or "Guest"
+
+        if not email:
+            continue
+
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        filename = f"notification_{booking.id}_{timestamp}.txt"
+        filepath = os.path.join(notifications_dir, filename)
+        
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(f"Subject: Reminder: {booking.event.title} is coming up soon!\n\n")
+            f.write(f"Hello {name},\n\n")
+            f.write(f"This is a reminder that you have a booking for '{booking.event.title}'.\n")
+            f.write(f"When: {booking.event.starts_at.strftime('%A, %d %B at %H:%M')}\n")
+            f.write(f"Where: {booking.event.location.name if booking.event.location else 'Delapre Abbey'}\n\n")
+            f.write("We look forward to seeing you there!\n\n")
+            f.write("Best regards,\n")
+            f.write("Delapre Abbey Events Team")
+            
+        print(f"Generated notification for {email}: {filename}")
+
+
+@click.command("sweep-holds")
+@click.option("--batch-size", type=int, default=None, help="Rows deleted per statement.")
+@click.option("--interval", type=float, default=0, help="Keep running, sweeping every N seconds.")
+@with_appcontext
+def sweep_holds(batch_size, interval):
+    """Deletes expired seat holds and spent queue tokens in batches."""
+    batch_size = batch_size or current_app.config["SEAT_HOLD_SWEEP_BATCH"]
+    while True:
+        released = sweep_expired_holds(batch_size)
+        print(f"Released {released} expired seat hold(s).")
+        forgotten = forget_used_tokens(batch_size)
+        print(f"Forgot {forgotten} used queue token(s).")
+        if not interval:
+            return
+        time.sleep(interval)
+
+
+@click.command("send-notifications")
+@click.option("--batch-size", type=int, default=100, help="Notifications sent per transaction.")
+@with_appcontext
+def send_notifications(batch_size):
+    """Delivers queued notifications from the outbox."""
+    sent = deliver_pending(batch_size)
+    print(f"Sent {sent} notification(s).")
+
+
+@click.command("purge-idempotency-keys")
+@click.option("--batch-size", type=int, default=1000, help="Rows deleted per statement.")
+@with_appcontext
+def purge_idempotency_keys(batch_size):
+    """Deletes expired Idempotency-Key responses in batches."""
+    deleted = purge_expired_keys(batch_size)
+    print(f"Deleted {deleted} expired idempotency key(s).")
+
+
+@click.command("migrate-guest-names")
+@click.option("--batch-size", type=int, default=1000, help="Bookings moved per transaction.")
+@with_appcontext
+def migrate_guest_names_command(batch_size):
+    """Moves guest_names JSON into the booking_guests table."""
+    moved = migrate_guest_names(batch_size)
+    print(f"Moved the guests of {moved} booking(s).")
+
+
+@click.command("archive")
+@click.option("--older-than-days", type=int, default=None, help="Archive events that ended this many days ago.")
+@click.option("--batch-size", type=int, default=1000, help="Bookings moved per transaction.")
+@click.option("--pause", type=float, default=0, help="Seconds to wait between batches.")
+@with_appcontext
+def archive_command(older_than_days, batch_size, pause):
+    """Moves bookings for long-finished events into the archive tables."""
+    if older_than_days is None:
+        older_than_days = current_app.config["ARCHIVE_AFTER_DAYS"]
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    moved = archive_bookings(cutoff, batch_size, pause)
+    print(f"Archived {moved} booking(s) for events that ended before {cutoff:%Y-%m-%d}.")
+
+
+@click.command("explain-hot-queries")
+@with_appcontext
+def explain_hot_queries_command():
+    """Fails if EXPLAIN shows a full table scan in any hot query."""
+    try:
+        scans = explain_hot_queries()
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    failed = 0
+    for name, tables in scans.items():
+        if tables:
+            failed += 1
+            print(f"FULL SCAN  {name}: {', '.join(tables)}")
+        else:
+            print(f"ok         {name}")
+    if failed:
+        raise click.ClickException(f"{failed} hot quer{'y' if failed == 1 else 'ies'} without a usable index.")
+
+
+@click.command("ensure-indexes")
+@with_appcontext
+def ensure_indexes_command():
+    """Creates indexes declared on the models but missing from the database."""
+    created = ensure_indexes()
+    for name in created:
+        print(f"Created index {name}.")
+    print(f"Created {len(created)} missing index(es).")
+
+
+@click.command("publish-snapshots")
+@click.option("--interval", type=float, default=0, help="Keep running, publishing every N seconds.")
+@with_appcontext
+def publish_snapshots(interval):
+    """Renders the public catalogue to static JSON files in SNAPSHOT_DIR."""
+    publisher = snapshot_publisher()
+    if publisher is None:
+        raise click.ClickException("SNAPSHOT_DIR is not set.")
+    while True:
+        print(f"Published catalogue snapshot {publisher.publish()}.")
+        # End the read transaction so the next run sees new data
+        db.session.remove()
+        if not interval:
+            return
+        time.sleep(interval)
+
+
+def register_commands(app):
+    app.cli.add_command(send_reminders)
+    app.cli.add_command(sweep_holds)
+    app.cli.add_command(send_notifications)
+    app.cli.add_command(purge_idempotency_keys)
+    app.cli.add_command(migrate_guest_names_command)
+    app.cli.add_command(archive_command)
+    app.cli.add_command(explain_hot_queries_command)
+    app.cli.add_command(ensure_indexes_command)
+    app.cli.add_command(publish_snapshots)
@@ -0,0 +1,130 @@
+"""gzip / brotli compression for JSON, CSV and calendar responses.
+
+Responses of those types are compressed when the client accepts it and
+the body is at least ``COMPRESSION_MIN_BYTES``; brotli is preferred when
+the ``brotli`` package is installed and the client lists ``br`` at least
+as highly as ``gzip``. Streamed responses (exports) are compressed chunk
+by chunk and flushed after each one, so the first rows still arrive
+before the last are read. Responses that already carry a
+``Content-Encoding`` (e.g. pre-compressed snapshots) are left alone.
+A strong ``ETag`` on a response that gets compressed is made weak, since
+it no longer matches the bytes of the uncompressed body.
+"""
+from __future__ import annotations
+
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/csv", "text/calendar"}
+
+
+def choose_encoding(accept_encodings):
+    """``"br"``, ``"gzip"`` or ``None`` for an ``Accept-Encoding`` header."""
+    gzip_quality = accept_encodings.quality("gzip")
+    if brotli is not None:
+        br_quality = accept_encodings.quality("br")
+        if br_quality and br_quality >= gzip_quality:
+            return "br"
+    return "gzip" if gzip_quality else None
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        # wbits 16 + 15: zlib's deflate with a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def _compressor(encoding: str, config):
+    if encoding == "br":
+        return _Brotli(config["COMPRESSION_BROTLI_QUALITY"])
+    return _Gzip(config["COMPRESSION_GZIP_LEVEL"])
+
+
+def compress(data: bytes, encoding: str, config) -> bytes:
+    compressor = _compressor(encoding, config)
+    return compressor.chunk(data) + compressor.finish()
+
+
+def compress_stream(chunks, encoding: str, config):
+    compressor = _compressor(encoding, config)
+    try:
+        for data in chunks:
+            if isinstance(data, str):
+                data = data.encode()
+            if data:
+                yield compressor.chunk(data)
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def init_compression(app):
+    """Register the compressing ``after_request`` hook.
+
+    Call before the other extensions: hooks run in reverse order of
+    registration, so this one sees the final body.
+    """
+    config = app.config
+    if not config["COMPRESSION_ENABLED"]:
+        return
+
+    @app.after_request
+    def _compress(response):
+        if (
+            response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or response.status_code < 200
+            or response.status_code in {204, 206, 304}
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+        if response.is_streamed:
+            encoding = choose_encoding(request.accept_encodings)
+            response.vary.add("Accept-Encoding")
+            if encoding is not None:
+                response.response = compress_stream(response.response, encoding, config)
+                response.headers.pop("Content-Length", None)
+                response.headers["Content-Encoding"] = encoding
+                _weaken_etag(response)
+            return response
+        data = response.get_data()
+        if len(data) < config["COMPRESSION_MIN_BYTES"]:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is not None:
+            response.set_data(compress(data, encoding, config))
+            response.headers["Content-Encoding"] = encoding
+            _weaken_etag(response)
+        return response
+
+
+def _weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
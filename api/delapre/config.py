@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import os
+
+
+def database_uri_from_env() -> str:
+    if os.getenv("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
+    db_user = os.getenv("DB_USER", "delapre_user")
+    db_pass = os.getenv("DB_PASS", "delapre_password")
+    db_host = os.getenv("DB_HOST", "db")
+    db_port = os.getenv("DB_PORT", "3306")
+    db_name = os.getenv("DB_NAME", "delapre_events")
+    return f"mysql+pymysql://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = database_uri_from_env()
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    JWT_SECRET = os.getenv("JWT_SECRET", "change_me")
+    # Reverse proxies in front of the API that append X-Forwarded-For and
+    # X-Forwarded-Proto. Client addresses (rate limits, login throttling,
+    # anonymous holds) are read from those headers, so leave this at 0
+    # when clients reach the API directly or they could pick their own.
+    TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "0"))
+    # Browser origins allowed to call the API with credentials
+    # (comma-separated; "*" allows any, entries may be regular expressions).
+    # Applied by flask-cors and by the ASGI hot paths alike.
+    CORS_ORIGINS = [
+        origin.strip() for origin in os.getenv("CORS_ORIGINS", "*").split(",") if origin.strip()
+    ]
+
+    # Optional read replicas (comma-separated URIs). Catalogue and report
+    # endpoints read from them; everything else uses the primary.
+    SQLALCHEMY_REPLICA_URIS = [
+        uri.strip() for uri in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if uri.strip()
+    ]
+    # Send a caller back to the primary for this long after they write
+    # (on any worker, if they echo the X-Last-Write response header)
+    REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+    # Skip replicas reporting more lag than this
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+    # How long a replica health/lag probe result is trusted
+    REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+    # Callable(conn) -> lag in seconds; defaults to SHOW REPLICA STATUS on MySQL
+    REPLICA_LAG_PROBE = None
+
+    # Blueprints to register; a read-only catalogue worker can run with
+    # just ("catalogue",) and never import the booking or PDF code.
+    BLUEPRINTS = tuple(
+        name.strip()
+        for name in os.getenv(
+            "API_BLUEPRINTS", "catalogue,auth,bookings,staff,documents,calendar"
+        ).split(",")
+        if name.strip()
+    )
+
+    # Create tables, patch legacy MySQL columns and seed the staff user
+    # when the app is created.
+    PREPARE_DATABASE = os.getenv("PREPARE_DATABASE", "1") not in {"0", "false", "False"}
+    SEED_STAFF_USER = True
+
+    # "auto" uses orjson when installed, "default" forces Flask's encoder
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "auto")
+
+    # Request timing, SQL query counting, Server-Timing headers and the
+    # Prometheus text endpoint (set METRICS_PATH to "" to hide it).
+    INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "1") not in {"0", "false", "False"}
+    SERVER_TIMING_HEADER = True
+    METRICS_PATH = os.getenv("METRICS_PATH", "/metrics")
+    # The endpoint is only served to scrapers sending this bearer token or
+    # connecting from one of these (comma-separated) addresses; with
+    # neither set it is not served at all.
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    METRICS_ALLOWED_ADDRESSES = tuple(
+        address.strip() for address in os.getenv("METRICS_ALLOWED_ADDRESSES", "").split(",") if address.strip()
+    )
+    # Log statements at least this slow; 0 or "" disables the slow-query log
+    SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200") or 0)
+
+    # Minutes a cart keeps its seats before they are released again, and
+    # how many expired holds ``flask sweep-holds`` deletes per statement.
+    SEAT_HOLD_MINUTES = int(os.getenv("SEAT_HOLD_MINUTES", "10"))
+    SEAT_HOLD_SWEEP_BATCH = int(os.getenv("SEAT_HOLD_SWEEP_BATCH", "500"))
+    # Most seats one user (or, signed out, one address) may hold per event
+    # at once; 0 for no limit
+    HOLD_MAX_SEATS_PER_CALLER = int(os.getenv("HOLD_MAX_SEATS_PER_CALLER", "8"))
+
+    # Waiting rooms: how long an admitted queue token stays valid, how often
+    # each worker re-reads which events have a queue, and how many worker
+    # processes share an event's admission rate.
+    ADMISSION_WINDOW_SECONDS = int(os.getenv("ADMISSION_WINDOW_SECONDS", "900"))
+    ADMISSION_CONFIG_TTL = float(os.getenv("ADMISSION_CONFIG_TTL", "5"))
+    ADMISSION_WORKERS = int(os.getenv("ADMISSION_WORKERS", "1"))
+
+    # Idempotency-Key replay: how long stored responses are kept, how many
+    # each worker keeps in memory, and when an unfinished first attempt is
+    # considered abandoned.
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "2048"))
+    IDEMPOTENCY_PENDING_TIMEOUT = 60
+
+    # ``flask archive`` moves bookings for events that ended more than this
+    # many days ago into the archive tables.
+    ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+
+    # Key for the permutation that turns code sequence numbers into
+    # confirmation codes. Changing it once bookings exist can re-issue
+    # codes that are already in use.
+    CONFIRMATION_CODE_KEY = os.getenv("CONFIRMATION_CODE_KEY", "delapre-confirmation-codes")
+
+    # Password hashing: werkzeug method string (hashes made with other
+    # settings are upgraded at login), hashing threads per process, hashes
+    # allowed to wait for a thread before logins get a 503, and the longest
+    # a request waits for its hash.
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+    PASSWORD_HASH_TIMEOUT = 10
+    # Failed logins allowed per email and per client address within the
+    # window (seconds) before further attempts get a 429.
+    LOGIN_THROTTLE_WINDOW = int(os.getenv("LOGIN_THROTTLE_WINDOW", "900"))
+    LOGIN_MAX_FAILURES_PER_EMAIL = int(os.getenv("LOGIN_MAX_FAILURES_PER_EMAIL", "5"))
+    LOGIN_MAX_FAILURES_PER_ADDRESS = int(os.getenv("LOGIN_MAX_FAILURES_PER_ADDRESS", "50"))
+
+    # Token-bucket rate limits (see delapre.ratelimit). Buckets are kept in
+    # process memory, or shared through Redis with a redis:// URL.
+    RATE_LIMITS_ENABLED = os.getenv("RATE_LIMITS_ENABLED", "1") not in {"0", "false", "False"}
+    RATE_LIMIT_STORAGE = os.getenv("RATE_LIMIT_STORAGE", "memory://")
+    # endpoint -> {"ip" | "user" | "route": (tokens per second, burst)}
+    RATE_LIMITS = {
+        "auth.login_user": {"ip": (0.5, 20)},
+        "auth.register_user": {"ip": (0.1, 10)},
+        "bookings.create_booking": {"user": (1, 10)},
+        "bookings.create_booking_batch": {"user": (1, 10)},
+        "bookings.create_guest_booking": {"ip": (0.2, 10), "route": (50, 200)},
+        "bookings.create_guest_booking_batch": {"ip": (0.2, 10), "route": (50, 200)},
+        "bookings.join_event_waitlist_as_guest": {"ip": (0.2, 10)},
+        "bookings.create_hold": {"ip": (1, 30)},
+        "bookings.join_event_queue": {"ip": (1, 20)},
+    }
+    # Buckets for every endpoint not listed above; None for no limit
+    RATE_LIMIT_DEFAULT = {"ip": (20, 200)}
+
+    # Live counts stream (GET /api/events/live): how often changed events
+    # are read and published, how often all upcoming events are re-read to
+    # pick up other workers' writes (0 to never), how long one stream stays
+    # open before the browser reconnects, the keep-alive interval, and how
+    # long a staff page's stream token may wait before it is used. Each
+    # open stream holds a thread, so a worker serves at most
+    # LIVE_MAX_STREAMS at once: keep it well below its thread count (the
+    # ASGI app's WSGI pool has min(32, CPUs + 4) threads) or 0 for no cap.
+    LIVE_PUBLISH_INTERVAL = float(os.getenv("LIVE_PUBLISH_INTERVAL", "0.5"))
+    LIVE_REFRESH_SECONDS = float(os.getenv("LIVE_REFRESH_SECONDS", "15"))
+    LIVE_STREAM_SECONDS = int(os.getenv("LIVE_STREAM_SECONDS", "300"))
+    LIVE_KEEPALIVE_SECONDS = 15
+    LIVE_TOKEN_SECONDS = int(os.getenv("LIVE_TOKEN_SECONDS", "60"))
+    LIVE_MAX_STREAMS = int(os.getenv("LIVE_MAX_STREAMS", "16"))
+
+    # Calendar feeds (.ics): days of past events kept in them, how long
+    # clients may cache them, how often each worker re-checks the database
+    # for changes made elsewhere, and how many rendered feeds it keeps.
+    CALENDAR_PAST_DAYS = int(os.getenv("CALENDAR_PAST_DAYS", "30"))
+    CALENDAR_MAX_AGE = int(os.getenv("CALENDAR_MAX_AGE", "300"))
+    CALENDAR_CHECK_SECONDS = float(os.getenv("CALENDAR_CHECK_SECONDS", "30"))
+    CALENDAR_CACHE_SIZE = 256
+
+    # Response compression (see delapre/compression.py): JSON, CSV and
+    # calendar bodies of at least this many bytes, and streamed exports,
+    # are sent gzip or brotli encoded when the client accepts it.
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") not in {"0", "false", "False"}
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 5
+
+    # Static catalogue snapshots (see delapre/snapshots.py): where they are
+    # published (unset to disable), seconds between the first change and
+    # the next publish, the oldest snapshot the API still serves, and how
+    # many earlier versions are kept for clients still reading them.
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "")
+    SNAPSHOT_DEBOUNCE_SECONDS = float(os.getenv("SNAPSHOT_DEBOUNCE_SECONDS", "2"))
+    SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "60"))
+    SNAPSHOT_KEEP = 2
+
+    # Seconds a worker trusts its cached locations and categories before
+    # checking the tables for changes made by other workers.
+    TAXONOMY_CHECK_SECONDS = float(os.getenv("TAXONOMY_CHECK_SECONDS", "5"))
+
+    # ASGI deployment (see delapre/asgi.py): the async driver URL (derived
+    # from SQLALCHEMY_DATABASE_URI when unset) and its connection pool.
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+    ASYNC_POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", "20"))
+    ASYNC_MAX_OVERFLOW = int(os.getenv("ASYNC_MAX_OVERFLOW", "20"))
+
+    NOTIFICATIONS_DIR = os.getenv(
+        "NOTIFICATIONS_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), "notifications"),
+    )
@@ -0,0 +1,163 @@
+"""Confirmation codes that are unique by construction.
+
+A code is a 40-bit sequence number, scrambled with a keyed Feistel
+permutation so consecutive bookings don't get guessable neighbours,
+written as 8 Crockford base32 characters plus a Luhn mod 32 check
+character (9 in all). The permutation is a bijection, so distinct
+sequence numbers always give distinct codes and nothing has to be
+retried on the unique index.
+
+Sequence numbers come from blocks of :data:`BLOCK_SIZE`: a process
+claims a block by inserting a ``confirmation_code_blocks`` row (the id
+numbers the block) inside the booking's own transaction and hands out
+the rest of the block from memory once that transaction commits. If it
+rolls back, the block is forgotten along with the bookings that used it.
+
+Codes issued before this scheme are 8 hex characters; they are still
+accepted at check-in but have no check character to validate.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import Booking, ConfirmationCodeBlock
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+CODE_LENGTH = 9
+LEGACY_CODE_LENGTH = 8
+# Sequence numbers per claimed block. Part of the numbering scheme, so
+# it must not change once codes have been issued.
+BLOCK_SIZE = 256
+SEQUENCE_BITS = 40
+
+_HALF_BITS = SEQUENCE_BITS // 2
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+# Crockford decoding: letters that are easily misread as digits
+_READ_AS = str.maketrans({"I": "1", "L": "1", "O": "0"})
+_HEX = frozenset("0123456789ABCDEF")
+_PENDING = "confirmation_code_blocks"
+
+
+def check_character(body: str) -> str:
+    """Luhn mod 32 check character for ``body`` (catches any single wrong
+    character and swaps of neighbouring characters)."""
+    factor, total = 2, 0
+    for char in reversed(body):
+        addend = factor * _VALUES[char]
+        total += addend // 32 + addend % 32
+        factor = 3 - factor
+    return ALPHABET[-total % 32]
+
+
+def normalize_code(text: str) -> str:
+    """Upper-case ``text`` and drop spaces and hyphens; new-style codes
+    also get Crockford's I/L -> 1 and O -> 0 substitutions."""
+    code = text.strip().upper().replace("-", "").replace(" ", "")
+    if len(code) == CODE_LENGTH:
+        code = code.translate(_READ_AS)
+    return code
+
+
+def is_valid_code(code: str) -> bool:
+    """Whether a normalized code could have been issued, without a query."""
+    if len(code) == LEGACY_CODE_LENGTH:
+        return _HEX.issuperset(code)
+    if len(code) != CODE_LENGTH or not all(char in _VALUES for char in code):
+        return False
+    return check_character(code[:-1]) == code[-1]
+
+
+def booking_by_code_statement(code: str):
+    """The booking with confirmation code ``code`` (normalized)."""
+    return select(Booking).where(Booking.confirmation_code == code)
+
+
+class CodeAllocator:
+    """Turns sequence numbers into codes and keeps this process's unused
+    sequence numbers from committed blocks."""
+
+    def __init__(self, key: str):
+        secret = hashlib.sha256(key.encode()).digest()
+        self._rounds = [
+            hashlib.blake2b(key=secret, digest_size=3, person=b"delapre-round-%d" % n)
+            for n in range(_ROUNDS)
+        ]
+        self._lock = threading.Lock()
+        self._ranges = []
+
+    def encode(self, sequence: int) -> str:
+        left, right = sequence >> _HALF_BITS, sequence & _HALF_MASK
+        for base in self._rounds:
+            digest = base.copy()
+            digest.update(right.to_bytes(3, "big"))
+            left, right = right, left ^ (int.from_bytes(digest.digest(), "big") & _HALF_MASK)
+        value = (left << _HALF_BITS) | right
+        body = "".join(ALPHABET[(value >> shift) & 31] for shift in range(SEQUENCE_BITS - 5, -1, -5))
+        return body + check_character(body)
+
+    def take(self):
+        with self._lock:
+            while self._ranges:
+                current = self._ranges[0]
+                if current[0] < current[1]:
+                    current[0] += 1
+                    return current[0] - 1
+                self._ranges.pop(0)
+        return None
+
+    def release(self, next_sequence: int, end: int):
+        if next_sequence < end:
+            with self._lock:
+                self._ranges.append([next_sequence, end])
+
+
+def allocator() -> CodeAllocator:
+    extensions = current_app.extensions
+    if "confirmation_codes" not in extensions:
+        extensions["confirmation_codes"] = CodeAllocator(current_app.config["CONFIRMATION_CODE_KEY"])
+    return extensions["confirmation_codes"]
+
+
+def new_confirmation_code() -> str:
+    codes = allocator()
+    sequence = codes.take()
+    if sequence is None:
+        sequence = _take_from_new_block(codes)
+    return codes.encode(sequence)
+
+
+def _take_from_new_block(codes: CodeAllocator) -> int:
+    # Blocks claimed in the current transaction are only ours once it commits
+    pending = db.session.info.setdefault(_PENDING, [])
+    for entry in pending:
+        if entry[0] is codes and entry[1] < entry[2]:
+            entry[1] += 1
+            return entry[1] - 1
+    block = ConfirmationCodeBlock()
+    db.session.add(block)
+    db.session.flush()
+    start = block.id * BLOCK_SIZE
+    if start + BLOCK_SIZE > 1 << SEQUENCE_BITS:
+        raise RuntimeError("Confirmation code space exhausted")
+    pending.append([codes, start + 1, start + BLOCK_SIZE])
+    return start
+
+
+@event.listens_for(Session, "after_commit")
+def _keep_claimed_blocks(session):
+    for codes, next_sequence, end in session.info.pop(_PENDING, ()):
+        codes.release(next_sequence, end)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _forget_claimed_blocks(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING, None)
@@ -0,0 +1,145 @@
+"""Receipt, confirmation and attendance report rendering.
+
+This module pulls in fpdf, qrcode and PIL, so the documents blueprint only
+imports it from the endpoints that produce documents. Keep it out of the
+module-level imports of the API.
+"""
+from __future__ import annotations
+
+import csv
+import io
+
+import qrcode
+from fpdf import FPDF
+
+
+ATTENDANCE_COLUMNS = [
+    "booking_id",
+    "confirmation_code",
+    "attendee",
+    "email",
+    "guest_count",
+    "guest_names",
+    "checked_in",
+    "checked_in_at",
+    "status",
+]
+
+
+def build_confirmation_qr(data: str):
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=6,
+        border=2,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white").convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def _pdf_bytes(pdf: FPDF) -> bytes:
+    output = pdf.output(dest="S")
+    if isinstance(output, bytearray):
+        output = bytes(output)
+    return output
+
+
+def render_receipt_pdf(booking, customer) -> bytes:
+    event = booking.event
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(190, 10, "RECEIPT", ln=True, align="C")
+    pdf.ln(10)
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(190, 10, f"Booking ID: {booking.id}", ln=True)
+    pdf.cell(190, 10, f"Event: {event.title}", ln=True)
+    pdf.cell(190, 10, f"Date: {event.starts_at.strftime('%Y-%m-%d %H:%M')}", ln=True)
+    pdf.cell(190, 10, f"Location: {event.location.name if event.location else 'N/A'}", ln=True)
+    pdf.cell(190, 10, f"Customer: {customer.first_name} {customer.last_name}", ln=True)
+    pdf.ln(5)
+
+    total_price = float(event.price) * booking.guest_count
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(190, 10, f"Total Amount: £{total_price:.2f}", ln=True)
+    pdf.set_font("Arial", "I", 10)
+    pdf.cell(190, 10, "Thank you for your booking with Delapre Abbey!", ln=True)
+    return _pdf_bytes(pdf)
+
+
+def render_confirmation_pdf(booking, attendee) -> bytes:
+    event = booking.event
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 16)
+    pdf.cell(190, 10, "BOOKING CONFIRMATION", ln=True, align="C")
+    pdf.ln(10)
+    pdf.set_font("Arial", "", 12)
+    pdf.cell(190, 10, f"Confirmation Code: {booking.confirmation_code or 'N/A'}", ln=True)
+    if booking.confirmation_code:
+        qr_buffer = build_confirmation_qr(booking.confirmation_code)
+        qr_x = 165
+        qr_y = 22
+        pdf.image(qr_buffer, type="PNG", x=qr_x, y=qr_y, w=35, h=35)
+        pdf.set_xy(10, pdf.get_y())
+        pdf.set_font("Arial", "I", 10)
+        pdf.multi_cell(140, 6, "Scan this code at check-in.")
+        pdf.set_font("Arial", "", 12)
+        pdf.ln(2)
+    pdf.cell(190, 10, f"Event: {event.title}", ln=True)
+    pdf.cell(190, 10, f"Attendee: {attendee.first_name} {attendee.last_name}", ln=True)
+    pdf.cell(190, 10, f"Guests: {booking.guest_count}", ln=True)
+    pdf.ln(5)
+    pdf.multi_cell(190, 10, f"Description: {event.description}")
+    pdf.ln(10)
+    pdf.set_font("Arial", "B", 12)
+    pdf.cell(190, 10, f"Start Time: {event.starts_at.strftime('%Y-%m-%d %H:%M')}", ln=True)
+    pdf.cell(190, 10, f"End Time: {event.ends_at.strftime('%Y-%m-%d %H:%M')}", ln=True)
+    pdf.ln(10)
+    pdf.set_font("Arial", "", 10)
+    pdf.multi_cell(190, 10, "Please bring this confirmation with you (digital or printed) to the event. We look forward to seeing you there!")
+    return _pdf_bytes(pdf)
+
+
+def render_attendance_csv(bookings, guests) -> str:
+    """``guests`` maps booking ids to their guests in the API shape."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(ATTENDANCE_COLUMNS)
+
+    for booking in bookings:
+        if booking.user:
+            attendee = f"{booking.user.first_name} {booking.user.last_name}".strip()
+            email = booking.user.email or ""
+        else:
+            attendee = booking.guest_name or ""
+            email = booking.guest_email or ""
+
+        guest_display = "; ".join(
+            [
+                f"{g.get('name', '')} ({g.get('type', '')})".strip()
+                if isinstance(g, dict)
+                else str(g)
+                for g in guests.get(booking.id, [])
+                if g
+            ]
+        )
+
+        writer.writerow([
+            booking.id,
+            booking.confirmation_code or "",
+            attendee,
+            email,
+            booking.guest_count,
+            guest_display,
+            "yes" if booking.checked_in else "no",
+            booking.checked_in_at.isoformat() if booking.checked_in_at else "",
+            booking.status,
+        ])
+
+    return output.getvalue()
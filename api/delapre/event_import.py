@@ -0,0 +1,300 @@
+"""Bulk event import and export for staff.
+
+An import is validated as a whole before anything is written: locations
+and categories for every row are looked up in the taxonomy cache, overlaps
+with existing events and between the imported rows are found in one
+sweep per location, and the rows that pass are inserted together.
+Rows that fail are reported by number and leave the rest of the batch
+alone.
+
+Rows use the export columns, so an export can be edited and imported
+again (``id`` is ignored). Rows sharing a ``group_id`` become one new
+recurring series.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import uuid
+from bisect import bisect_left
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from .extensions import db
+from .models import Event, Location
+from .streaming import stream_json_array
+from .taxonomy import category_by_id, category_by_name, location_by_id, location_by_name
+
+# Maximum rows in one import
+MAX_IMPORT_ROWS = 2000
+
+EXPORT_COLUMNS = (
+    "id",
+    "title",
+    "description",
+    "starts_at",
+    "ends_at",
+    "location",
+    "category",
+    "capacity",
+    "price",
+    "is_free",
+    "group_id",
+    "recurrence_type",
+)
+
+TRUE_VALUES = {"1", "true", "yes", "y"}
+
+
+class EventImportError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def read_rows(body: str, content_type: str) -> list:
+    """Rows from a CSV or JSON body (a list, or ``{"events": [...]}``)."""
+    if content_type in {"text/csv", "application/csv"}:
+        rows = list(csv.DictReader(io.StringIO(body.lstrip("\ufeff"))))
+    else:
+        try:
+            rows = json.loads(body)
+        except json.JSONDecodeError:
+            raise EventImportError("Send the events as CSV or JSON")
+        if isinstance(rows, dict):
+            rows = rows.get("events")
+        if not isinstance(rows, list):
+            raise EventImportError("Events must be a list")
+    if not rows:
+        raise EventImportError("No events to import")
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise EventImportError(f"Cannot import more than {MAX_IMPORT_ROWS} events at once")
+    return rows
+
+
+def _text(row, name) -> str:
+    value = row.get(name)
+    return "" if value is None else str(value).strip()
+
+
+def _flag(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def parse_row(row) -> dict:
+    """Validate one row; location and category are resolved later."""
+    if not isinstance(row, dict):
+        raise EventImportError("Row must be an object")
+    title = _text(row, "title")
+    if not title:
+        raise EventImportError("Title is required")
+    try:
+        starts_at = datetime.fromisoformat(_text(row, "starts_at"))
+        ends_at = datetime.fromisoformat(_text(row, "ends_at"))
+    except ValueError:
+        raise EventImportError("Invalid date format")
+    if ends_at <= starts_at:
+        raise EventImportError("End time must be after start time")
+    location = _text(row, "location_id") or _text(row, "location")
+    if not location:
+        raise EventImportError("Location is required")
+    try:
+        capacity = int(_text(row, "capacity") or 0)
+    except ValueError:
+        raise EventImportError("Capacity must be a number")
+    if capacity < 0:
+        raise EventImportError("Capacity cannot be negative")
+    try:
+        price = float(_text(row, "price") or 0)
+    except ValueError:
+        raise EventImportError("Price must be a number")
+    is_free = _flag(row["is_free"]) if _text(row, "is_free") else price == 0
+    if is_free:
+        price = 0.0
+    group = _text(row, "group_id")
+    return {
+        "title": title[:255],
+        "description": _text(row, "description") or "No description provided.",
+        "starts_at": starts_at,
+        "ends_at": ends_at,
+        "location": location,
+        "category": _text(row, "category_id") or _text(row, "category"),
+        "capacity": capacity,
+        "price": price,
+        "is_free": is_free,
+        "group": group,
+        "recurrence_type": (_text(row, "recurrence_type").lower() or "weekly") if group else None,
+    }
+
+
+def _taxonomy_ids(keys, by_id, by_name) -> dict:
+    """``{lower-cased key: id or None}`` for ids and case-insensitive names.
+
+    An all-digit key is tried as an id first and then as a name, since
+    names such as "2024" are allowed.
+    """
+    ids = {}
+    for key in keys:
+        row_id = by_id(int(key)) if key.isdigit() else None
+        ids[key.lower()] = row_id if row_id is not None else by_name(key)
+    return ids
+
+
+def _resolve_taxonomy(parsed, errors):
+    locations = _taxonomy_ids({item["location"] for item in parsed.values()}, location_by_id, location_by_name)
+    categories = _taxonomy_ids(
+        {item["category"] for item in parsed.values() if item["category"]}, category_by_id, category_by_name
+    )
+
+    # Unknown location names are created, as POST /api/events does
+    new_names = {}
+    for item in parsed.values():
+        key = item["location"]
+        if locations.get(key.lower()) is None and not key.isdigit():
+            new_names.setdefault(key.lower(), key)
+    if new_names:
+        created = [Location(name=name[:255]) for name in new_names.values()]
+        db.session.add_all(created)
+        db.session.flush()
+        locations.update((location.name.lower(), location.id) for location in created)
+
+    for row, item in list(parsed.items()):
+        item["location_id"] = locations.get(item["location"].lower())
+        if item["location_id"] is None:
+            errors[row] = "Invalid location id"
+        elif item["category"]:
+            item["category_id"] = categories.get(item["category"].lower())
+            if item["category_id"] is None:
+                errors[row] = f"Unknown category: {item['category']}"
+        else:
+            item["category_id"] = None
+        if row in errors:
+            del parsed[row]
+
+
+def overlapping_events_statement(location_ids, starts_at, ends_at):
+    """``(id, location_id, starts_at, ends_at)`` of events at ``location_ids``
+    overlapping the given times, earliest first."""
+    return (
+        select(Event.id, Event.location_id, Event.starts_at, Event.ends_at)
+        .where(Event.location_id.in_(location_ids), Event.starts_at < ends_at, Event.ends_at > starts_at)
+        .order_by(Event.starts_at)
+    )
+
+
+def _find_conflicts(parsed, errors):
+    """Flag rows overlapping an existing event or an earlier-starting row."""
+    by_location = {}
+    for row, item in parsed.items():
+        by_location.setdefault(item["location_id"], []).append(row)
+    starts = min(item["starts_at"] for item in parsed.values())
+    ends = max(item["ends_at"] for item in parsed.values())
+    existing = {}
+    for event_id, location_id, starts_at, ends_at in db.session.execute(
+        overlapping_events_statement(by_location, starts, ends)
+    ):
+        existing.setdefault(location_id, []).append((starts_at, ends_at, event_id))
+
+    for location_id, rows in by_location.items():
+        events = existing.get(location_id, [])
+        event_starts = [start for start, _, _ in events]
+        # Latest end (and its event) among events starting before each index
+        latest = []
+        for start, end, event_id in events:
+            latest.append(max(latest[-1], (end, event_id)) if latest else (end, event_id))
+        accepted_end, accepted_row = None, None
+        for row in sorted(rows, key=lambda r: (parsed[r]["starts_at"], r)):
+            item = parsed[row]
+            before = bisect_left(event_starts, item["ends_at"])
+            if before and latest[before - 1][0] > item["starts_at"]:
+                errors[row] = f"Overlaps event {latest[before - 1][1]} at this location"
+            elif accepted_end is not None and accepted_end > item["starts_at"]:
+                errors[row] = f"Overlaps row {accepted_row} at this location"
+            else:
+                if accepted_end is None or item["ends_at"] > accepted_end:
+                    accepted_end, accepted_row = item["ends_at"], row
+                continue
+            del parsed[row]
+
+
+def import_events(rows, dry_run=False):
+    """Validate and insert ``rows``; returns ``(created, {row number: message})``.
+
+    Row numbers count from 1, as a spreadsheet shows data rows under the
+    header. The caller commits.
+    """
+    parsed, errors = {}, {}
+    for number, row in enumerate(rows, start=1):
+        try:
+            parsed[number] = parse_row(row)
+        except EventImportError as exc:
+            errors[number] = exc.message
+    if parsed:
+        _resolve_taxonomy(parsed, errors)
+    if parsed:
+        _find_conflicts(parsed, errors)
+
+    groups = {}
+    values = []
+    for row in sorted(parsed):
+        item = parsed[row]
+        group_id = None
+        if item["group"]:
+            group_id = groups.setdefault(item["group"], str(uuid.uuid4()))
+        values.append({
+            "title": item["title"],
+            "description": item["description"],
+            "starts_at": item["starts_at"],
+            "ends_at": item["ends_at"],
+            "location_id": item["location_id"],
+            "category_id": item["category_id"],
+            "capacity": item["capacity"],
+            "price": item["price"],
+            "is_free": item["is_free"],
+            "group_id": group_id,
+            "recurrence_type": item["recurrence_type"],
+        })
+    if values and not dry_run:
+        db.session.execute(insert(Event), values)
+    return len(values), dict(sorted(errors.items()))
+
+
+def export_row(event: Event) -> dict:
+    return {
+        "id": event.id,
+        "title": event.title,
+        "description": event.description,
+        "starts_at": event.starts_at.isoformat(),
+        "ends_at": event.ends_at.isoformat(),
+        "location": event.location.name if event.location else None,
+        "category": event.category.name if event.category else None,
+        "capacity": event.capacity,
+        "price": float(event.price or 0),
+        "is_free": bool(event.is_free),
+        "group_id": event.group_id,
+        "recurrence_type": event.recurrence_type,
+    }
+
+
+def export_csv(events, chunk_rows: int = 500):
+    """CSV text in chunks of ``chunk_rows`` rows, header first."""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, event in enumerate(events, start=1):
+        writer.writerow(export_row(event))
+        if count % chunk_rows == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    yield output.getvalue()
+
+
+def export_json(events, chunk_rows: int = 500):
+    """A JSON array in chunks of ``chunk_rows`` events."""
+    return stream_json_array((export_row(event) for event in events), chunk_rows)
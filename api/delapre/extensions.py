@@ -0,0 +1,7 @@
+from flask_cors import CORS
+from flask_sqlalchemy import SQLAlchemy
+
+from .replicas import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+cors = CORS()
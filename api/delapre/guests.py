@@ -0,0 +1,137 @@
+"""Named guests on bookings.
+
+Guests used to be stored as a JSON list in ``bookings.guest_names``,
+each entry either a plain name or ``{"name": ..., "type": ...}``. They
+now live one per row in ``booking_guests``, so they can be searched,
+counted by ticket type and checked in one at a time without parsing
+every booking.
+
+The API still returns the old shape: a name for guests without a ticket
+type and ``{"name", "type"}`` for the rest. Bookings written before the
+move keep their JSON until ``flask migrate-guest-names`` copies it over;
+until then they are read from the column as before.
+"""
+from __future__ import annotations
+
+import json
+
+from sqlalchemy import insert, select, update
+
+from .extensions import db
+from .models import Booking, BookingGuest
+
+NAME_LENGTH = 255
+TICKET_TYPE_LENGTH = 50
+
+
+def parse_guest_names(raw) -> list:
+    """Entries of a ``guest_names`` JSON column; ``[]`` if missing or invalid."""
+    if not raw:
+        return []
+    try:
+        entries = json.loads(raw)
+    except json.JSONDecodeError:
+        return []
+    return entries if isinstance(entries, list) else []
+
+
+def guest_values(entries) -> list:
+    """``[{"position", "name", "ticket_type"}]`` for a list of guest entries."""
+    values = []
+    for entry in entries:
+        if isinstance(entry, dict):
+            name = str(entry.get("name") or "").strip()
+            ticket_type = str(entry.get("type") or "").strip() or None
+        elif isinstance(entry, str):
+            name, ticket_type = entry.strip(), None
+        else:
+            continue
+        if not name and not ticket_type:
+            continue
+        values.append({
+            "position": len(values),
+            "name": name[:NAME_LENGTH],
+            "ticket_type": ticket_type[:TICKET_TYPE_LENGTH] if ticket_type else None,
+        })
+    return values
+
+
+def guest_rows(entries) -> list:
+    """New :class:`BookingGuest` rows for ``Booking.guests``."""
+    return [BookingGuest(**values) for values in guest_values(entries)]
+
+
+def guest_entry(guest):
+    if guest.ticket_type:
+        return {"name": guest.name, "type": guest.ticket_type}
+    return guest.name
+
+
+def guests_by_booking(booking_ids, model=BookingGuest) -> dict:
+    """``{booking_id: [BookingGuest, ...]}`` for many bookings in one query.
+
+    Pass ``model=ArchivedBookingGuest`` for archived bookings.
+    """
+    booking_ids = list(set(booking_ids))
+    if not booking_ids:
+        return {}
+    guests = {}
+    rows = db.session.scalars(
+        select(model)
+        .where(model.booking_id.in_(booking_ids))
+        .order_by(model.booking_id, model.position)
+    )
+    for guest in rows:
+        guests.setdefault(guest.booking_id, []).append(guest)
+    return guests
+
+
+def booking_guest_entries(booking: Booking, guests=None) -> list:
+    """A booking's guests in the API shape.
+
+    ``guests`` is the booking's entry from :func:`guests_by_booking`;
+    without it the ``Booking.guests`` relationship is loaded.
+    """
+    if guests is None:
+        guests = booking.guests
+    if guests:
+        return [guest_entry(guest) for guest in guests]
+    # Not migrated yet
+    return [entry for entry in parse_guest_names(booking.guest_names) if entry]
+
+
+def migrate_guest_names(batch_size: int = 1000) -> int:
+    """Move ``bookings.guest_names`` JSON into ``booking_guests`` rows.
+
+    Works through the bookings in id order, one transaction per batch:
+    the guest rows are inserted and the column cleared together, so an
+    interrupted run can simply be started again. Returns the number of
+    bookings moved.
+    """
+    moved = 0
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(Booking.id, Booking.guest_names)
+            .where(Booking.id > last_id, Booking.guest_names.is_not(None))
+            .order_by(Booking.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return moved
+        last_id = batch[-1][0]
+        rows = [
+            {"booking_id": booking_id, **values}
+            for booking_id, raw in batch
+            for values in guest_values(parse_guest_names(raw))
+        ]
+        if rows:
+            db.session.execute(insert(BookingGuest), rows)
+        db.session.execute(
+            update(Booking)
+            .where(Booking.id.in_([booking_id for booking_id, _ in batch]))
+            .values(guest_names=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        moved += len(batch)
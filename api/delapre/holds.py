@@ -0,0 +1,132 @@
+"""Time-limited seat holds for carts.
+
+Adding an event to the cart places a hold that reserves seats for
+``SEAT_HOLD_MINUTES``. Active holds count against capacity exactly like
+confirmed bookings (see :func:`~delapre.serializers.reserved_guest_counts`),
+and checkout turns a hold into a booking without re-checking capacity.
+Expired holds stop counting immediately; ``flask sweep-holds`` deletes
+them in batches.
+
+So that one client cannot sell an event out by holding seats it never
+pays for, each user (or, for anonymous carts, each client address) can
+hold at most ``HOLD_MAX_SEATS_PER_CALLER`` seats of an event at a time.
+"""
+from __future__ import annotations
+
+import secrets
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func
+
+from .extensions import db
+from .models import Event, SeatHold
+from .reservations import BookingError
+from .serializers import reserved_guest_counts
+from .waitlist import promote_waitlist
+
+
+def new_hold_token() -> str:
+    return secrets.token_hex(16)
+
+
+def hold_expiry(now=None) -> datetime:
+    now = now or datetime.utcnow()
+    return now + timedelta(minutes=current_app.config["SEAT_HOLD_MINUTES"])
+
+
+def is_active(hold: SeatHold, now=None) -> bool:
+    return hold.expires_at > (now or datetime.utcnow())
+
+
+def seats_held_by(event_id: int, user_id, client_address, now, exclude: SeatHold | None = None) -> int:
+    """Seats of ``event_id`` in active holds of one user, or of anonymous
+    holds placed from ``client_address`` when ``user_id`` is ``None``."""
+    query = db.session.query(func.coalesce(func.sum(SeatHold.guest_count), 0)).filter(
+        SeatHold.event_id == event_id, SeatHold.expires_at > now
+    )
+    if user_id is not None:
+        query = query.filter(SeatHold.user_id == user_id)
+    else:
+        query = query.filter(SeatHold.user_id.is_(None), SeatHold.client_address == client_address)
+    if exclude is not None and exclude.id is not None:
+        query = query.filter(SeatHold.id != exclude.id)
+    return int(query.scalar())
+
+
+def place_hold(
+    event_id: int, guest_count: int, user=None, hold: SeatHold | None = None, client_address: str | None = None
+) -> SeatHold:
+    """Reserve ``guest_count`` seats, creating ``hold`` or resizing and renewing it.
+
+    The event row is locked while capacity and the caller's limit are
+    checked so concurrent holds and bookings cannot oversell it. The
+    caller commits.
+    """
+    event = Event.query.filter_by(id=event_id).with_for_update().first()
+    if not event:
+        raise BookingError("Event not found", 404)
+
+    now = datetime.utcnow()
+    reserved = reserved_guest_counts([event.id]).get(event.id, 0)
+    if hold is not None and is_active(hold, now):
+        reserved -= hold.guest_count
+    if event.capacity > 0 and guest_count > event.capacity - reserved:
+        raise BookingError("Not enough spaces available", 409)
+
+    if hold is not None:
+        user_id, client_address = hold.user_id, hold.client_address
+    else:
+        user_id = user.id if user is not None else None
+    limit = current_app.config["HOLD_MAX_SEATS_PER_CALLER"]
+    if limit and seats_held_by(event.id, user_id, client_address, now, exclude=hold) + guest_count > limit:
+        raise BookingError(f"You can hold at most {limit} seats for this event at a time", 429)
+
+    if hold is None:
+        hold = SeatHold(
+            token=new_hold_token(),
+            event_id=event.id,
+            user_id=user_id,
+            client_address=client_address if user_id is None else None,
+        )
+        db.session.add(hold)
+    hold.event = event
+    hold.guest_count = guest_count
+    hold.expires_at = hold_expiry(now)
+    return hold
+
+
+def sweep_expired_holds(batch_size: int, now=None) -> int:
+    """Delete expired holds ``batch_size`` rows at a time; returns the count.
+
+    Each batch is a short range scan on ``expires_at`` followed by a delete
+    by primary key, committed separately (together with booking waiting
+    entries into the seats it frees) so the sweeper never holds locks
+    across a large table.
+    """
+    now = now or datetime.utcnow()
+    deleted = 0
+    while True:
+        rows = (
+            db.session.query(SeatHold.id, SeatHold.event_id)
+            .filter(SeatHold.expires_at <= now)
+            .order_by(SeatHold.expires_at)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            return deleted
+        SeatHold.query.filter(SeatHold.id.in_([hold_id for hold_id, _ in rows])).delete(synchronize_session=False)
+        promote_waitlist({event_id for _, event_id in rows})
+        db.session.commit()
+        deleted += len(rows)
+
+
+def hold_to_dict(hold: SeatHold, spots_left=None):
+    return {
+        "token": hold.token,
+        "event_id": hold.event_id,
+        "guest_count": hold.guest_count,
+        "expires_at": hold.expires_at.isoformat(),
+        "spots_left": spots_left,
+    }
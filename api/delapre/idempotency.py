@@ -0,0 +1,196 @@
+"""``Idempotency-Key`` support for POST endpoints that must not run twice.
+
+The first request with a key claims it by inserting a pending row in
+``idempotency_keys``, runs the handler and stores the response. Retries
+with the same key (from the same caller, to the same route) get that
+response back without running the handler again, marked with an
+``Idempotent-Replayed`` header. Each worker keeps recent responses in an
+in-process LRU so most retries never reach the database.
+
+Only final outcomes are stored. Server errors, responses that ask the
+client to come back later (408, 423, 425, 428, 429 or anything with a
+``Retry-After`` header, such as "You are still in the queue") and
+responses to requests that failed authentication release the key, so a
+retry with it runs the handler again. Reusing
+a key with a different request body is rejected with 422. Keys of
+anonymous callers are scoped to their address and request body, so one
+guest can never be replayed another's booking. Expired rows
+are deleted by ``flask purge-idempotency-keys``.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, g, request
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import IdempotencyKey
+from .replicas import request_identity
+from .utils import json_error
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+# Statuses that say "not yet" rather than giving the request's outcome
+RETRYABLE_STATUSES = {408, 423, 425, 428, 429}
+
+
+class ResponseCache:
+    """Thread-safe LRU of ``(scope, key) -> (request_hash, status, body, expires_at)``."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, cache_key, now):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                return None
+            if entry[3] <= now:
+                del self._entries[cache_key]
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry
+
+    def put(self, cache_key, entry):
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+def response_cache() -> ResponseCache:
+    extensions = current_app.extensions
+    if "idempotency" not in extensions:
+        extensions["idempotency"] = ResponseCache(current_app.config["IDEMPOTENCY_CACHE_SIZE"])
+    return extensions["idempotency"]
+
+
+def _replay(entry, request_hash):
+    stored_hash, status, body, _ = entry
+    if stored_hash != request_hash:
+        return json_error("Idempotency-Key was already used for a different request", 422)
+    response = current_app.response_class(body, status=status, mimetype="application/json")
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _claim(scope, key, request_hash, now):
+    """Insert the pending row and return ``(id, expires_at, None)``, or
+    ``(None, None, existing_row)`` if another request holds the key."""
+    expires_at = now + timedelta(seconds=current_app.config["IDEMPOTENCY_TTL_SECONDS"])
+    record = IdempotencyKey(
+        scope=scope, key=key, request_hash=request_hash, created_at=now, expires_at=expires_at
+    )
+    db.session.add(record)
+    try:
+        db.session.flush()
+        record_id = record.id
+        db.session.commit()
+        return record_id, expires_at, None
+    except IntegrityError:
+        db.session.rollback()
+    existing = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+    abandoned = now - timedelta(seconds=current_app.config["IDEMPOTENCY_PENDING_TIMEOUT"])
+    if existing is not None and (
+        existing.expires_at <= now or (existing.status_code is None and existing.created_at <= abandoned)
+    ):
+        # Expired, or the first attempt died mid-request: start over
+        db.session.delete(existing)
+        db.session.commit()
+        return _claim(scope, key, request_hash, now)
+    return None, None, existing
+
+
+def is_final(response) -> bool:
+    """Whether a retry should get ``response`` again rather than a new try."""
+    return not (
+        response.status_code >= 500
+        or response.status_code in RETRYABLE_STATUSES
+        or "Retry-After" in response.headers
+        or g.get("auth_failed")
+    )
+
+
+def idempotent(view):
+    """Replay the stored response for a repeated ``Idempotency-Key``."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return json_error(f"{HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+        identity = request_identity()
+        if not identity.startswith("user:"):
+            identity = f"{identity} {request_hash}"
+        scope = f"{request.method} {request.path} {identity}"
+        now = datetime.utcnow()
+        cache = response_cache()
+
+        cached = cache.get((scope, key), now)
+        if cached is not None:
+            return _replay(cached, request_hash)
+
+        record_id, expires_at, existing = _claim(scope, key, request_hash, now)
+        if existing is not None:
+            if existing.status_code is None:
+                if existing.request_hash != request_hash:
+                    return json_error("Idempotency-Key was already used for a different request", 422)
+                return json_error("A request with this Idempotency-Key is still in progress", 409)
+            entry = (existing.request_hash, existing.status_code, existing.response_body, existing.expires_at)
+            cache.put((scope, key), entry)
+            return _replay(entry, request_hash)
+
+        stored = IdempotencyKey.query.filter_by(id=record_id)
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            stored.delete(synchronize_session=False)
+            db.session.commit()
+            raise
+        # Views commit what they keep; drop anything left half-done
+        db.session.rollback()
+        if is_final(response):
+            body = response.get_data(as_text=True)
+            stored.update(
+                {"status_code": response.status_code, "response_body": body},
+                synchronize_session=False,
+            )
+            cache.put((scope, key), (request_hash, response.status_code, body, expires_at))
+        else:
+            stored.delete(synchronize_session=False)
+        db.session.commit()
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys(batch_size: int, now=None) -> int:
+    """Delete expired keys ``batch_size`` rows at a time; returns the count."""
+    now = now or datetime.utcnow()
+    deleted = 0
+    while True:
+        ids = [
+            key_id
+            for (key_id,) in db.session.query(IdempotencyKey.id)
+            .filter(IdempotencyKey.expires_at <= now)
+            .order_by(IdempotencyKey.expires_at)
+            .limit(batch_size)
+        ]
+        if not ids:
+            return deleted
+        IdempotencyKey.query.filter(IdempotencyKey.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
@@ -0,0 +1,198 @@
+"""Per-request timing, SQL query accounting and a Prometheus text endpoint.
+
+Every request gets a ``Server-Timing`` header (``app``, ``db`` and the
+number of statements it issued). Latency and query-count histograms are
+kept per route in process memory and exposed at ``METRICS_PATH`` to
+callers presenting ``METRICS_TOKEN`` or connecting from one of
+``METRICS_ALLOWED_ADDRESSES`` (the endpoint is off unless one is set).
+Statements slower than ``SLOW_QUERY_MS`` are logged to
+``delapre.slow_queries``.
+"""
+from __future__ import annotations
+
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .utils import json_error
+
+slow_query_log = logging.getLogger("delapre.slow_queries")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            running += count
+            yield bound, running
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (route, method, status) -> Histogram
+        self.latency = {}
+        # (route, method) -> Histogram
+        self.queries = {}
+        # (route, method) -> seconds
+        self.db_seconds = {}
+        # route -> count
+        self.slow_queries = {}
+
+    def record_request(self, route, method, status, seconds, query_count, db_seconds):
+        with self._lock:
+            key = (route, method, str(status))
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            key = (route, method)
+            self.queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(query_count)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + db_seconds
+
+    def record_slow_query(self, route):
+        with self._lock:
+            self.slow_queries[route] = self.slow_queries.get(route, 0) + 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines += _render_histogram(
+                "http_request_duration_seconds",
+                "Request latency by route.",
+                ("route", "method", "status"),
+                self.latency,
+            )
+            lines += _render_histogram(
+                "db_queries_per_request",
+                "SQL statements issued per request.",
+                ("route", "method"),
+                self.queries,
+            )
+            lines.append("# HELP db_time_seconds_total Time spent executing SQL, by route.")
+            lines.append("# TYPE db_time_seconds_total counter")
+            for (route, method), seconds in sorted(self.db_seconds.items()):
+                lines.append(f"db_time_seconds_total{_labels(route=route, method=method)} {seconds:.6f}")
+            lines.append("# HELP db_slow_queries_total Statements slower than SLOW_QUERY_MS.")
+            lines.append("# TYPE db_slow_queries_total counter")
+            for route, count in sorted(self.slow_queries.items()):
+                lines.append(f"db_slow_queries_total{_labels(route=route)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _render_histogram(name, help_text, label_names, histograms):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key))
+        for bound, count in histogram.cumulative():
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+        lines.append(f"{name}_sum{_labels(**labels)} {histogram.total:.6f}")
+        lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+    return lines
+
+
+def _route_label():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    if has_request_context():
+        return "unmatched"
+    return "cli"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    if not has_app_context() or "metrics" not in current_app.extensions:
+        return
+    if "db_query_count" in g:
+        g.db_query_count += 1
+        g.db_seconds += elapsed
+    threshold = current_app.config["SLOW_QUERY_MS"]
+    if threshold and elapsed * 1000 >= threshold:
+        route = _route_label()
+        current_app.extensions["metrics"].record_slow_query(route)
+        slow_query_log.warning(
+            "Slow query (%.1f ms) in %s: %s", elapsed * 1000, route, " ".join(statement.split())
+        )
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_started"):
+        context.connection.info["query_started"].pop()
+
+
+def init_instrumentation(app):
+    if not app.config["INSTRUMENTATION_ENABLED"]:
+        return
+    metrics = Metrics()
+    app.extensions["metrics"] = metrics
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        g.db_query_count = 0
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def _record_request(response):
+        if "request_started" not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        metrics.record_request(
+            _route_label(), request.method, response.status_code,
+            elapsed, g.db_query_count, g.db_seconds,
+        )
+        if app.config["SERVER_TIMING_HEADER"]:
+            response.headers.add(
+                "Server-Timing",
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={g.db_seconds * 1000:.1f};desc="{g.db_query_count} queries"',
+            )
+        return response
+
+    token = app.config["METRICS_TOKEN"]
+    allowed_addresses = set(app.config["METRICS_ALLOWED_ADDRESSES"])
+    if app.config["METRICS_PATH"] and (token or allowed_addresses):
+        def metrics_endpoint():
+            presented = request.headers.get("Authorization", "")
+            if request.remote_addr not in allowed_addresses and not (
+                token and hmac.compare_digest(presented, f"Bearer {token}")
+            ):
+                return json_error("Forbidden", 403)
+            return app.response_class(
+                metrics.render(), mimetype="text/plain; version=0.0.4"
+            )
+
+        app.add_url_rule(app.config["METRICS_PATH"], "metrics", metrics_endpoint)
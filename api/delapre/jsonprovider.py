@@ -0,0 +1,40 @@
+"""Flask JSON provider backed by orjson when it is installed."""
+from __future__ import annotations
+
+import typing as t
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Drop-in replacement for the default provider.
+
+    Keeps Flask's key sorting and its fallbacks for types orjson does not
+    handle natively (``Decimal``, dataclasses, ``__html__``).
+    """
+
+    def dumps(self, obj: t.Any, **kwargs: t.Any) -> str:
+        return self._dumps_bytes(obj).decode()
+
+    def response(self, *args: t.Any, **kwargs: t.Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj), mimetype=self.mimetype)
+
+    def _dumps_bytes(self, obj: t.Any) -> bytes:
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
+
+
+def configure_json(app):
+    choice = app.config.get("JSON_PROVIDER", "auto")
+    if choice == "orjson" and orjson is None:
+        raise RuntimeError("JSON_PROVIDER is 'orjson' but orjson is not installed")
+    if choice in {"auto", "orjson"} and orjson is not None:
+        app.json = OrjsonProvider(app)
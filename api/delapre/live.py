@@ -0,0 +1,300 @@
+"""Live event counts for streaming clients (Server-Sent Events).
+
+Writes that change an event's counts call :func:`counts_changed` after
+committing. That only records the event id; a publisher thread per
+process wakes every ``LIVE_PUBLISH_INTERVAL`` seconds, reads the counts
+of every changed event in one batch and appends the values that actually
+changed to an in-memory log. Each open stream waits on that log and
+sends whatever is new since its last message, so a thousand tabs cost
+one set of queries, not a thousand.
+
+The feed is per process. Writes made by other workers (or the hold
+sweeper) reach it through a full refresh of upcoming events every
+``LIVE_REFRESH_SECONDS``. The publisher only runs while someone is
+listening (and for a short while after, for reconnecting browsers).
+
+Message ids are wall-clock milliseconds rather than a per-process
+counter, so a browser reconnecting with ``Last-Event-ID`` to another
+worker resumes at the same point in time. Since that worker may have
+picked up other workers' changes up to ``LIVE_REFRESH_SECONDS`` late, it
+replays that much before the id (the values are absolute, so repeats
+are harmless); if its log does not reach back that far the browser gets
+a ``reset``.
+
+Each open stream holds a worker thread (on the ASGI deployment too,
+where it runs in the WSGI thread pool), so a worker serves at most
+``LIVE_MAX_STREAMS`` at once and answers 503 beyond that; browsers
+then retry with back-off.
+
+The public stream only carries ``spots_left``; attendance counts go to
+the staff stream. ``EventSource`` cannot send an ``Authorization``
+header, so staff pages open that stream with a short-lived signed token
+in the URL (see :func:`stream_token`).
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import current_app, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from .extensions import db
+from .models import Event
+from .serializers import attendance_counts, reserved_guest_counts, upcoming_events_statement
+from .utils import json_error
+
+PUBLIC_FIELDS = ("spots_left",)
+STAFF_FIELDS = ("spots_left", "booked_count", "checked_in_count")
+
+
+def _now_id() -> int:
+    return int(time.time() * 1000)
+
+
+class LiveFeed:
+    # Seconds the publisher keeps going after the last stream closes, so
+    # browsers reconnecting after LIVE_STREAM_SECONDS find the log intact
+    linger = 30
+
+    def __init__(self, app, interval: float, refresh: float, history: int = 1024):
+        self.app = app
+        self.interval = interval
+        self.refresh = refresh
+        self._cond = threading.Condition()
+        # (id, event_id, changed values); older entries fall off
+        self._log = deque(maxlen=history)
+        self._last_id = 0
+        # Every change published after this id is still in the log; None
+        # while the publisher is stopped
+        self._complete_after = None
+        self._latest = {}
+        self._dirty = set()
+        self._streams = 0
+        self._idle_since = 0.0
+        self._thread = None
+
+    @property
+    def cursor(self) -> int:
+        """The id a new stream starts after."""
+        with self._cond:
+            return self._last_id
+
+    def resume_cursor(self, last_id: int) -> int:
+        """Where a stream whose browser last saw ``last_id`` (possibly from
+        another worker) starts: ``LIVE_REFRESH_SECONDS`` earlier, as far
+        back as the log is complete."""
+        with self._cond:
+            if self._complete_after is None or last_id < self._complete_after:
+                return last_id
+            return max(last_id - int(self.refresh * 1000), self._complete_after)
+
+    def mark(self, event_ids):
+        with self._cond:
+            if self._thread is not None:
+                self._dirty.update(event_ids)
+
+    def acquire(self, limit: int = 0) -> bool:
+        """Count a new stream, unless ``limit`` are already open, and make
+        sure the publisher runs."""
+        with self._cond:
+            if limit and self._streams >= limit:
+                return False
+            self._streams += 1
+            if self._thread is None:
+                # Values from before the last stop are stale
+                self._log.clear()
+                self._latest.clear()
+                self._last_id = max(self._last_id, _now_id())
+                self._complete_after = self._last_id
+                self._thread = threading.Thread(target=self._run, name="live-feed", daemon=True)
+                self._thread.start()
+            return True
+
+    def release(self):
+        with self._cond:
+            self._streams -= 1
+            if not self._streams:
+                self._idle_since = time.monotonic()
+
+    def publish(self, counts: dict):
+        """Record ``{event_id: {name: value}}``; only changed values are sent."""
+        with self._cond:
+            published = False
+            for event_id, values in counts.items():
+                latest = self._latest.setdefault(event_id, {})
+                changed = {name: value for name, value in values.items() if latest.get(name) != value}
+                if changed:
+                    latest.update(changed)
+                    self._last_id = max(_now_id(), self._last_id + 1)
+                    if len(self._log) == self._log.maxlen and self._complete_after is not None:
+                        self._complete_after = self._log[0][0]
+                    self._log.append((self._last_id, event_id, changed))
+                    published = True
+            if published:
+                self._cond.notify_all()
+
+    def wait(self, after: int, timeout: float):
+        """``(id, {event_id: changes})`` for entries after ``after``.
+
+        The changes are ``{}`` on timeout and ``None`` if entries the
+        caller has not seen are no longer (or were never) in the log.
+        """
+        with self._cond:
+            if self._complete_after is None or after < self._complete_after:
+                return self._last_id, None
+            if self._last_id <= after:
+                self._cond.wait(timeout)
+            if self._last_id <= after:
+                return after, {}
+            if after < self._complete_after:
+                return self._last_id, None
+            entries = []
+            for entry in reversed(self._log):
+                if entry[0] <= after:
+                    break
+                entries.append(entry)
+            updates = {}
+            for _, event_id, changed in reversed(entries):
+                updates.setdefault(event_id, {}).update(changed)
+            return self._last_id, updates
+
+    def _run(self):
+        refreshed_at = time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            with self._cond:
+                if not self._streams and time.monotonic() - self._idle_since >= self.linger:
+                    self._thread = None
+                    self._complete_after = None
+                    self._dirty.clear()
+                    return
+                event_ids, self._dirty = self._dirty, set()
+            full_refresh = self.refresh and time.monotonic() - refreshed_at >= self.refresh
+            if not event_ids and not full_refresh:
+                continue
+            with self.app.app_context():
+                try:
+                    if full_refresh:
+                        refreshed_at = time.monotonic()
+                        event_ids |= upcoming_event_ids()
+                    self.publish(live_counts(event_ids))
+                except Exception:
+                    self.app.logger.exception("Could not read live event counts")
+                finally:
+                    db.session.remove()
+
+
+def upcoming_event_ids() -> set:
+    statement = upcoming_events_statement(datetime.utcnow()).with_only_columns(Event.id)
+    return set(db.session.scalars(statement))
+
+
+def live_counts(event_ids) -> dict:
+    """``{event_id: {"spots_left", "booked_count", "checked_in_count"}}``."""
+    event_ids = list(set(event_ids))
+    if not event_ids:
+        return {}
+    capacities = dict(db.session.query(Event.id, Event.capacity).filter(Event.id.in_(event_ids)))
+    reserved = reserved_guest_counts(capacities)
+    attendance = attendance_counts(capacities)
+    counts = {}
+    for event_id, capacity in capacities.items():
+        booked, checked_in = attendance.get(event_id, (0, 0))
+        counts[event_id] = {
+            "spots_left": max(0, capacity - int(reserved.get(event_id, 0))),
+            "booked_count": booked,
+            "checked_in_count": checked_in,
+        }
+    return counts
+
+
+def live_feed() -> LiveFeed:
+    extensions = current_app.extensions
+    if "live_feed" not in extensions:
+        config = current_app.config
+        extensions["live_feed"] = LiveFeed(
+            current_app._get_current_object(),
+            config["LIVE_PUBLISH_INTERVAL"],
+            config["LIVE_REFRESH_SECONDS"],
+        )
+    return extensions["live_feed"]
+
+
+def _stream_serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.config["JWT_SECRET"], salt="staff-live-stream")
+
+
+def stream_token(user_id: int) -> str:
+    """A token for ``?token=`` on the staff stream, valid for
+    ``LIVE_TOKEN_SECONDS`` (it is only checked when the stream opens)."""
+    return _stream_serializer().dumps(user_id)
+
+
+def user_id_for_stream_token(token: str):
+    try:
+        user_id = _stream_serializer().loads(token, max_age=current_app.config["LIVE_TOKEN_SECONDS"])
+    except BadSignature:
+        return None
+    return user_id if isinstance(user_id, int) else None
+
+
+def counts_changed(event_ids):
+    """Tell listeners these events' counts may have changed (after commit)."""
+    live_feed().mark(event_ids)
+
+
+def counts_stream(fields):
+    """Server-Sent Events response with changes to ``fields`` of the
+    events in ``?event_ids=1,2`` (default: all).
+
+    Streams end after ``LIVE_STREAM_SECONDS``; browsers reconnect with
+    ``Last-Event-ID`` (or ``?last_event_id=`` when the page reconnects
+    itself) and carry on from there, or get a ``reset`` event when they
+    missed too much and should reload the listing.
+    """
+    try:
+        event_ids = {int(value) for value in request.args.get("event_ids", "").split(",") if value.strip()}
+    except ValueError:
+        return json_error("event_ids must be a comma-separated list of ids")
+    feed = live_feed()
+    config = current_app.config
+    if not feed.acquire(config["LIVE_MAX_STREAMS"]):
+        response, status = json_error("Too many live streams open, please try again shortly", 503)
+        response.headers["Retry-After"] = "10"
+        return response, status
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id", "")
+    cursor = feed.resume_cursor(int(last_id)) if last_id.isdigit() else feed.cursor
+    deadline = time.monotonic() + config["LIVE_STREAM_SECONDS"]
+    keepalive = config["LIVE_KEEPALIVE_SECONDS"]
+
+    def stream(cursor):
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            cursor, updates = feed.wait(cursor, timeout=min(keepalive, max(0.0, deadline - time.monotonic())))
+            if updates is None:
+                yield f"id: {cursor}\nevent: reset\ndata: {{}}\n\n"
+                continue
+            updates = {
+                event_id: {name: value for name, value in changes.items() if name in fields}
+                for event_id, changes in updates.items()
+                if not event_ids or event_id in event_ids
+            }
+            updates = {event_id: changes for event_id, changes in updates.items() if changes}
+            if updates:
+                payload = json.dumps([{"event_id": event_id, **changes} for event_id, changes in updates.items()])
+                yield f"id: {cursor}\nevent: counts\ndata: {payload}\n\n"
+            else:
+                yield ": keepalive\n\n"
+
+    response = current_app.response_class(
+        stream(cursor),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Also runs when the browser leaves before the stream has started
+    response.call_on_close(feed.release)
+    return response
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import func, literal_column
+
+from .extensions import db
+
+# SQLite only auto-increments INTEGER PRIMARY KEY columns
+BigInt = db.BigInteger().with_variant(db.Integer(), "sqlite")
+
+
+class User(db.Model):
+    __tablename__ = "users"
+
+    id = db.Column(BigInt, primary_key=True)
+    email = db.Column(db.String(255), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    first_name = db.Column(db.String(120), nullable=False)
+    last_name = db.Column(db.String(120), nullable=False)
+    phone = db.Column(db.String(50), nullable=True)
+    email_opt_in = db.Column(db.Boolean, nullable=False, default=True)
+    sms_opt_in = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, server_default=func.current_timestamp())
+    updated_at = db.Column(
+        db.DateTime,
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+    )
+    is_staff = db.Column(db.Boolean, default=False)
+    # Signed into calendar feed tokens; bumped to revoke the old feed URL
+    calendar_feed_version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Event(db.Model):
+    __tablename__ = "events"
+    __table_args__ = (
+        # Catalogue listings; the name matches init.sql
+        db.Index("idx_events_starts_at", "starts_at"),
+        # Overlap checks for a location
+        db.Index("ix_events_location_starts_ends", "location_id", "starts_at", "ends_at"),
+    )
+
+    id = db.Column(BigInt, primary_key=True)
+    title = db.Column(db.String(255), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    location_id = db.Column(BigInt, db.ForeignKey("locations.id"), nullable=True)
+    location = db.relationship("Location", backref="events", lazy="joined")
+    is_free = db.Column(db.Boolean, nullable=False, default=True)
+    price = db.Column(db.Numeric(10, 2), nullable=False, default=0.00)
+    capacity = db.Column(db.Integer, nullable=False, default=0)
+    # Recurrence fields
+    group_id = db.Column(db.String(36), nullable=True)  # UUID to group recurring events
+    recurrence_type = db.Column(db.String(20), nullable=True)  # 'weekly', etc.
+    category_id = db.Column(BigInt, db.ForeignKey("categories.id"), nullable=True)
+    category = db.relationship("Category", backref="events", lazy="joined")
+    created_at = db.Column(db.DateTime, server_default=func.current_timestamp())
+    updated_at = db.Column(
+        db.DateTime,
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+    )
+    # Bumped by every UPDATE, so feed fingerprints change even when two
+    # edits land within the same second of updated_at
+    version = db.Column(
+        db.Integer, nullable=False, default=1, server_default="1", onupdate=literal_column("version + 1")
+    )
+
+
+class Booking(db.Model):
+    __tablename__ = "bookings"
+    __table_args__ = (
+        # Covers the seats-taken and attendance sums per event
+        db.Index("ix_bookings_event_status_guests", "event_id", "status", "guest_count", "checked_in"),
+        # "Already booked?" checks for signed-in users and for guests
+        db.Index("ix_bookings_user_event_status", "user_id", "event_id", "status"),
+        db.Index("ix_bookings_event_email_status", "event_id", "guest_email", "status"),
+    )
+
+    id = db.Column(BigInt, primary_key=True)
+    user_id = db.Column(BigInt, db.ForeignKey("users.id"), nullable=True)
+    event_id = db.Column(BigInt, db.ForeignKey("events.id"), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="confirmed")
+    guest_count = db.Column(db.Integer, nullable=False, default=1)
+    guest_names = db.Column(db.Text, nullable=True)
+    guest_email = db.Column(db.String(255), nullable=True)
+    guest_name = db.Column(db.String(255), nullable=True)
+    guest_phone = db.Column(db.String(50), nullable=True)
+    confirmation_code = db.Column(db.String(10), unique=True, nullable=True)
+    booked_at = db.Column(db.DateTime, server_default=func.current_timestamp())
+    cancelled_at = db.Column(db.DateTime, nullable=True)
+    checked_in = db.Column(db.Boolean, nullable=False, default=False)
+    checked_in_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship("User", backref="bookings")
+    event = db.relationship("Event", backref="bookings")
+    guests = db.relationship(
+        "BookingGuest",
+        backref="booking",
+        order_by="BookingGuest.position",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class BookingGuest(db.Model):
+    """One named guest on a booking (see :mod:`delapre.guests`)."""
+
+    __tablename__ = "booking_guests"
+    __table_args__ = (
+        db.UniqueConstraint("booking_id", "position", name="uk_booking_guests_position"),
+    )
+
+    id = db.Column(BigInt, primary_key=True)
+    booking_id = db.Column(BigInt, db.ForeignKey("bookings.id", ondelete="CASCADE"), nullable=False)
+    # Order the guests were entered in, from 0
+    position = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(255), nullable=False, default="", index=True)
+    ticket_type = db.Column(db.String(50), nullable=True, index=True)
+    checked_in_at = db.Column(db.DateTime, nullable=True)
+
+
+class ArchivedBooking(db.Model):
+    """A booking for a long-finished event, moved by ``flask archive``.
+
+    Same columns (and ids) as :class:`Booking`, so the serializers handle
+    both; see :mod:`delapre.archive`.
+    """
+
+    __tablename__ = "bookings_archive"
+
+    id = db.Column(BigInt, primary_key=True, autoincrement=False)
+    user_id = db.Column(BigInt, db.ForeignKey("users.id"), nullable=True, index=True)
+    event_id = db.Column(BigInt, db.ForeignKey("events.id"), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False)
+    guest_count = db.Column(db.Integer, nullable=False)
+    guest_names = db.Column(db.Text, nullable=True)
+    guest_email = db.Column(db.String(255), nullable=True)
+    guest_name = db.Column(db.String(255), nullable=True)
+    guest_phone = db.Column(db.String(50), nullable=True)
+    confirmation_code = db.Column(db.String(10), nullable=True)
+    booked_at = db.Column(db.DateTime, nullable=True)
+    cancelled_at = db.Column(db.DateTime, nullable=True)
+    checked_in = db.Column(db.Boolean, nullable=False)
+    checked_in_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    user = db.relationship("User")
+    event = db.relationship("Event")
+    guests = db.relationship(
+        "ArchivedBookingGuest", order_by="ArchivedBookingGuest.position", passive_deletes=True
+    )
+
+
+class ArchivedBookingGuest(db.Model):
+    __tablename__ = "booking_guests_archive"
+
+    id = db.Column(BigInt, primary_key=True, autoincrement=False)
+    booking_id = db.Column(
+        BigInt, db.ForeignKey("bookings_archive.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    position = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(255), nullable=False, default="")
+    ticket_type = db.Column(db.String(50), nullable=True)
+    checked_in_at = db.Column(db.DateTime, nullable=True)
+
+
+class SeatHold(db.Model):
+    __tablename__ = "seat_holds"
+    __table_args__ = (
+        db.Index("ix_seat_holds_event_expires", "event_id", "expires_at"),
+    )
+
+    id = db.Column(BigInt, primary_key=True)
+    token = db.Column(db.String(32), unique=True, nullable=False)
+    event_id = db.Column(BigInt, db.ForeignKey("events.id"), nullable=False)
+    user_id = db.Column(BigInt, db.ForeignKey("users.id"), nullable=True)
+    # Who placed an anonymous hold, for the per-caller seat limit
+    client_address = db.Column(db.String(45), nullable=True)
+    guest_count = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, server_default=func.current_timestamp())
+    # Indexed on its own for the expiry sweeper's range scan
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    event = db.relationship("Event")
+
+
+class WaitlistEntry(db.Model):
+    __tablename__ = "waitlist_entries"
+    __table_args__ = (
+        # Promotion scans waiting entries of an event in join order
+        db.Index("ix_waitlist_event_status_joined", "event_id", "status", "created_at"),
+    )
+
+    id = db.Column(BigInt, primary_key=True)
+    event_id = db.Column(BigInt, db.ForeignKey("events.id"), nullable=False)
+    user_id = db.Column(BigInt, db.ForeignKey("users.id"), nullable=True)
+    guest_email = db.Column(db.String(255), nullable=True)
+    guest_name = db.Column(db.String(255), nullable=True)
+    guest_phone = db.Column(db.String(50), nullable=True)
+    guest_count = db.Column(db.Integer, nullable=False, default=1)
+    guest_names = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="waiting")  # waiting, promoted, left
+    # Join time, set by the app so it compares cleanly with bound datetimes
+    # on every backend; the id breaks ties within the same second
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    promoted_at = db.Column(db.DateTime, nullable=True)
+    booking_id = db.Column(BigInt, db.ForeignKey("bookings.id"), nullable=True)
+
+    user = db.relationship("User")
+    event = db.relationship("Event")
+    booking = db.relationship("Booking")
+
+
+class Notification(db.Model):
+    """Outbox of messages for ``flask send-notifications`` to deliver."""
+
+    __tablename__ = "notifications"
+
+    id = db.Column(BigInt, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    booking_id = db.Column(BigInt, db.ForeignKey("bookings.id"), nullable=True)
+    created_at = db.Column(db.DateTime, server_default=func.current_timestamp())
+    sent_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    booking = db.relationship("Booking")
+
+
+class AdmissionQueue(db.Model):
+    """Waiting room settings for a high-demand event."""
+
+    __tablename__ = "admission_queues"
+
+    event_id = db.Column(BigInt, db.ForeignKey("events.id"), primary_key=True, autoincrement=False)
+    rate_per_second = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, server_default=func.current_timestamp())
+
+
+class AdmissionTokenUse(db.Model):
+    """A queue token that has been spent on a booking."""
+
+    __tablename__ = "admission_token_uses"
+
+    jti = db.Column(db.String(36), primary_key=True)
+    event_id = db.Column(BigInt, nullable=False)
+    used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # When the token would have expired anyway; the row can go after that
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class IdempotencyKey(db.Model):
+    """Stored response for a POST retried with the same ``Idempotency-Key``."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (db.UniqueConstraint("scope", "key", name="uk_idempotency_scope_key"),)
+
+    id = db.Column(BigInt, primary_key=True)
+    # Route and caller, e.g. "POST /api/bookings user:7"
+    scope = db.Column(db.String(255), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    # NULL while the original request is still running
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class ConfirmationCodeBlock(db.Model):
+    """A claimed range of confirmation code sequence numbers.
+
+    The row id numbers the block; see :mod:`delapre.confirmation_codes`.
+    """
+
+    __tablename__ = "confirmation_code_blocks"
+
+    id = db.Column(BigInt, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Category(db.Model):
+    __tablename__ = "categories"
+
+    id = db.Column(BigInt, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, server_default=func.current_timestamp())
+    updated_at = db.Column(
+        db.DateTime,
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+    )
+
+
+class Location(db.Model):
+    __tablename__ = "locations"
+
+    id = db.Column(BigInt, primary_key=True)
+    name = db.Column(db.String(255), nullable=False, unique=True)
+    created_at = db.Column(db.DateTime, server_default=func.current_timestamp())
+    updated_at = db.Column(
+        db.DateTime,
+        server_default=func.current_timestamp(),
+        onupdate=func.current_timestamp(),
+    )
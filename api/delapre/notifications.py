@@ -0,0 +1,57 @@
+"""Notification outbox.
+
+Request handlers only insert rows into ``notifications`` inside their
+own transaction; ``flask send-notifications`` delivers pending rows in
+batches (as text files in ``NOTIFICATIONS_DIR``, like the reminders) and
+marks them sent.
+"""
+from __future__ import annotations
+
+import os
+from datetime import datetime
+
+from flask import current_app
+
+from .extensions import db
+from .models import Booking, Notification
+
+
+def booking_recipient(booking: Booking):
+    """``(email, name)`` for a user or guest booking."""
+    if booking.user:
+        return booking.user.email, f"{booking.user.first_name} {booking.user.last_name}"
+    return booking.guest_email, booking.guest_name or "Guest"
+
+
+def queue_notification(kind: str, recipient: str, subject: str, body: str, booking=None):
+    notification = Notification(kind=kind, recipient=recipient, subject=subject, body=body)
+    if booking is not None:
+        notification.booking = booking
+    db.session.add(notification)
+    return notification
+
+
+def deliver_pending(batch_size: int) -> int:
+    """Write out unsent notifications, oldest first; returns how many were sent."""
+    directory = current_app.config["NOTIFICATIONS_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    sent = 0
+    while True:
+        batch = (
+            Notification.query.filter(Notification.sent_at.is_(None))
+            .order_by(Notification.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return sent
+        now = datetime.utcnow()
+        for notification in batch:
+            filename = f"notification_{notification.kind}_{notification.id}.txt"
+            with open(os.path.join(directory, filename), "w", encoding="utf-8") as f:
+                f.write(f"To: {notification.recipient}\n")
+                f.write(f"Subject: {notification.subject}\n\n")
+                f.write(notification.body)
+            notification.sent_at = now
+        db.session.commit()
+        sent += len(batch)
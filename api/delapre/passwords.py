@@ -0,0 +1,144 @@
+"""Password hashing and login throttling.
+
+Hashing runs on a small per-process thread pool (``hashlib`` releases
+the GIL while it works), so a login storm can only keep
+``PASSWORD_HASH_WORKERS`` cores busy per process; once
+``PASSWORD_HASH_QUEUE`` more requests are waiting, further ones get a
+:class:`HasherBusy` straight away instead of piling up.
+
+``PASSWORD_HASH_METHOD`` takes any werkzeug method string. Hashes made
+with other settings still verify and are replaced with the configured
+method on the user's next successful login.
+
+Failed logins are counted per client address and per email address over
+a sliding window; past the limit, logins are turned away before the user
+lookup or any hashing.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+MAX_TRACKED_KEYS = 10000
+
+
+class HasherBusy(Exception):
+    """Too many hashes are already queued; retry shortly."""
+
+
+class PasswordHasher:
+    def __init__(self, method: str, workers: int, max_pending: int, timeout: float):
+        self.method = method
+        self.method_prefix = method
+        if method.count(":") < (3 if method.startswith("scrypt") else 2):
+            # Fill in werkzeug's defaults ("scrypt" -> "scrypt:32768:8:1")
+            self.method_prefix = generate_password_hash("", method).split("$", 1)[0]
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise HasherBusy() from None
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        return password_hash.split("$", 1)[0] != self.method_prefix
+
+
+def hasher() -> PasswordHasher:
+    extensions = current_app.extensions
+    if "password_hasher" not in extensions:
+        config = current_app.config
+        extensions["password_hasher"] = PasswordHasher(
+            config["PASSWORD_HASH_METHOD"],
+            config["PASSWORD_HASH_WORKERS"],
+            config["PASSWORD_HASH_QUEUE"],
+            config["PASSWORD_HASH_TIMEOUT"],
+        )
+    return extensions["password_hasher"]
+
+
+class LoginThrottle:
+    """Sliding-window counts of failed logins for this process.
+
+    At most ``max_keys`` addresses and emails are tracked; past that the
+    ones that failed longest ago are forgotten first.
+    """
+
+    def __init__(self, window: float, max_per_email: int, max_per_address: int, max_keys: int = MAX_TRACKED_KEYS):
+        self.window = window
+        self.limits = {"email": max_per_email, "address": max_per_address}
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._failures = OrderedDict()
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, address: str, email: str, now=None) -> int | None:
+        """Seconds until another attempt is allowed, or None if it is."""
+        now = time.monotonic() if now is None else now
+        wait = 0.0
+        with self._lock:
+            for key in (("address", address), ("email", email)):
+                failures = self._recent(key, now)
+                if failures is not None and len(failures) >= self.limits[key[0]]:
+                    wait = max(wait, failures[-self.limits[key[0]]] + self.window - now)
+        return max(1, math.ceil(wait)) if wait else None
+
+    def failed(self, address: str, email: str, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for key in (("address", address), ("email", email)):
+                self._failures.setdefault(key, deque()).append(now)
+                self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def succeeded(self, email: str):
+        with self._lock:
+            self._failures.pop(("email", email), None)
+
+
+def login_throttle() -> LoginThrottle:
+    extensions = current_app.extensions
+    if "login_throttle" not in extensions:
+        config = current_app.config
+        extensions["login_throttle"] = LoginThrottle(
+            config["LOGIN_THROTTLE_WINDOW"],
+            config["LOGIN_MAX_FAILURES_PER_EMAIL"],
+            config["LOGIN_MAX_FAILURES_PER_ADDRESS"],
+        )
+    return extensions["login_throttle"]
@@ -0,0 +1,97 @@
+"""EXPLAIN checks for the queries on the hot paths.
+
+``flask explain-hot-queries`` builds each query below with the same
+statement helpers the views and services execute, using sample
+parameters, asks the database for its plan and reports every table it
+would read in full. When a new hot query needs an index, add it to
+``__table_args__`` and ``docker/db/init.sql`` and run ``flask
+ensure-indexes`` against existing databases.
+
+Plans depend on table statistics: MySQL in particular may prefer a full
+scan of a nearly empty table, so run the check against a realistic
+database (e.g. one seeded by the benchmark suite).
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from .confirmation_codes import booking_by_code_statement
+from .event_import import overlapping_events_statement
+from .extensions import db
+from .reservations import already_booked_statement
+from .serializers import (
+    attendance_statement,
+    booking_history_statement,
+    reserved_seats_statement,
+    upcoming_events_statement,
+)
+from .waitlist import waiting_entries_statement
+
+EVENT_IDS = [1, 2, 3]
+# A current (9 character, check character included) confirmation code
+SAMPLE_CODE = "ABCD23454"
+
+
+def _now():
+    return datetime.utcnow().replace(microsecond=0)
+
+
+def hot_queries() -> dict:
+    """``{name: statement}`` for each query checked."""
+    now = _now()
+    return {
+        "seats reserved per event": reserved_seats_statement(EVENT_IDS),
+        "attendance per event": attendance_statement(EVENT_IDS),
+        "user already booked": already_booked_statement(EVENT_IDS, user_id=1),
+        "guest already booked": already_booked_statement(EVENT_IDS, email="guest@example.com"),
+        "booking by confirmation code": booking_by_code_statement(SAMPLE_CODE),
+        "booking history": booking_history_statement(1),
+        "location conflict": overlapping_events_statement([1], now, now + timedelta(hours=2)).limit(1),
+        "upcoming events": upcoming_events_statement(now),
+        "waitlist promotion": waiting_entries_statement([1]),
+    }
+
+
+def _sqlite_scans(conn, sql):
+    # Rows are (id, parent, notused, detail), e.g. "SCAN bookings" or
+    # "SEARCH bookings USING INDEX ix_... (event_id=?)"; subqueries show
+    # up as "CO-ROUTINE anon_1" or "MATERIALIZE anon_1" and are scanned
+    # once built, which is not a table read
+    scans, subqueries = [], set()
+    for row in conn.execute(text("EXPLAIN QUERY PLAN " + sql)):
+        detail = row[-1]
+        if detail.startswith(("CO-ROUTINE ", "MATERIALIZE ")):
+            subqueries.add(detail.split()[1])
+        elif detail.startswith("SCAN ") and " USING " not in detail:
+            scans.append(detail.split()[1])
+    return [table for table in scans if table not in subqueries]
+
+
+def _mysql_scans(conn, sql):
+    # Derived tables (``<derived2>``, ``<union1,2>``) are not table reads
+    return [
+        row["table"] for row in conn.execute(text("EXPLAIN " + sql)).mappings()
+        if row["type"] == "ALL" and not (row["table"] or "<").startswith("<")
+    ]
+
+
+def full_scans(statement, conn) -> list:
+    """Tables ``statement`` would read in full, according to EXPLAIN.
+
+    Raises ``ValueError`` for databases other than SQLite and MySQL.
+    """
+    dialect = conn.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        return _sqlite_scans(conn, sql)
+    if dialect.name == "mysql":
+        return _mysql_scans(conn, sql)
+    raise ValueError(f"Checking query plans is not supported on {dialect.name}, only on SQLite and MySQL.")
+
+
+def explain_hot_queries() -> dict:
+    """``{name: [table, ...]}`` of full scans for each hot query."""
+    with db.engine.connect() as conn:
+        return {name: full_scans(statement, conn) for name, statement in hot_queries().items()}
@@ -0,0 +1,179 @@
+"""Token-bucket rate limits, checked before any view code runs.
+
+``RATE_LIMITS`` maps endpoint names to buckets by scope:
+
+- ``"ip"``: one bucket per client address;
+- ``"user"``: one bucket per bearer token subject (skipped for anonymous
+  requests);
+- ``"route"``: one bucket shared by every caller of the endpoint.
+
+Client addresses are the ones ``TRUSTED_PROXY_COUNT`` proxies forwarded
+(see :func:`client_address`). Each bucket is ``(tokens per second, burst)``. Endpoints that are not
+listed get ``RATE_LIMIT_DEFAULT`` (``None`` for no limit). A request
+that finds a bucket empty gets a 429 with ``Retry-After`` from a
+``before_request`` hook, so it never reaches the database.
+
+Buckets live in process memory unless ``RATE_LIMIT_STORAGE`` is a
+``redis://`` URL (needs the ``redis`` package), in which case all
+workers share them. It may also be a backend object with the same
+``take`` method, e.g. a :class:`MemoryBackend` standing in for Redis
+in tests and local runs.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+from flask import current_app, request
+
+from .replicas import request_identity
+from .utils import json_error
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - depends on the environment
+    redis = None
+
+MAX_MEMORY_BUCKETS = 100000
+
+
+class MemoryBackend:
+    """Buckets for this process: ``key -> (tokens, updated_at, full_at)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key: str, rate: float, burst: float, now=None) -> float:
+        """Take a token; returns 0 on success, else seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            if len(self._buckets) >= MAX_MEMORY_BUCKETS and bucket is None:
+                # A missing bucket is a full one, so refilled buckets can go
+                self._buckets = {k: b for k, b in self._buckets.items() if b[2] > now}
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            return wait
+
+
+# Same algorithm as MemoryBackend, atomically in Redis on the server clock
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = burst
+if bucket[1] then
+  tokens = math.min(burst, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+end
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every worker through Redis."""
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    def take(self, key: str, rate: float, burst: float, now=None) -> float:
+        return float(self._take(keys=[self.prefix + key], args=[rate, burst]))
+
+
+def create_backend(storage):
+    if not isinstance(storage, str):
+        return storage
+    if storage == "memory://":
+        return MemoryBackend()
+    if storage.startswith(("redis://", "rediss://", "unix://")):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_STORAGE is a Redis URL but redis is not installed")
+        return RedisBackend(redis.Redis.from_url(storage))
+    raise ValueError(f"Unknown RATE_LIMIT_STORAGE: {storage}")
+
+
+def client_address(remote_addr, forwarded_for, trusted_proxies: int):
+    """The caller's address as ``ProxyFix(x_for=trusted_proxies)`` resolves
+    it: the one the outermost trusted proxy saw, else ``remote_addr``.
+
+    For servers that bypass the WSGI middleware (the ASGI app's native
+    views).
+    """
+    if trusted_proxies and forwarded_for:
+        values = forwarded_for.split(",")
+        if len(values) >= trusted_proxies:
+            return values[-trusted_proxies].strip()
+    return remote_addr
+
+
+def _bucket_keys(endpoint, limits, remote_addr, identity):
+    for scope, (rate, burst) in limits.items():
+        if scope == "ip":
+            yield f"{endpoint}:ip:{remote_addr}", rate, burst
+        elif scope == "user":
+            identity = identity()
+            if identity.startswith("user:"):
+                yield f"{endpoint}:{identity}", rate, burst
+        elif scope == "route":
+            yield f"{endpoint}:route", rate, burst
+        else:
+            raise ValueError(f"Unknown rate limit scope: {scope}")
+
+
+def rate_limit_wait(config, backend, endpoint, remote_addr, identity) -> float:
+    """Take a token from each of ``endpoint``'s buckets for one caller.
+
+    ``identity`` is a callable returning :func:`request_identity`, only
+    called for ``"user"`` buckets. Returns 0 when the request may go
+    ahead, else seconds until it may.
+    """
+    limits = config["RATE_LIMITS"].get(endpoint, config["RATE_LIMIT_DEFAULT"])
+    if not limits:
+        return 0.0
+    for key, rate, burst in _bucket_keys(endpoint, limits, remote_addr, identity):
+        wait = backend.take(key, rate, burst)
+        if wait > 0:
+            return wait
+    return 0.0
+
+
+def retry_after(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
+
+
+def check_rate_limits():
+    endpoint = request.endpoint
+    if endpoint is None or request.method == "OPTIONS":
+        return None
+    wait = rate_limit_wait(
+        current_app.config, current_app.extensions["rate_limits"], endpoint, request.remote_addr, request_identity
+    )
+    if wait > 0:
+        response, status = json_error("Too many requests, please slow down", 429)
+        response.headers["Retry-After"] = retry_after(wait)
+        return response, status
+    return None
+
+
+def init_rate_limits(app):
+    if not app.config["RATE_LIMITS_ENABLED"]:
+        return
+    app.extensions["rate_limits"] = create_backend(app.config["RATE_LIMIT_STORAGE"])
+    app.before_request(check_rate_limits)
@@ -0,0 +1,226 @@
+"""Optional read-replica routing.
+
+Replicas are configured with ``SQLALCHEMY_REPLICA_URIS`` and registered as
+extra binds (``replica_0``, ``replica_1``, ...). Only views wrapped in
+:func:`replica_reads` are routed to a replica, and only when:
+
+* the caller has not written in the last ``REPLICA_STICKY_SECONDS``
+  (read-your-writes), and
+* a replica passed its last health/lag probe.
+
+Writes are remembered twice. This process keeps the caller's identity
+(registering or signing in also counts as a write by the user the new
+token is for, see :func:`also_written_by`), and the response carries a
+signed, timestamped ``X-Last-Write`` header. Clients send that header
+back with their next requests, so a follow-up read that lands on another
+worker also goes to the primary.
+
+If a query on the replica fails with an ``OperationalError`` the replica
+is taken out of rotation and the view is re-run against the primary.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from functools import wraps
+
+import jwt
+from flask import current_app, g, has_app_context, request
+from itsdangerous import BadSignature, TimestampSigner
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+REPLICA_BIND_PREFIX = "replica_"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+class RoutingSession(Session):
+    """Session that sends reads to ``g.db_replica`` when a view opted in."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context():
+            replica_key = g.get("db_replica")
+            if replica_key is not None:
+                return self._db.engines[replica_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _record_write(session, flush_context):
+    if has_app_context():
+        g.db_wrote = True
+
+
+def mysql_replica_lag(conn):
+    row = conn.execute(text("SHOW REPLICA STATUS")).mappings().first()
+    if row is None:
+        return 0
+    return row.get("Seconds_Behind_Source")
+
+
+def default_lag_probe(conn):
+    if conn.dialect.name == "mysql":
+        return mysql_replica_lag(conn)
+    return 0
+
+
+class ReplicaSet:
+    def __init__(self, bind_keys, max_lag, check_interval, sticky_seconds, lag_probe=None):
+        self.bind_keys = list(bind_keys)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self.lag_probe = lag_probe or default_lag_probe
+        self._cycle = itertools.cycle(self.bind_keys) if self.bind_keys else None
+        # bind key -> (healthy, checked_at)
+        self._health = {}
+        # caller identity -> monotonic deadline for primary reads
+        self._sticky = {}
+        self._lock = threading.Lock()
+
+    def pick(self, engines):
+        if not self.bind_keys:
+            return None
+        for _ in range(len(self.bind_keys)):
+            with self._lock:
+                key = next(self._cycle)
+            if self.is_healthy(key, engines[key]):
+                return key
+        return None
+
+    def is_healthy(self, key, engine):
+        now = time.monotonic()
+        healthy, checked_at = self._health.get(key, (None, 0.0))
+        if healthy is not None and now - checked_at < self.check_interval:
+            return healthy
+        try:
+            with engine.connect() as conn:
+                lag = self.lag_probe(conn)
+            healthy = lag is not None and lag <= self.max_lag
+        except SQLAlchemyError:
+            healthy = False
+        self._health[key] = (healthy, now)
+        return healthy
+
+    def mark_down(self, key):
+        self._health[key] = (False, time.monotonic())
+
+    def mark_write(self, identity):
+        now = time.monotonic()
+        with self._lock:
+            self._sticky[identity] = now + self.sticky_seconds
+            if len(self._sticky) > 10000:
+                self._sticky = {k: v for k, v in self._sticky.items() if v > now}
+
+    def is_sticky(self, identity):
+        deadline = self._sticky.get(identity)
+        return deadline is not None and deadline > time.monotonic()
+
+
+def configure_replica_binds(config):
+    """Register replica URIs as binds; call before ``db.init_app``."""
+    uris = config.get("SQLALCHEMY_REPLICA_URIS") or []
+    binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+    for index, uri in enumerate(uris):
+        binds[f"{REPLICA_BIND_PREFIX}{index}"] = uri
+    config["SQLALCHEMY_BINDS"] = binds
+
+
+def init_replicas(app):
+    bind_keys = [
+        key for key in app.config["SQLALCHEMY_BINDS"]
+        if key and key.startswith(REPLICA_BIND_PREFIX)
+    ]
+    replicas = ReplicaSet(
+        bind_keys,
+        max_lag=app.config["REPLICA_MAX_LAG_SECONDS"],
+        check_interval=app.config["REPLICA_CHECK_INTERVAL"],
+        sticky_seconds=app.config["REPLICA_STICKY_SECONDS"],
+        lag_probe=app.config.get("REPLICA_LAG_PROBE"),
+    )
+    app.extensions["replicas"] = replicas
+
+    @app.after_request
+    def _remember_writer(response):
+        if g.get("db_wrote") and response.status_code < 400:
+            for identity in {request_identity(), *g.get("db_writers", ())}:
+                replicas.mark_write(identity)
+            response.headers[LAST_WRITE_HEADER] = _last_write_signer().sign("primary").decode()
+        return response
+
+
+def request_identity():
+    """Who is asking, without touching the database.
+
+    Uses the bearer token subject when present, else the client address.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        try:
+            payload = jwt.decode(
+                auth_header.split(" ", 1)[1],
+                current_app.config["JWT_SECRET"],
+                algorithms=["HS256"],
+            )
+            return f"user:{payload['sub']}"
+        except (jwt.InvalidTokenError, KeyError):
+            pass
+    return f"ip:{request.remote_addr}"
+
+
+def _last_write_signer() -> TimestampSigner:
+    return TimestampSigner(current_app.config["JWT_SECRET"], salt="replica-last-write")
+
+
+def wrote_recently() -> bool:
+    """Whether the request carries an ``X-Last-Write`` header from a write
+    (through any worker) in the last ``REPLICA_STICKY_SECONDS``."""
+    value = request.headers.get(LAST_WRITE_HEADER)
+    if not value:
+        return False
+    try:
+        _last_write_signer().unsign(value, max_age=current_app.config["REPLICA_STICKY_SECONDS"])
+    except BadSignature:
+        return False
+    return True
+
+
+def also_written_by(user_id):
+    """Keep ``user_id``'s reads on the primary after this request's writes.
+
+    For views that hand out a token: the caller is still anonymous (keyed
+    on their address) while registering, but sends the new token next.
+    """
+    g.db_writers = {*g.get("db_writers", ()), f"user:{user_id}"}
+
+
+def replica_reads(view):
+    """Route a read-only view to a healthy replica when it is safe to."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replicas = current_app.extensions.get("replicas")
+        if (
+            not replicas or not replicas.bind_keys
+            or replicas.is_sticky(request_identity()) or wrote_recently()
+        ):
+            return view(*args, **kwargs)
+
+        from .extensions import db
+
+        g.db_replica = replicas.pick(db.engines)
+        if g.db_replica is None:
+            return view(*args, **kwargs)
+        try:
+            return view(*args, **kwargs)
+        except OperationalError:
+            replicas.mark_down(g.db_replica)
+            db.session.rollback()
+            g.db_replica = None
+            return view(*args, **kwargs)
+        finally:
+            g.pop("db_replica", None)
+
+    return wrapper
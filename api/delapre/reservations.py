@@ -0,0 +1,215 @@
+"""Validation and capacity checks shared by the single and batch booking endpoints."""
+from __future__ import annotations
+
+import re
+from datetime import datetime
+
+from sqlalchemy import select
+
+from .confirmation_codes import new_confirmation_code
+from .extensions import db
+from .guests import guest_rows
+from .models import Booking, Event, SeatHold
+from .serializers import reserved_guest_counts
+
+# Maximum guests allowed per single booking
+MAX_GUESTS_PER_BOOKING = 4
+
+# Maximum events in one batch checkout
+MAX_BATCH_ITEMS = 20
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+PHONE_PATTERN = re.compile(r'^[\d\s\-\+\(\)]{7,20}$')
+
+
+class BookingError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def parse_guest_contact(payload):
+    """Validate guest checkout contact details; returns ``(email, name, phone)``."""
+    email = (payload.get("email") or "").strip().lower()
+    name = (payload.get("name") or "").strip()
+    phone = (payload.get("phone") or "").strip()
+    if not email:
+        raise BookingError("Email is required")
+    if not EMAIL_PATTERN.match(email):
+        raise BookingError("Please enter a valid email address")
+    if not name:
+        raise BookingError("Name is required")
+    if phone and not PHONE_PATTERN.match(phone):
+        raise BookingError("Please enter a valid phone number")
+    return email, name, phone
+
+
+def parse_guest_count(payload) -> int:
+    guest_count = payload.get("guest_count", 1)
+    try:
+        guest_count = int(guest_count)
+    except (TypeError, ValueError):
+        raise BookingError("Guest count must be a number")
+
+    if guest_count < 1:
+        raise BookingError("Guest count must be at least 1")
+    if guest_count > MAX_GUESTS_PER_BOOKING:
+        raise BookingError(f"Guest count must be {MAX_GUESTS_PER_BOOKING} or fewer")
+    return guest_count
+
+
+def parse_item(payload):
+    """Validate one booking item (``event_id``, ``guest_count``, ``guest_names``
+    and the optional ``hold_token`` and waiting room ``queue_token``)."""
+    event_id = payload.get("event_id")
+    if not event_id:
+        raise BookingError("Event id is required")
+    try:
+        event_id = int(event_id)
+    except (TypeError, ValueError):
+        raise BookingError("Event id must be a number")
+
+    guest_count = parse_guest_count(payload)
+
+    guest_names_raw = payload.get("guest_names") or []
+    if isinstance(guest_names_raw, str):
+        guest_names = [
+            name.strip() for name in guest_names_raw.split(",") if name.strip()
+        ]
+    elif isinstance(guest_names_raw, list):
+        guest_names = []
+        for g in guest_names_raw:
+            if isinstance(g, str) and g.strip():
+                guest_names.append(g.strip())
+            elif isinstance(g, dict):
+                guest_names.append(g)
+    else:
+        guest_names = []
+
+    if guest_names and len(guest_names) > guest_count:
+        guest_names = guest_names[:guest_count]
+
+    hold_token = payload.get("hold_token")
+    if not isinstance(hold_token, str):
+        hold_token = None
+    queue_token = payload.get("queue_token")
+    if not isinstance(queue_token, str):
+        queue_token = None
+
+    return {
+        "event_id": event_id,
+        "guest_count": guest_count,
+        "guest_names": guest_names,
+        "hold_token": hold_token,
+        "queue_token": queue_token,
+    }
+
+
+def already_booked_statement(event_ids, user_id=None, email=None):
+    """Ids of the events in ``event_ids`` the user (or guest ``email``)
+    already has a confirmed booking for."""
+    booker = Booking.user_id == user_id if user_id is not None else Booking.guest_email == email
+    return select(Booking.event_id).where(Booking.event_id.in_(event_ids), Booking.status == "confirmed", booker)
+
+
+def reserve(items, user=None, contact=None):
+    """Check and add bookings for ``items`` to the session without committing.
+
+    ``items`` are dicts from :func:`parse_item` or :class:`BookingError`
+    instances for items that failed parsing. Either ``user`` (a ``User``)
+    or ``contact`` (``(email, name, phone)`` from :func:`parse_guest_contact`)
+    identifies the booker.
+
+    An item whose ``hold_token`` names an active hold on the same event
+    (placed anonymously or by ``user``) that covers its guests takes over
+    the held seats, and its hold is deleted. Capacity is read once, and
+    only for events booked without such a hold.
+
+    Returns one ``Booking`` or ``BookingError`` per item, in order; the
+    caller commits only if there are no errors.
+    """
+    parsed = [item for item in items if isinstance(item, dict)]
+    event_ids = {item["event_id"] for item in parsed}
+    events = {}
+    already_booked = set()
+    holds = {}
+    if event_ids:
+        events = {
+            event.id: event
+            for event in Event.query.filter(Event.id.in_(event_ids)).with_for_update().all()
+        }
+        if user is not None:
+            existing = already_booked_statement(event_ids, user_id=user.id)
+        else:
+            existing = already_booked_statement(event_ids, email=contact[0])
+        already_booked = set(db.session.scalars(existing))
+
+    now = datetime.utcnow()
+    tokens = {item["hold_token"] for item in parsed if item["hold_token"]}
+    if tokens:
+        holds = {
+            hold.token: hold
+            for hold in SeatHold.query.filter(SeatHold.token.in_(tokens)).with_for_update()
+            if hold.expires_at > now
+            and (hold.user_id is None or (user is not None and hold.user_id == user.id))
+        }
+
+    def hold_for(item):
+        hold = holds.get(item["hold_token"])
+        return hold if hold is not None and hold.event_id == item["event_id"] else None
+
+    unheld = set()
+    for item in parsed:
+        hold = hold_for(item)
+        if hold is None or hold.guest_count < item["guest_count"]:
+            unheld.add(item["event_id"])
+    reserved = reserved_guest_counts(unheld)
+
+    if user is not None:
+        duplicate_message = "Booking already exists"
+    else:
+        duplicate_message = "A booking with this email already exists for this event"
+
+    results = []
+    for item in items:
+        if isinstance(item, BookingError):
+            results.append(item)
+            continue
+        event = events.get(item["event_id"])
+        if not event:
+            results.append(BookingError("Event not found", 404))
+            continue
+        if event.id in already_booked:
+            results.append(BookingError(duplicate_message, 409))
+            continue
+        hold = hold_for(item)
+        held = hold.guest_count if hold is not None else 0
+        if item["guest_count"] > held:
+            # Seats beyond the hold (or without one) come from what is left;
+            # the hold's own seats are already part of ``reserved``.
+            available = event.capacity - reserved.get(event.id, 0) + held
+            if event.capacity > 0 and item["guest_count"] > available:
+                results.append(BookingError("Not enough spaces available", 409))
+                continue
+            reserved[event.id] = reserved.get(event.id, 0) + item["guest_count"] - held
+
+        booking = Booking(
+            user_id=user.id if user is not None else None,
+            event_id=event.id,
+            status="confirmed",
+            guest_count=item["guest_count"],
+            guests=guest_rows(item["guest_names"]),
+            confirmation_code=new_confirmation_code(),
+        )
+        if contact is not None:
+            booking.guest_email, booking.guest_name, phone = contact
+            booking.guest_phone = phone or None
+        booking.event = event
+        db.session.add(booking)
+        if hold is not None:
+            db.session.delete(hold)
+            holds.pop(hold.token)
+        already_booked.add(event.id)
+        results.append(booking)
+    return results
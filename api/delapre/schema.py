@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+from flask import current_app
+from sqlalchemy import inspect, text
+from werkzeug.security import generate_password_hash
+
+from .extensions import db
+from .models import Booking, Event, User
+
+# Tables whose indexes (declared in ``__table_args__``) ``flask
+# ensure-indexes`` adds to existing databases; create_all() only creates
+# them with new tables.
+INDEXED_MODELS = (Event, Booking)
+
+
+def ensure_booking_columns():
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            text(
+                """
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = :schema_name AND TABLE_NAME = 'bookings'
+                """
+            ),
+            {"schema_name": conn.engine.url.database},
+        )
+        columns = {row[0] for row in result}
+        if "guest_count" not in columns:
+            conn.execute(
+                text(
+                    "ALTER TABLE bookings ADD COLUMN guest_count INT UNSIGNED NOT NULL DEFAULT 1"
+                )
+            )
+        if "guest_names" not in columns:
+            conn.execute(text("ALTER TABLE bookings ADD COLUMN guest_names TEXT NULL"))
+        if "guest_email" not in columns:
+            conn.execute(text("ALTER TABLE bookings ADD COLUMN guest_email VARCHAR(255) NULL"))
+        if "guest_name" not in columns:
+            conn.execute(text("ALTER TABLE bookings ADD COLUMN guest_name VARCHAR(255) NULL"))
+        if "guest_phone" not in columns:
+            conn.execute(text("ALTER TABLE bookings ADD COLUMN guest_phone VARCHAR(50) NULL"))
+        if "confirmation_code" not in columns:
+            conn.execute(text("ALTER TABLE bookings ADD COLUMN confirmation_code VARCHAR(10) NULL"))
+            try:
+                conn.execute(text("CREATE UNIQUE INDEX uk_bookings_confirmation_code ON bookings(confirmation_code)"))
+            except Exception:
+                pass
+        if "checked_in" not in columns:
+            conn.execute(text("ALTER TABLE bookings ADD COLUMN checked_in TINYINT(1) NOT NULL DEFAULT 0"))
+        if "checked_in_at" not in columns:
+            conn.execute(text("ALTER TABLE bookings ADD COLUMN checked_in_at DATETIME NULL"))
+        # Make user_id nullable if it isn't already
+        try:
+            conn.execute(text("ALTER TABLE bookings MODIFY COLUMN user_id BIGINT UNSIGNED NULL"))
+        except Exception:
+            pass
+
+
+def ensure_user_columns():
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            text(
+                """
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = :schema_name AND TABLE_NAME = 'users'
+                """
+            ),
+            {"schema_name": conn.engine.url.database},
+        )
+        columns = {row[0] for row in result}
+        if "first_name" not in columns:
+            conn.execute(
+                text(
+                    "ALTER TABLE users ADD COLUMN first_name VARCHAR(120) NOT NULL DEFAULT ''"
+                )
+            )
+        if "last_name" not in columns:
+            conn.execute(
+                text(
+                    "ALTER TABLE users ADD COLUMN last_name VARCHAR(120) NOT NULL DEFAULT ''"
+                )
+            )
+        if "full_name" in columns:
+            conn.execute(
+                text(
+                    """
+                    UPDATE users
+                    SET first_name = IF(first_name = '', SUBSTRING_INDEX(full_name, ' ', 1), first_name),
+                        last_name = IF(last_name = '', TRIM(SUBSTRING(full_name, LOCATE(' ', full_name) + 1)), last_name)
+                    WHERE (first_name = '' OR last_name = '')
+                    """
+                )
+            )
+        if "is_staff" not in columns:
+            conn.execute(
+                text("ALTER TABLE users ADD COLUMN is_staff TINYINT(1) NOT NULL DEFAULT 0")
+            )
+        if "phone" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN phone VARCHAR(50) NULL"))
+        if "email_opt_in" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN email_opt_in TINYINT(1) NOT NULL DEFAULT 1"))
+        if "sms_opt_in" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN sms_opt_in TINYINT(1) NOT NULL DEFAULT 0"))
+        if "calendar_feed_version" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN calendar_feed_version INT NOT NULL DEFAULT 0"))
+
+
+def ensure_hold_columns():
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            text(
+                """
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = :schema_name AND TABLE_NAME = 'seat_holds'
+                """
+            ),
+            {"schema_name": conn.engine.url.database},
+        )
+        columns = {row[0] for row in result}
+        if "client_address" not in columns:
+            conn.execute(text("ALTER TABLE seat_holds ADD COLUMN client_address VARCHAR(45) NULL"))
+
+
+def ensure_event_columns():
+    with db.engine.begin() as conn:
+        # ensure categories table exists
+        conn.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS categories (
+                  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+                  name VARCHAR(50) NOT NULL,
+                  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                  PRIMARY KEY (id),
+                  UNIQUE KEY uk_categories_name (name)
+                ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                """
+            )
+        )
+
+        # ensure locations table exists
+        conn.execute(
+                text(
+                        """
+                        CREATE TABLE IF NOT EXISTS locations (
+                            id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+                            name VARCHAR(255) NOT NULL,
+                            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                            PRIMARY KEY (id),
+                            UNIQUE KEY uk_locations_name (name)
+                        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+                        """
+                )
+        )
+        result = conn.execute(
+            text(
+                """
+                SELECT COLUMN_NAME
+                FROM INFORMATION_SCHEMA.COLUMNS
+                WHERE TABLE_SCHEMA = :schema_name AND TABLE_NAME = 'events'
+                """
+            ),
+            {"schema_name": conn.engine.url.database},
+        )
+        columns = {row[0] for row in result}
+
+        # category_id
+        if "category_id" not in columns:
+            conn.execute(text("ALTER TABLE events ADD COLUMN category_id BIGINT UNSIGNED NULL"))
+            try:
+                conn.execute(text("ALTER TABLE events ADD CONSTRAINT fk_events_category FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE SET NULL"))
+            except Exception:
+                pass
+
+        # location_id
+        if "location_id" not in columns:
+            conn.execute(text("ALTER TABLE events ADD COLUMN location_id BIGINT UNSIGNED NULL"))
+            try:
+                conn.execute(text("ALTER TABLE events ADD CONSTRAINT fk_events_location FOREIGN KEY (location_id) REFERENCES locations (id) ON DELETE SET NULL"))
+            except Exception:
+                pass
+
+        # group_id and index
+        if "group_id" not in columns:
+            conn.execute(text("ALTER TABLE events ADD COLUMN group_id VARCHAR(36) NULL"))
+            try:
+                conn.execute(text("CREATE INDEX idx_events_group_id ON events(group_id)"))
+            except Exception:
+                pass
+
+        # recurrence_type
+        if "recurrence_type" not in columns:
+            conn.execute(text("ALTER TABLE events ADD COLUMN recurrence_type VARCHAR(20) NULL"))
+
+        # version (calendar feed fingerprints)
+        if "version" not in columns:
+            conn.execute(text("ALTER TABLE events ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1"))
+
+
+def ensure_indexes() -> list:
+    """Create any declared index missing from an existing table; returns
+    the names of the indexes created.
+
+    Run as a deploy step (``flask ensure-indexes``), not at app start: MySQL
+    builds secondary indexes online (InnoDB ``ALGORITHM=INPLACE``), but on
+    a large table that still takes a while.
+    """
+    created = []
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        for model in INDEXED_MODELS:
+            table = model.__table__
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+    return created
+
+
+def ensure_staff_user():
+    user = User.query.filter_by(email="staff@example.com").first()
+    if not user:
+        user = User(
+            email="staff@example.com",
+            password_hash=generate_password_hash("password", current_app.config["PASSWORD_HASH_METHOD"]),
+            first_name="Staff",
+            last_name="User",
+            is_staff=True
+        )
+        db.session.add(user)
+        print("Created default staff user: staff@example.com")
+    elif not user.is_staff:
+        # The password is left alone: hashing it on every startup was slow
+        # and undid any change made since.
+        user.is_staff = True
+        print("Updated existing staff user: staff@example.com")
+    else:
+        return
+
+    db.session.commit()
+
+
+def prepare_database():
+    # Only the primary; replicas receive the schema through replication.
+    db.create_all(bind_key=None)
+    # The ALTER TABLE patches below bring older MySQL databases (created
+    # from early versions of init.sql) up to the current models. Fresh
+    # databases of any other dialect are fully described by create_all().
+    if db.engine.dialect.name == "mysql":
+        ensure_user_columns()
+        ensure_booking_columns()
+        ensure_event_columns()
+        ensure_hold_columns()
+    if current_app.config.get("SEED_STAFF_USER", True):
+        ensure_staff_user()
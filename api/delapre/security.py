@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from functools import wraps
+
+import jwt
+from flask import current_app, g, request
+
+from .extensions import db
+from .models import User
+from .utils import json_error
+
+
+def token_for_user(user: User) -> str:
+    payload = {
+        "sub": str(user.id),
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "phone": user.phone,
+        "email_opt_in": bool(user.email_opt_in),
+        "sms_opt_in": bool(user.sms_opt_in),
+        "exp": datetime.utcnow() + timedelta(hours=12),
+    }
+    return jwt.encode(payload, current_app.config["JWT_SECRET"], algorithm="HS256")
+
+
+def bearer_payload(auth_header: str, secret: str):
+    """Decode an ``Authorization: Bearer`` header.
+
+    Returns ``(payload, None)`` on success or ``(None, error_message)``.
+    """
+    if not auth_header.startswith("Bearer "):
+        return None, "Missing or invalid token"
+    token = auth_header.split(" ", 1)[1]
+    try:
+        return jwt.decode(token, secret, algorithms=["HS256"]), None
+    except jwt.ExpiredSignatureError:
+        return None, "Token expired"
+    except jwt.InvalidTokenError:
+        return None, "Invalid token"
+
+
+def user_from_request():
+    """Resolve the bearer token on the current request.
+
+    Returns ``(user, None)`` on success or ``(None, error_response)``;
+    failures are noted on ``g`` so their responses are not stored for
+    ``Idempotency-Key`` replay.
+    """
+    payload, message = bearer_payload(request.headers.get("Authorization", ""), current_app.config["JWT_SECRET"])
+    if message:
+        g.auth_failed = True
+        return None, json_error(message, 401)
+    user = db.session.get(User, int(payload["sub"]))
+    if not user:
+        g.auth_failed = True
+        return None, json_error("User not found", 401)
+    return user, None
+
+
+def require_auth(handler):
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        user, error = user_from_request()
+        if error:
+            return error
+        return handler(user, *args, **kwargs)
+
+    return wrapper
+
+
+def require_staff(handler):
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        user, error = user_from_request()
+        if error:
+            return error
+        if not getattr(user, "is_staff", False):
+            g.auth_failed = True
+            return json_error("Forbidden", 403)
+        return handler(user, *args, **kwargs)
+
+    return wrapper
+
+
+def user_to_dict(user: User):
+    return {
+        "id": user.id,
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "is_staff": bool(user.is_staff),
+        "phone": user.phone,
+        "email_opt_in": bool(user.email_opt_in),
+        "sms_opt_in": bool(user.sms_opt_in),
+    }
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import case, func, select, union_all
+from sqlalchemy.orm import contains_eager
+
+from .extensions import db
+from .guests import booking_guest_entries, guests_by_booking
+from .models import ArchivedBooking, ArchivedBookingGuest, Booking, Event, SeatHold
+from .streaming import stream_json_array
+
+EVENT_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "starts_at",
+    "ends_at",
+    "location_id",
+    "location",
+    "is_free",
+    "price",
+    "capacity",
+    "spots_left",
+    "category_id",
+    "category",
+    "group_id",
+    "recurrence_type",
+)
+
+BOOKING_FIELDS = (
+    "id",
+    "status",
+    "guest_count",
+    "guest_names",
+    "guest_email",
+    "guest_name",
+    "guest_phone",
+    "confirmation_code",
+    "booked_at",
+    "cancelled_at",
+    "checked_in",
+    "checked_in_at",
+    "event_id",
+    "event",
+)
+
+_EVENT_GETTERS = {
+    "id": lambda e: e.id,
+    "title": lambda e: e.title,
+    "description": lambda e: e.description,
+    "starts_at": lambda e: e.starts_at.isoformat(),
+    "ends_at": lambda e: e.ends_at.isoformat(),
+    "location_id": lambda e: int(e.location_id) if getattr(e, "location_id", None) is not None else None,
+    "location": lambda e: e.location.name if getattr(e, "location", None) else None,
+    "is_free": lambda e: bool(e.is_free),
+    "price": lambda e: float(e.price) if e.price else 0.00,
+    "capacity": lambda e: e.capacity,
+    "category_id": lambda e: int(e.category_id) if getattr(e, "category_id", None) is not None else None,
+    "category": lambda e: {"id": int(e.category.id), "name": e.category.name} if getattr(e, "category", None) else None,
+    "group_id": lambda e: e.group_id,
+    "recurrence_type": lambda e: e.recurrence_type,
+}
+
+
+_BOOKING_GETTERS = {
+    "id": lambda b: b.id,
+    "status": lambda b: b.status,
+    "guest_count": lambda b: b.guest_count,
+    "guest_email": lambda b: b.guest_email,
+    "guest_name": lambda b: b.guest_name,
+    "guest_phone": lambda b: b.guest_phone,
+    "confirmation_code": lambda b: b.confirmation_code,
+    "booked_at": lambda b: b.booked_at.isoformat() if b.booked_at else None,
+    "cancelled_at": lambda b: b.cancelled_at.isoformat() if b.cancelled_at else None,
+    "checked_in": lambda b: bool(b.checked_in),
+    "checked_in_at": lambda b: b.checked_in_at.isoformat() if b.checked_in_at else None,
+    "event_id": lambda b: b.event_id,
+}
+
+
+def parse_fields(raw, allowed):
+    """Parse a ``fields=a,b,c`` query value; ``None`` means all fields."""
+    if not raw:
+        return None
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields or None
+
+
+def event_fields_from_request():
+    return parse_fields(request.args.get("fields"), EVENT_FIELDS)
+
+
+def booking_options_from_request():
+    """Read ``fields``, ``event_fields`` and ``normalize`` for booking lists."""
+    return {
+        "fields": parse_fields(request.args.get("fields"), BOOKING_FIELDS),
+        "event_fields": parse_fields(request.args.get("event_fields"), EVENT_FIELDS),
+        "normalize": request.args.get("normalize") in {"1", "true", "True"},
+    }
+
+
+def _active_hold_seats(event_ids, now):
+    return select(SeatHold.event_id, SeatHold.guest_count).where(
+        SeatHold.event_id.in_(event_ids), SeatHold.expires_at > now
+    )
+
+
+def reserved_seats_statement(event_ids):
+    """``(event_id, seats)`` rows for :func:`reserved_guest_counts`."""
+    seats = union_all(
+        select(Booking.event_id, Booking.guest_count).where(
+            Booking.event_id.in_(event_ids), Booking.status == "confirmed"
+        ),
+        _active_hold_seats(event_ids, datetime.utcnow()),
+    ).subquery()
+    return (
+        select(seats.c.event_id, func.coalesce(func.sum(seats.c.guest_count), 0))
+        .group_by(seats.c.event_id)
+    )
+
+
+def reserved_guest_counts(event_ids) -> dict:
+    """Seats taken per event (confirmed guests plus active cart holds).
+
+    Both sources are summed in one grouped query for many events.
+    """
+    event_ids = list(set(event_ids))
+    if not event_ids:
+        return {}
+    rows = db.session.execute(reserved_seats_statement(event_ids))
+    return {event_id: int(total or 0) for event_id, total in rows}
+
+
+def attendance_statement(event_ids):
+    """``(event_id, confirmed_guests, checked_in_guests)`` rows for :func:`attendance_counts`."""
+    return (
+        select(
+            Booking.event_id,
+            func.coalesce(func.sum(Booking.guest_count), 0),
+            func.coalesce(func.sum(case((Booking.checked_in.is_(True), Booking.guest_count), else_=0)), 0),
+        )
+        .where(Booking.event_id.in_(event_ids), Booking.status == "confirmed")
+        .group_by(Booking.event_id)
+    )
+
+
+def attendance_counts(event_ids) -> dict:
+    """``{event_id: (confirmed_guests, checked_in_guests)}`` in one query."""
+    event_ids = list(set(event_ids))
+    if not event_ids:
+        return {}
+    rows = db.session.execute(attendance_statement(event_ids))
+    return {event_id: (int(confirmed or 0), int(checked_in or 0)) for event_id, confirmed, checked_in in rows}
+
+
+def upcoming_events_statement(now):
+    """Events starting at or after ``now``, soonest first."""
+    return select(Event).where(Event.starts_at >= now).order_by(Event.starts_at.asc())
+
+
+def booking_history_statement(user_id: int):
+    """All of a user's bookings with their events, newest first."""
+    return (
+        select(Booking)
+        .join(Event)
+        .where(Booking.user_id == user_id)
+        .options(contains_eager(Booking.event))
+        .order_by(Booking.booked_at.desc())
+    )
+
+
+def event_to_dict(event: Event, include_spots: bool = True, fields=None, reserved=None):
+    """Serialize an event.
+
+    Pass ``reserved`` (see :func:`reserved_guest_counts`) to avoid a
+    per-event aggregate query when serializing many events.
+    """
+    data = {}
+    for name in fields or EVENT_FIELDS:
+        if name != "spots_left":
+            data[name] = _EVENT_GETTERS[name](event)
+            continue
+        spots_left = None
+        if include_spots:
+            if reserved is None:
+                reserved = reserved_guest_counts([event.id]).get(event.id, 0)
+            spots_left = max(0, event.capacity - int(reserved or 0))
+        data[name] = spots_left
+    return data
+
+
+def wants_spots(fields) -> bool:
+    return fields is None or "spots_left" in fields
+
+
+def events_to_list(events, fields=None, reserved=None):
+    """Serialize events; ``reserved`` is read in one query unless given."""
+    if reserved is None:
+        reserved = reserved_guest_counts(event.id for event in events) if wants_spots(fields) else {}
+    return [
+        event_to_dict(event, fields=fields, reserved=reserved.get(event.id, 0))
+        for event in events
+    ]
+
+
+def booking_to_dict(booking: Booking, fields=None, event=None, guests=None):
+    """Serialize a booking.
+
+    ``event`` replaces the embedded event dict (e.g. a shared, already
+    serialized copy); by default the booking's event is serialized.
+    Likewise ``guests`` (see :func:`guests_by_booking`) saves loading the
+    booking's guests on its own.
+    """
+    data = {}
+    for name in fields or BOOKING_FIELDS:
+        if name == "event":
+            data[name] = event if event is not None else event_to_dict(booking.event)
+        elif name == "guest_names":
+            data[name] = booking_guest_entries(booking, guests)
+        else:
+            data[name] = _BOOKING_GETTERS[name](booking)
+    return data
+
+
+def bookings_to_payload(bookings, fields=None, event_fields=None, normalize=False, event_cache=None):
+    """Serialize a list of bookings, serializing each event only once and
+    loading every booking's guests in one query.
+
+    With ``normalize`` the result is ``{"bookings": [...], "events": {id: ...}}``
+    and bookings reference their event by ``event_id`` instead of embedding it.
+    ``event_cache`` (a dict) carries serialized events over to later calls.
+    """
+    bookings = list(bookings)
+    want_event = normalize or fields is None or "event" in fields
+    event_dicts = {}
+    if want_event:
+        cache = event_cache if event_cache is not None else {}
+        events = {booking.event_id: booking.event for booking in bookings}
+        new_events = {event_id: event for event_id, event in events.items() if event_id not in cache}
+        reserved = {}
+        if new_events and (event_fields is None or "spots_left" in event_fields):
+            reserved = reserved_guest_counts(new_events)
+        for event_id, event in new_events.items():
+            cache[event_id] = event_to_dict(event, fields=event_fields, reserved=reserved.get(event_id, 0))
+        event_dicts = {event_id: cache[event_id] for event_id in events}
+    guests = {}
+    if fields is None or "guest_names" in fields:
+        guests = guests_by_booking(b.id for b in bookings if not isinstance(b, ArchivedBooking))
+        archived = [b.id for b in bookings if isinstance(b, ArchivedBooking)]
+        if archived:
+            guests.update(guests_by_booking(archived, model=ArchivedBookingGuest))
+
+    if normalize:
+        booking_fields = tuple(f for f in (fields or BOOKING_FIELDS) if f != "event")
+        if "event_id" not in booking_fields:
+            booking_fields += ("event_id",)
+        return {
+            "bookings": [
+                booking_to_dict(b, fields=booking_fields, guests=guests.get(b.id, []))
+                for b in bookings
+            ],
+            "events": {str(event_id): data for event_id, data in event_dicts.items()},
+        }
+
+    return [
+        booking_to_dict(b, fields=fields, event=event_dicts.get(b.event_id), guests=guests.get(b.id, []))
+        for b in bookings
+    ]
+
+
+def stream_bookings_payload(chunks, fields=None, event_fields=None, normalize=False):
+    """:func:`bookings_to_payload` as JSON text, serializing one chunk
+    (list) of bookings at a time."""
+    events = {}
+    if not normalize:
+        yield from stream_json_array(
+            item for chunk in chunks for item in bookings_to_payload(chunk, fields, event_fields, event_cache=events)
+        )
+        return
+
+    def items():
+        for chunk in chunks:
+            yield from bookings_to_payload(chunk, fields, event_fields, normalize=True, event_cache=events)["bookings"]
+
+    yield '{"bookings":'
+    yield from stream_json_array(items())
+    yield ',"events":' + current_app.json.dumps({str(event_id): data for event_id, data in events.items()}) + "}"
@@ -0,0 +1,318 @@
+"""Static JSON snapshots of the public catalogue.
+
+The catalogue (``GET /api/events``, ``/api/events/<id>``,
+``/api/categories`` and ``/api/locations`` without query parameters)
+only changes when something is written, so it can be rendered to files
+that nginx or a CDN serves without the app. With ``SNAPSHOT_DIR`` set,
+each publish writes a new version directory::
+
+    SNAPSHOT_DIR/
+      current -> 20300101T120000-1a2b3c4d
+      20300101T120000-1a2b3c4d/
+        manifest.json
+        events.json  events.json.gz
+        categories.json  categories.json.gz
+        locations.json  locations.json.gz
+        events/12.json  events/12.json.gz ...
+
+and then swaps the ``current`` symlink, so readers never see half a
+version. Files whose content did not change are hard-linked from the
+previous version rather than compressed again. nginx can serve them
+with, for example::
+
+    location = /api/events {
+        root /srv/snapshots/current;
+        try_files /events.json @api;
+        gzip_static on;
+    }
+
+Commits that touch events, bookings, holds, locations or categories
+record a change marker (shared by all workers through ``SNAPSHOT_DIR``)
+and publish again ``SNAPSHOT_DEBOUNCE_SECONDS`` after the first change,
+so a burst of bookings costs one publish. The API serves a snapshot only
+while no change has been recorded since it was rendered and it is at
+most ``SNAPSHOT_MAX_AGE`` seconds old (holds expire without a write);
+otherwise it answers from the database, and publishes again if the
+snapshot was merely old. ``flask publish-snapshots --interval`` keeps the
+files fresh for nginx between writes.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context, request
+
+from .changes import on_commit
+from .extensions import db
+from .models import Booking, Category, Event, Location, SeatHold
+from .serializers import event_to_dict, reserved_guest_counts
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+TRACKED_MODELS = (Event, Booking, SeatHold, Location, Category)
+MANIFEST = "manifest.json"
+MARKER = "changed"
+
+
+class Snapshot:
+    """One published version, as read by the API."""
+
+    def __init__(self, path: str, manifest: dict):
+        self.path = path
+        self.manifest = manifest
+
+    def response(self, name: str):
+        """The file as a conditional response, or ``None`` if it is missing."""
+        digest = self.manifest["files"].get(name)
+        if digest is None:
+            return None
+        path = os.path.join(self.path, name)
+        gzipped = bool(request.accept_encodings.quality("gzip"))
+        with open(path + ".gz" if gzipped else path, "rb") as f:
+            response = current_app.response_class(f.read(), mimetype="application/json")
+        if gzipped:
+            response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+        # Each encoding is its own representation with its own ETag
+        response.set_etag(f"{digest}-gzip" if gzipped else digest)
+        response.headers["X-Snapshot-Version"] = self.manifest["version"]
+        return response.make_conditional(request)
+
+
+class SnapshotPublisher:
+    def __init__(self, app, directory: str, debounce: float, max_age: float, keep: int):
+        self.app = app
+        self.directory = directory
+        self.debounce = debounce
+        self.max_age = max_age
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last_timer = None
+        # ((current symlink target, manifest mtime), Snapshot) last read
+        self._current = (None, None)
+
+    # Change tracking -------------------------------------------------
+
+    def _marker_path(self) -> str:
+        return os.path.join(self.directory, MARKER)
+
+    def marker(self) -> str:
+        try:
+            with open(self._marker_path()) as f:
+                return f.read()
+        except FileNotFoundError:
+            return ""
+
+    def changed(self):
+        """Record a committed change and schedule a publish."""
+        os.makedirs(self.directory, exist_ok=True)
+        temp = f"{self._marker_path()}.{os.getpid()}.{threading.get_ident()}"
+        with open(temp, "w") as f:
+            f.write(f"{time.time_ns()}-{os.getpid()}")
+        os.replace(temp, self._marker_path())
+        self.schedule()
+
+    def schedule(self):
+        """Publish in ``debounce`` seconds, unless a publish is already due."""
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce, self._publish_later)
+                self._timer.daemon = True
+                self._timer.start()
+                self._last_timer = self._timer
+
+    def _publish_later(self):
+        with self._lock:
+            self._timer = None
+        with self.app.app_context():
+            try:
+                self.publish()
+            except Exception:
+                self.app.logger.exception("Could not publish catalogue snapshots")
+            finally:
+                db.session.remove()
+
+    def wait(self):
+        """Wait for a scheduled publish to finish."""
+        with self._lock:
+            timer = self._last_timer
+        if timer is not None:
+            timer.join()
+
+    # Reading ---------------------------------------------------------
+
+    def current(self):
+        """The published snapshot if it is up to date, else ``None``."""
+        try:
+            target = os.readlink(os.path.join(self.directory, "current"))
+            path = os.path.join(self.directory, target)
+            key = (target, os.stat(os.path.join(path, MANIFEST)).st_mtime_ns)
+        except OSError:
+            return None
+        known, snapshot = self._current
+        if known != key:
+            try:
+                with open(os.path.join(path, MANIFEST)) as f:
+                    snapshot = Snapshot(path, json.load(f))
+            except FileNotFoundError:
+                return None
+            self._current = (key, snapshot)
+        manifest = snapshot.manifest
+        if manifest["marker"] != self.marker():
+            # The worker that wrote has a publish scheduled
+            return None
+        if time.time() - manifest["rendered_at"] > self.max_age:
+            self.schedule()
+            return None
+        return snapshot
+
+    # Publishing ------------------------------------------------------
+
+    @contextmanager
+    def _exclusive(self):
+        """Serialize publishes across the workers sharing the directory."""
+        with open(os.path.join(self.directory, ".lock"), "w") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def publish(self) -> str:
+        """Render and publish a new version; returns its name."""
+        os.makedirs(self.directory, exist_ok=True)
+        marker = self.marker()
+        rendered_at = time.time()
+        documents = render_documents()
+        files = {name: hashlib.sha1(body).hexdigest() for name, body in documents.items()}
+        version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(rendered_at))
+        version += "-" + hashlib.sha1("".join(sorted(files.values())).encode()).hexdigest()[:8]
+
+        with self._exclusive():
+            previous = self._read_current_manifest()
+            if previous is not None and previous["rendered_at"] > rendered_at:
+                # Another worker published a later rendering meanwhile
+                return previous["version"]
+            if previous is not None and previous["files"] == files:
+                # Nothing visible changed; only record the newer marker
+                manifest = {**previous, "rendered_at": rendered_at, "marker": marker}
+                path = os.path.join(self.directory, previous["version"])
+                self._write(path, MANIFEST, json.dumps(manifest).encode(), compress=False)
+                return previous["version"]
+            manifest = {"version": version, "rendered_at": rendered_at, "marker": marker, "files": files}
+            path = os.path.join(self.directory, version)
+            temp = os.path.join(self.directory, f".{version}.tmp")
+            shutil.rmtree(temp, ignore_errors=True)
+            old_path = os.path.join(self.directory, previous["version"]) if previous else None
+            old_files = previous["files"] if previous else {}
+            for name, body in documents.items():
+                if old_files.get(name) == files[name]:
+                    self._link(old_path, temp, name)
+                else:
+                    self._write(temp, name, body)
+            self._write(temp, MANIFEST, json.dumps(manifest).encode(), compress=False)
+            shutil.rmtree(path, ignore_errors=True)
+            os.rename(temp, path)
+            link = os.path.join(self.directory, f".current.{os.getpid()}")
+            if os.path.lexists(link):
+                os.unlink(link)
+            os.symlink(version, link)
+            os.replace(link, os.path.join(self.directory, "current"))
+            self._prune(version)
+        return version
+
+    def _read_current_manifest(self):
+        try:
+            with open(os.path.join(self.directory, "current", MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write(directory: str, name: str, body: bytes, compress: bool = True):
+        path = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(body)
+        os.replace(temp, path)
+        if compress:
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(body, compresslevel=9, mtime=0))
+
+    @staticmethod
+    def _link(source_dir: str, target_dir: str, name: str):
+        os.makedirs(os.path.dirname(os.path.join(target_dir, name)), exist_ok=True)
+        for suffix in ("", ".gz"):
+            os.link(os.path.join(source_dir, name + suffix), os.path.join(target_dir, name + suffix))
+
+    def _prune(self, current: str):
+        versions = sorted(
+            name for name in os.listdir(self.directory)
+            if not name.startswith(".") and name not in {"current", MARKER, current}
+            and os.path.isdir(os.path.join(self.directory, name))
+        )
+        # Keep a few older versions for clients still reading them
+        for name in versions[:-self.keep] if self.keep else versions:
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+
+def render_documents() -> dict:
+    """``{file name: JSON bytes}`` for every published document."""
+    dumps = current_app.json.dumps
+    events = Event.query.order_by(Event.starts_at.asc()).all()
+    reserved = reserved_guest_counts(event.id for event in events)
+    event_dicts = [event_to_dict(event, reserved=reserved.get(event.id, 0)) for event in events]
+    documents = {"events.json": dumps(event_dicts).encode()}
+    for data in event_dicts:
+        documents[f"events/{data['id']}.json"] = dumps(data).encode()
+    categories = Category.query.order_by(Category.name.asc()).all()
+    documents["categories.json"] = dumps([{"id": c.id, "name": c.name} for c in categories]).encode()
+    locations = Location.query.order_by(Location.name.asc()).all()
+    documents["locations.json"] = dumps([{"id": l.id, "name": l.name} for l in locations]).encode()
+    return documents
+
+
+def snapshot_publisher():
+    """The app's publisher, or ``None`` when ``SNAPSHOT_DIR`` is not set."""
+    config = current_app.config
+    if not config["SNAPSHOT_DIR"]:
+        return None
+    extensions = current_app.extensions
+    if "snapshots" not in extensions:
+        extensions["snapshots"] = SnapshotPublisher(
+            current_app._get_current_object(),
+            config["SNAPSHOT_DIR"],
+            config["SNAPSHOT_DEBOUNCE_SECONDS"],
+            config["SNAPSHOT_MAX_AGE"],
+            config["SNAPSHOT_KEEP"],
+        )
+    return extensions["snapshots"]
+
+
+def snapshot_response(name: str):
+    """Serve ``name`` from an up-to-date snapshot, or ``None`` to answer live."""
+    if request.args:
+        return None
+    publisher = snapshot_publisher()
+    snapshot = publisher.current() if publisher is not None else None
+    return snapshot.response(name) if snapshot is not None else None
+
+
+def _schedule_publish():
+    if has_app_context():
+        publisher = snapshot_publisher()
+        if publisher is not None:
+            publisher.changed()
+
+
+on_commit(TRACKED_MODELS, _schedule_publish)
@@ -0,0 +1,46 @@
+"""Streaming large JSON responses.
+
+:func:`server_side_chunks` reads a query through a server-side cursor
+(``stream_results``: an unbuffered cursor on MySQL) on a connection of
+its own, so the rows never sit in memory all at once and the session
+stays free for the per-chunk queries that load and serialize them.
+:func:`stream_json_array` turns the rows into a JSON array a chunk at a
+time, to be sent with ``stream_with_context``.
+"""
+from __future__ import annotations
+
+from flask import current_app
+
+from .extensions import db
+
+CHUNK_ROWS = 500
+
+
+def server_side_chunks(statement, chunk_rows: int = CHUNK_ROWS):
+    """Lists of up to ``chunk_rows`` rows of ``statement``.
+
+    The engine is chosen when this is called, so a view routed to a
+    replica keeps reading from it while the response streams.
+    """
+    engine = db.session.get_bind()
+
+    def chunks():
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(statement)
+            for partition in result.partitions(chunk_rows):
+                yield partition
+
+    return chunks()
+
+
+def stream_json_array(items, chunk_rows: int = CHUNK_ROWS):
+    """A JSON array of ``items`` in chunks of ``chunk_rows`` items."""
+    dumps = current_app.json.dumps
+    chunk = ["["]
+    for count, item in enumerate(items):
+        chunk.append(("," if count else "") + dumps(item))
+        if len(chunk) >= chunk_rows:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("]")
+    yield "".join(chunk)
@@ -0,0 +1,160 @@
+"""In-process cache of the location and category tables.
+
+Both tables hold a few dozen rows and change a handful of times a year,
+yet creating, updating or importing events looked them up row by row
+(``create_event`` up to three times for the location alone). Each worker instead keeps one
+:class:`Taxonomy` loaded from both tables and serves lookups and the
+``/api/locations`` and ``/api/categories`` lists from it.
+
+The copy is checked against a fingerprint of the tables (row count,
+latest id and ``updated_at`` of each, in one query) at most every
+``TAXONOMY_CHECK_SECONDS``, and immediately after this process commits a
+change to either table (tracked with :func:`delapre.changes.on_commit`), so edits made by
+other workers show up within that many seconds. A lookup that misses
+checks again before giving up, so a location another worker has just
+created is never reported as unknown. Within a request the copy is only
+checked once (it is kept on ``g``).
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import func, select
+
+from .changes import on_commit
+from .extensions import db
+from .models import Category, Location
+
+TRACKED_MODELS = (Location, Category)
+
+# Bumped after each commit in this process that touches a tracked model
+_generation = 0
+
+
+class Taxonomy:
+    """One loaded copy of both tables."""
+
+    def __init__(self, locations, categories, fingerprint):
+        # [(id, name)] in name order, as the list endpoints return them
+        self.locations = {row_id: name for row_id, name in locations}
+        self.categories = {row_id: name for row_id, name in categories}
+        self.location_ids = {name.lower(): row_id for row_id, name in locations}
+        self.category_ids = {name.lower(): row_id for row_id, name in categories}
+        self.locations_list = [{"id": row_id, "name": name} for row_id, name in locations]
+        self.categories_list = [{"id": row_id, "name": name} for row_id, name in categories]
+        self.fingerprint = fingerprint
+
+
+class TaxonomyCache:
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        # (Taxonomy, generation, checked_at)
+        self._entry = None
+
+    def current(self, check: bool = False) -> Taxonomy:
+        """The cached copy; ``check`` compares it with the database now."""
+        now = time.monotonic()
+        entry = self._entry
+        if (
+            entry is not None and not check and entry[1] == _generation
+            and now - entry[2] < self.check_seconds
+        ):
+            return entry[0]
+        generation = _generation
+        value = fingerprint()
+        if entry is not None and entry[0].fingerprint == value:
+            taxonomy = entry[0]
+        else:
+            taxonomy = load(value)
+        with self._lock:
+            self._entry = (taxonomy, generation, now)
+        return taxonomy
+
+
+def fingerprint():
+    columns = []
+    for model in TRACKED_MODELS:
+        columns += [
+            select(func.count(model.id)).scalar_subquery(),
+            select(func.max(model.id)).scalar_subquery(),
+            select(func.max(model.updated_at)).scalar_subquery(),
+        ]
+    return tuple(db.session.execute(select(*columns)).one())
+
+
+def load(value) -> Taxonomy:
+    locations = db.session.execute(select(Location.id, Location.name).order_by(Location.name.asc())).all()
+    categories = db.session.execute(select(Category.id, Category.name).order_by(Category.name.asc())).all()
+    return Taxonomy(locations, categories, value)
+
+
+def taxonomy_cache() -> TaxonomyCache:
+    extensions = current_app.extensions
+    if "taxonomy" not in extensions:
+        extensions["taxonomy"] = TaxonomyCache(current_app.config["TAXONOMY_CHECK_SECONDS"])
+    return extensions["taxonomy"]
+
+
+def taxonomy(check: bool = False) -> Taxonomy:
+    """This request's copy of the tables; ``check`` re-reads the version
+    (once per request)."""
+    if "taxonomy" not in g or (check and not g.get("taxonomy_checked")):
+        g.taxonomy = taxonomy_cache().current(check=check)
+        g.taxonomy_checked = check
+    return g.taxonomy
+
+
+def lookup(find):
+    """``find(taxonomy)``, checked against the database once more if it
+    comes back ``None`` (the row may be new in another worker)."""
+    value = find(taxonomy())
+    if value is None:
+        value = find(taxonomy(check=True))
+    return value
+
+
+def location_by_id(location_id: int):
+    return lookup(lambda t: location_id if location_id in t.locations else None)
+
+
+def location_by_name(name: str):
+    """The id of the location called ``name`` (any case), or ``None``."""
+    return lookup(lambda t: t.location_ids.get(name.strip().lower()))
+
+
+def category_by_id(category_id: int):
+    return lookup(lambda t: category_id if category_id in t.categories else None)
+
+
+def category_by_name(name: str):
+    """The id of the category called ``name`` (any case), or ``None``."""
+    return lookup(lambda t: t.category_ids.get(name.strip().lower()))
+
+
+def location_for(value: str) -> int:
+    """The id of a location given by id (legacy clients send it as a
+    string) or by name; an unknown name is added as a new location."""
+    value = value.strip()
+    if value.isdigit() and location_by_id(int(value)) is not None:
+        return int(value)
+    location_id = location_by_name(value)
+    if location_id is None:
+        location = Location(name=value[:255])
+        db.session.add(location)
+        db.session.flush()
+        location_id = location.id
+    return location_id
+
+
+def _bump_generation():
+    global _generation
+    _generation += 1
+    if has_app_context():
+        # Later lookups in this request see the change too
+        g.pop("taxonomy", None)
+
+
+on_commit(TRACKED_MODELS, _bump_generation)
@@ -0,0 +1,5 @@
+from flask import jsonify
+
+
+def json_error(message: str, status: int = 400):
+    return jsonify({"message": message}), status
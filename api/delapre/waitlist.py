@@ -0,0 +1,191 @@
+"""Waitlists for full events and promotion when seats free up.
+
+Entries are served in join order. When seats are freed (a cancellation,
+a capacity increase, or a cart hold released or swept after expiring),
+:func:`promote_waitlist` books waiting entries
+first come, first served; a party too large for the seats left is
+skipped so smaller parties behind it can still be seated. Everything
+happens in the caller's transaction, and each promotion queues a
+notification in the outbox instead of sending mail inline.
+"""
+from __future__ import annotations
+
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, tuple_
+from sqlalchemy.orm import selectinload
+
+from .confirmation_codes import new_confirmation_code
+from .extensions import db
+from .guests import guest_rows, parse_guest_names
+from .models import Booking, Event, WaitlistEntry
+from .notifications import booking_recipient, queue_notification
+from .reservations import BookingError
+from .serializers import reserved_guest_counts
+
+
+def join_waitlist(item, user=None, contact=None) -> WaitlistEntry:
+    """Add a waiting entry for ``item`` (see :func:`~delapre.reservations.parse_item`)."""
+    event = db.session.get(Event, item["event_id"])
+    if not event:
+        raise BookingError("Event not found", 404)
+
+    booked = Booking.query.filter_by(event_id=event.id, status="confirmed")
+    waiting = WaitlistEntry.query.filter_by(event_id=event.id, status="waiting")
+    if user is not None:
+        booked = booked.filter_by(user_id=user.id)
+        waiting = waiting.filter_by(user_id=user.id)
+    else:
+        booked = booked.filter_by(guest_email=contact[0])
+        waiting = waiting.filter_by(guest_email=contact[0])
+    if booked.first():
+        raise BookingError("Booking already exists", 409)
+    if waiting.first():
+        raise BookingError("Already on the waitlist for this event", 409)
+
+    reserved = reserved_guest_counts([event.id]).get(event.id, 0)
+    if event.capacity <= 0 or item["guest_count"] <= event.capacity - reserved:
+        raise BookingError("Spaces are available, please book instead", 409)
+
+    entry = WaitlistEntry(
+        event_id=event.id,
+        user_id=user.id if user is not None else None,
+        guest_count=item["guest_count"],
+        guest_names=json.dumps(item["guest_names"]) if item["guest_names"] else None,
+    )
+    if contact is not None:
+        entry.guest_email, entry.guest_name, phone = contact
+        entry.guest_phone = phone or None
+    db.session.add(entry)
+    return entry
+
+
+def waitlist_position(entry: WaitlistEntry) -> int | None:
+    if entry.status != "waiting":
+        return None
+    ahead = WaitlistEntry.query.filter(
+        WaitlistEntry.event_id == entry.event_id,
+        WaitlistEntry.status == "waiting",
+        or_(
+            WaitlistEntry.created_at < entry.created_at,
+            and_(WaitlistEntry.created_at == entry.created_at, WaitlistEntry.id < entry.id),
+        ),
+    ).count()
+    return ahead + 1
+
+
+def waiting_entries_statement(event_ids):
+    """Waiting entries for ``event_ids`` in join order."""
+    return (
+        select(WaitlistEntry)
+        .where(WaitlistEntry.event_id.in_(event_ids), WaitlistEntry.status == "waiting")
+        .order_by(WaitlistEntry.created_at, WaitlistEntry.id)
+    )
+
+
+def promote_waitlist(event_ids) -> list:
+    """Book waiting entries into the free seats of ``event_ids``.
+
+    Locks the events, then reads their waiting entries in join order and
+    their taken seats with one query each. Returns the new bookings; the
+    caller commits.
+    """
+    event_ids = set(event_ids)
+    if not event_ids:
+        return []
+    events = {
+        event.id: event
+        for event in Event.query.filter(Event.id.in_(event_ids)).with_for_update()
+    }
+    entries = db.session.scalars(
+        waiting_entries_statement(events).options(selectinload(WaitlistEntry.user)).with_for_update()
+    ).all()
+    if not entries:
+        return []
+
+    reserved = reserved_guest_counts(events)
+    # People may have booked some other way since joining the waitlist
+    user_keys = {(e.event_id, e.user_id) for e in entries if e.user_id is not None}
+    email_keys = {(e.event_id, e.guest_email) for e in entries if e.user_id is None}
+    booked_users, booked_emails = set(), set()
+    if user_keys:
+        booked_users = set(
+            db.session.query(Booking.event_id, Booking.user_id).filter(
+                tuple_(Booking.event_id, Booking.user_id).in_(user_keys), Booking.status == "confirmed"
+            )
+        )
+    if email_keys:
+        booked_emails = set(
+            db.session.query(Booking.event_id, Booking.guest_email).filter(
+                tuple_(Booking.event_id, Booking.guest_email).in_(email_keys), Booking.status == "confirmed"
+            )
+        )
+
+    now = datetime.utcnow()
+    promoted = []
+    for entry in entries:
+        if (entry.event_id, entry.user_id) in booked_users or (entry.event_id, entry.guest_email) in booked_emails:
+            entry.status = "left"
+            continue
+        event = events[entry.event_id]
+        if event.capacity > 0 and entry.guest_count > event.capacity - reserved.get(event.id, 0):
+            continue
+
+        booking = Booking(
+            user_id=entry.user_id,
+            event_id=event.id,
+            status="confirmed",
+            guest_count=entry.guest_count,
+            guests=guest_rows(parse_guest_names(entry.guest_names)),
+            guest_email=entry.guest_email,
+            guest_name=entry.guest_name,
+            guest_phone=entry.guest_phone,
+            confirmation_code=new_confirmation_code(),
+        )
+        booking.event = event
+        booking.user = entry.user
+        db.session.add(booking)
+        entry.status = "promoted"
+        entry.promoted_at = now
+        entry.booking = booking
+        reserved[event.id] = reserved.get(event.id, 0) + entry.guest_count
+        _queue_promotion_notice(booking)
+        promoted.append(booking)
+    return promoted
+
+
+def _queue_promotion_notice(booking: Booking):
+    email, name = booking_recipient(booking)
+    if not email:
+        return
+    event = booking.event
+    queue_notification(
+        "waitlist_promoted",
+        email,
+        f"You're booked: a place opened up for {event.title}",
+        f"Hello {name},\n\n"
+        f"A place has opened up for '{event.title}' and we have booked it for you "
+        f"({booking.guest_count} guest{'s' if booking.guest_count != 1 else ''}).\n"
+        f"When: {event.starts_at.strftime('%A, %d %B at %H:%M')}\n"
+        f"Your confirmation code is {booking.confirmation_code}.\n\n"
+        "If you can no longer attend, please cancel so the next person can go.\n\n"
+        "Best regards,\nDelapre Abbey Events Team",
+        booking=booking,
+    )
+
+
+def waitlist_entry_to_dict(entry: WaitlistEntry, position=None):
+    return {
+        "id": entry.id,
+        "event_id": entry.event_id,
+        "status": entry.status,
+        "guest_count": entry.guest_count,
+        "guest_names": json.loads(entry.guest_names) if entry.guest_names else [],
+        "guest_email": entry.guest_email,
+        "guest_name": entry.guest_name,
+        "joined_at": entry.created_at.isoformat() if entry.created_at else None,
+        "promoted_at": entry.promoted_at.isoformat() if entry.promoted_at else None,
+        "booking_id": entry.booking_id,
+        "position": position,
+    }
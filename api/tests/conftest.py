@@ -0,0 +1,64 @@
+"""Pytest fixtures: the app on in-memory SQLite and Flask's test client.
+
+No server, Docker or MySQL is needed; each test gets a fresh database
+with the default staff user in it.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from delapre import create_app
+from delapre.extensions import db
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+@pytest.fixture
+def app():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def staff_headers(client):
+    response = client.post("/api/auth/login", json={"email": STAFF_EMAIL, "password": STAFF_PASSWORD})
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+
+@pytest.fixture
+def register(client):
+    """``register(n)`` signs up ``user<n>@example.com`` and returns its auth headers."""
+    def register(n):
+        response = client.post("/api/auth/register", json={
+            "email": f"user{n}@example.com", "password": "pw", "first_name": "User", "last_name": str(n)
+        })
+        assert response.status_code == 201, response.get_data(as_text=True)
+        return {"Authorization": f"Bearer {response.get_json()['token']}"}
+    return register
+
+
+@pytest.fixture
+def create_event(client, staff_headers):
+    """``create_event(**payload)`` posts an event as staff and returns the response."""
+    def create_event(days=1, **overrides):
+        starts_at = (datetime.now() + timedelta(days=days)).replace(microsecond=0)
+        payload = {
+            "title": "Test Event",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=2)).isoformat(),
+            "capacity": 10,
+        }
+        payload.update(overrides)
+        return client.post("/api/events", json=payload, headers=staff_headers)
+    return create_event
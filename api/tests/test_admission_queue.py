@@ -0,0 +1,163 @@
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from delapre import admission, create_app
+from delapre.extensions import db
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+class TestAdmissionQueue(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        self.event_ids = []
+        for i in range(2):
+            starts_at = datetime.now() + timedelta(days=i + 1)
+            response = self.client.post("/api/events", json={
+                "title": f"Headline {i}",
+                "location": "Main Hall",
+                "starts_at": starts_at.isoformat(),
+                "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+                "capacity": 100,
+            }, headers=self.headers)
+            self.event_ids.append(response.get_json()["id"])
+        # One client admitted every 100 seconds
+        response = self.client.put(
+            f"/api/staff/events/{self.event_ids[0]}/queue", json={"rate_per_second": 0.01}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def join(self, event_id=None):
+        return self.client.post(f"/api/events/{event_id or self.event_ids[0]}/queue")
+
+    def guest_booking(self, n, **extra):
+        return self.client.post("/api/bookings/guest", json={
+            "event_id": self.event_ids[0], "email": f"guest{n}@example.com", "name": "Guest", **extra
+        })
+
+    def test_booking_requires_queue_token(self):
+        response = self.guest_booking(0)
+        self.assertEqual(response.status_code, 428)
+        response = self.client.post("/api/holds", json={"event_id": self.event_ids[0]})
+        self.assertEqual(response.status_code, 428)
+
+    def test_admission_is_rate_limited(self):
+        first = self.join().get_json()
+        second = self.join().get_json()
+        self.assertEqual((first["position"], first["admitted"]), (1, True))
+        self.assertEqual((second["position"], second["admitted"]), (2, False))
+        self.assertGreater(second["wait_seconds"], 90)
+
+        self.assertEqual(self.guest_booking(1, queue_token=first["token"]).status_code, 201)
+        response = self.guest_booking(2, queue_token=second["token"])
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers["Retry-After"]), 90)
+
+        status = self.client.get("/api/queue/status", query_string={"token": second["token"]}).get_json()
+        self.assertEqual((status["position"], status["admitted"]), (2, False))
+
+    def test_retry_after_admission_with_the_same_idempotency_key(self):
+        self.join()
+        token = self.join().get_json()["token"]
+        headers = {"Idempotency-Key": "checkout-1"}
+        response = self.client.post("/api/bookings/guest", json={
+            "event_id": self.event_ids[0], "email": "guest@example.com", "name": "Guest", "queue_token": token
+        }, headers=headers)
+        self.assertEqual(response.status_code, 429)
+
+        later = time.time() + 200
+        with mock.patch.object(admission, "time", mock.Mock(time=lambda: later, monotonic=time.monotonic)):
+            response = self.client.post("/api/bookings/guest", json={
+                "event_id": self.event_ids[0], "email": "guest@example.com", "name": "Guest", "queue_token": token
+            }, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", response.headers)
+
+    def test_token_is_bound_to_event(self):
+        token = self.join().get_json()["token"]
+        response = self.client.post("/api/bookings", json={
+            "event_id": self.event_ids[0], "queue_token": token + "x"
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        # Events without a queue ignore the token entirely
+        response = self.client.post("/api/bookings", json={
+            "event_id": self.event_ids[1], "queue_token": token
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.join(self.event_ids[1]).status_code, 404)
+
+    def test_batch_checks_every_queued_event(self):
+        response = self.client.post("/api/bookings/batch", json={"items": [
+            {"event_id": self.event_ids[1]}, {"event_id": self.event_ids[0]},
+        ]}, headers=self.headers)
+        self.assertEqual(response.status_code, 428)
+        token = self.join().get_json()["token"]
+        response = self.client.post("/api/bookings/batch", json={"items": [
+            {"event_id": self.event_ids[1]}, {"event_id": self.event_ids[0], "queue_token": token},
+        ]}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+    def test_token_is_spent_by_the_booking(self):
+        token = self.join().get_json()["token"]
+        # A hold does not spend it, the booking that follows does
+        hold = self.client.post("/api/holds", json={"event_id": self.event_ids[0], "queue_token": token})
+        self.assertEqual(hold.status_code, 201)
+        self.assertEqual(self.guest_booking(1, queue_token=token).status_code, 201)
+        self.assertEqual(self.guest_booking(2, queue_token=token).status_code, 409)
+        # A booking that fails leaves the token unspent
+        self.client.put(
+            f"/api/staff/events/{self.event_ids[1]}/queue", json={"rate_per_second": 1000}, headers=self.headers
+        )
+        token = self.join(self.event_ids[1]).get_json()["token"]
+        first = self.client.post(
+            "/api/bookings", json={"event_id": self.event_ids[1], "queue_token": token}, headers=self.headers
+        )
+        token = self.join(self.event_ids[1]).get_json()["token"]
+        booking = {"event_id": self.event_ids[1], "queue_token": token}
+        response = self.client.post("/api/bookings", json=booking, headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+        self.assertNotIn("queue token", response.get_json()["message"])
+        self.client.delete(f"/api/bookings/{first.get_json()['id']}", headers=self.headers)
+        self.assertEqual(self.client.post("/api/bookings", json=booking, headers=self.headers).status_code, 201)
+        result = self.app.test_cli_runner().invoke(args=["sweep-holds"])
+        self.assertIn("Forgot 0 used queue token(s).", result.output)
+
+    def test_token_is_bound_to_whoever_joined(self):
+        token = self.join().get_json()["token"]
+        response = self.client.post("/api/bookings/guest", json={
+            "event_id": self.event_ids[0], "email": "other@example.com", "name": "Other", "queue_token": token
+        }, environ_base={"REMOTE_ADDR": "10.0.0.9"})
+        self.assertEqual(response.status_code, 400)
+        # Signing in after joining as a guest from the same address is fine
+        response = self.client.post("/api/bookings", json={
+            "event_id": self.event_ids[0], "queue_token": token
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+
+    def test_closing_queue(self):
+        response = self.client.delete(f"/api/staff/events/{self.event_ids[0]}/queue", headers=self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.guest_booking(0).status_code, 201)
+
+    def test_queue_token_is_not_a_login(self):
+        token = self.join().get_json()["token"]
+        response = self.client.get("/api/bookings", headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+def sqlite_app(**overrides):
+    config = {"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True}
+    config.update(overrides)
+    return create_app(config)
+
+
+class TestAppFactory(unittest.TestCase):
+    def setUp(self):
+        self.app = sqlite_app()
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def create_event(self, **overrides):
+        starts_at = datetime.now() + timedelta(days=2)
+        payload = {
+            "title": "Factory Test Event",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 5,
+        }
+        payload.update(overrides)
+        response = self.client.post("/api/events", json=payload, headers=self.headers)
+        self.assertEqual(response.status_code, 201, response.get_data(as_text=True))
+        return response.get_json()
+
+    def test_health(self):
+        self.assertEqual(self.client.get("/api/health").get_json(), {"status": "ok"})
+
+    def test_booking_updates_spots_left(self):
+        event = self.create_event()
+        response = self.client.post(
+            "/api/bookings", json={"event_id": event["id"], "guest_count": 2}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 201)
+        details = self.client.get(f"/api/events/{event['id']}").get_json()
+        self.assertEqual(details["spots_left"], 3)
+
+    def test_staff_can_update_event(self):
+        event = self.create_event()
+        response = self.client.put(
+            f"/api/events/{event['id']}", json={"capacity": 8}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["capacity"], 8)
+
+    def test_catalogue_only_instance(self):
+        app = sqlite_app(BLUEPRINTS=("catalogue",), SEED_STAFF_USER=False)
+        self.assertEqual(set(app.blueprints), {"catalogue"})
+        client = app.test_client()
+        self.assertEqual(client.get("/api/events").status_code, 200)
+        self.assertEqual(client.post("/api/bookings", json={}).status_code, 404)
+
+    def test_unknown_blueprint(self):
+        with self.assertRaises(ValueError):
+            sqlite_app(BLUEPRINTS=("catalogue", "nope"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+from delapre.archive import archive_bookings
+from delapre.extensions import db
+from delapre.models import ArchivedBooking, ArchivedBookingGuest, Booking, BookingGuest, Event, Notification
+
+
+def _move_to_past(app, event_id, days):
+    with app.app_context():
+        event = db.session.get(Event, event_id)
+        event.starts_at -= timedelta(days=days)
+        event.ends_at -= timedelta(days=days)
+        db.session.commit()
+
+
+def _book(client, headers, event_id, **payload):
+    response = client.post("/api/bookings", json={"event_id": event_id, **payload}, headers=headers)
+    assert response.status_code == 201, response.get_data(as_text=True)
+    return response.get_json()
+
+
+def test_archive_moves_old_bookings_in_batches(app, client, register, create_event):
+    old_id = create_event(title="Old").get_json()["id"]
+    recent_id = create_event(days=2, title="Recent").get_json()["id"]
+    for n in range(3):
+        headers = register(n)
+        _book(client, headers, old_id, guest_count=2, guest_names=[f"Guest {n}"])
+        _book(client, headers, recent_id)
+    _move_to_past(app, old_id, 400)
+
+    with app.app_context():
+        db.session.add(Notification(
+            kind="confirmation", recipient="x@example.com", subject="s", body="b",
+            booking_id=db.session.scalar(db.select(Booking.id).filter_by(event_id=old_id).limit(1)),
+        ))
+        db.session.commit()
+        batches = []
+        cutoff = datetime.utcnow() - timedelta(days=365)
+        assert archive_bookings(cutoff, batch_size=2, progress=batches.append) == 3
+        assert batches == [2, 3]
+
+        assert Booking.query.filter_by(event_id=old_id).count() == 0
+        assert Booking.query.filter_by(event_id=recent_id).count() == 3
+        assert ArchivedBooking.query.filter_by(event_id=old_id).count() == 3
+        assert BookingGuest.query.count() == 0
+        assert sorted(guest.name for guest in ArchivedBookingGuest.query) == ["Guest 0", "Guest 1", "Guest 2"]
+        assert Notification.query.filter(Notification.booking_id.is_not(None)).count() == 0
+
+        # Nothing left to do on a second run
+        assert archive_bookings(cutoff) == 0
+
+
+def test_history_includes_archived_bookings_on_request(app, client, register, staff_headers, create_event):
+    old_id = create_event(title="Old").get_json()["id"]
+    recent_id = create_event(days=2, title="Recent").get_json()["id"]
+    headers = register(1)
+    archived = _book(client, headers, old_id, guest_names=["Ann"])
+    _book(client, headers, recent_id)
+    _move_to_past(app, old_id, 400)
+    with app.app_context():
+        archive_bookings(datetime.utcnow() - timedelta(days=365))
+
+    history = client.get("/api/bookings/history", headers=headers).get_json()
+    assert [booking["event"]["title"] for booking in history] == ["Recent"]
+
+    history = client.get("/api/bookings/history?include_archived=1", headers=headers).get_json()
+    assert [booking["event"]["title"] for booking in history] == ["Recent", "Old"]
+    assert history[1]["id"] == archived["id"]
+    assert history[1]["guest_names"] == ["Ann"]
+    assert history[1]["confirmation_code"] == archived["confirmation_code"]
+
+    bookings = client.get("/api/staff/bookings", headers=staff_headers).get_json()
+    assert len(bookings) == 1
+    bookings = client.get("/api/staff/bookings?include_archived=true", headers=staff_headers).get_json()
+    assert [booking["event"]["title"] for booking in bookings] == ["Recent", "Old"]
+
+
+def test_documents_cover_archived_bookings(app, client, register, staff_headers, create_event):
+    event_id = create_event(title="Old").get_json()["id"]
+    headers = register(1)
+    archived = _book(client, headers, event_id, guest_names=["Ann"])
+    _move_to_past(app, event_id, 400)
+    with app.app_context():
+        archive_bookings(datetime.utcnow() - timedelta(days=365))
+
+    for document in ("receipt", "confirmation"):
+        response = client.get(f"/api/bookings/{archived['id']}/{document}", headers=headers)
+        assert response.status_code == 200
+        assert response.mimetype == "application/pdf"
+    other = register(2)
+    assert client.get(f"/api/bookings/{archived['id']}/receipt", headers=other).status_code == 403
+
+    url = f"/api/staff/events/{event_id}/attendance"
+    rows = list(csv.DictReader(io.StringIO(client.get(url, headers=staff_headers).get_data(as_text=True))))
+    assert rows == []
+    response = client.get(f"{url}?include_archived=1", headers=staff_headers)
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row["confirmation_code"] for row in rows] == [archived["confirmation_code"]]
+    assert rows[0]["guest_names"] == "Ann"
+
+
+def test_staff_stream_survives_archiving_midway(app, client, register, staff_headers, create_event, monkeypatch):
+    from delapre.blueprints import staff
+
+    old_id = create_event(title="Old").get_json()["id"]
+    recent_id = create_event(days=2, title="Recent").get_json()["id"]
+    for n in range(2):
+        headers = register(n)
+        _book(client, headers, recent_id)
+        _book(client, headers, old_id, guest_names=[f"Guest {n}"])
+    _move_to_past(app, old_id, 400)
+
+    def chunks(statement):
+        # Ids read up front, then the old bookings are archived while the
+        # first chunk is being sent
+        rows = db.session.execute(statement).all()
+        yield rows[:1]
+        archive_bookings(datetime.utcnow() - timedelta(days=365))
+        yield rows[1:]
+
+    monkeypatch.setattr(staff, "server_side_chunks", chunks)
+    response = client.get("/api/staff/bookings", headers=staff_headers)
+    assert response.status_code == 200
+    bookings = response.get_json()
+    assert [booking["event"]["title"] for booking in bookings] == ["Recent", "Recent", "Old", "Old"]
+    assert sorted(booking["guest_names"][0] for booking in bookings[2:]) == ["Guest 0", "Guest 1"]
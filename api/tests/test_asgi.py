@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from delapre import calendars
+from delapre.asgi import async_database_uri
+
+
+def test_async_database_uri():
+    assert async_database_uri("mysql+pymysql://u:p@db:3306/x") == "mysql+aiomysql://u:p@db:3306/x"
+    assert async_database_uri("sqlite:////tmp/x.db") == "sqlite+aiosqlite:////tmp/x.db"
+    with pytest.raises(ValueError):
+        async_database_uri("postgresql://db/x")
+
+
+def build_asgi_app(tmp_path, **config):
+    pytest.importorskip("quart")
+    pytest.importorskip("hypercorn")
+    pytest.importorskip("aiosqlite")
+    from delapre.asgi import create_asgi_app
+
+    return create_asgi_app({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(tmp_path / "asgi.db"), "TESTING": True, **config,
+    })
+
+
+@pytest.fixture
+def asgi_app(tmp_path):
+    return build_asgi_app(tmp_path)
+
+
+def scope(method, path, headers=()):
+    return {"type": "http", "method": method, "path": path, "headers": list(headers)}
+
+
+def test_hot_paths_are_served_natively(asgi_app):
+    assert asgi_app.is_native(scope("GET", "/api/events"))
+    assert asgi_app.is_native(scope("GET", "/api/events/12"))
+    assert asgi_app.is_native(scope("POST", "/api/staff/checkin"))
+    assert not asgi_app.is_native(scope("POST", "/api/staff/checkin", [(b"idempotency-key", b"k")]))
+    assert not asgi_app.is_native(scope("OPTIONS", "/api/events"))
+    assert not asgi_app.is_native(scope("GET", "/api/events/live"))
+    assert not asgi_app.is_native(scope("POST", "/api/bookings"))
+
+
+def test_async_views_match_the_flask_views(asgi_app, monkeypatch):
+    flask_client = asgi_app.flask_app.test_client()
+    login = flask_client.post("/api/auth/login", json={"email": "staff@example.com", "password": "password"})
+    staff = {"Authorization": f"Bearer {login.get_json()['token']}"}
+    starts_at = (datetime.now() + timedelta(days=2)).replace(microsecond=0)
+    event_id = flask_client.post("/api/events", headers=staff, json={
+        "title": "Talk", "location": "Main Hall", "capacity": 10,
+        "starts_at": starts_at.isoformat(), "ends_at": (starts_at + timedelta(hours=2)).isoformat(),
+    }).get_json()["id"]
+    user = flask_client.post("/api/auth/register", json={
+        "email": "user@example.com", "password": "pw", "first_name": "User", "last_name": "One",
+    }).get_json()["token"]
+    booking = flask_client.post(
+        "/api/bookings", json={"event_id": event_id, "guest_count": 2, "guest_names": ["Ann", "Bob"]},
+        headers={"Authorization": f"Bearer {user}"},
+    ).get_json()
+
+    async def run():
+        client = asgi_app.async_app.test_client()
+        try:
+            events = await client.get("/api/events")
+            assert await events.get_json() == flask_client.get("/api/events").get_json()
+            details = await client.get(f"/api/events/{event_id}?fields=id,spots_left")
+            assert await details.get_json() == {"id": event_id, "spots_left": 8}
+            assert (await client.get("/api/events/999")).status_code == 404
+
+            changed = []
+            monkeypatch.setattr("delapre.asgi.counts_changed", changed.append)
+            generation = calendars._generation
+            code = booking["confirmation_code"]
+            response = await client.post("/api/staff/checkin", json={"confirmation_code": code})
+            assert response.status_code == 401
+            response = await client.post("/api/staff/checkin", json={"confirmation_code": code}, headers=staff)
+            checked_in = await response.get_json()
+            assert response.status_code == 200 and checked_in["checked_in"] is True
+            assert checked_in["guest_names"] == ["Ann", "Bob"]
+            assert checked_in["event"]["spots_left"] == 8
+            # Live streams and the calendar feeds hear about it
+            assert changed == [[event_id]]
+            assert calendars._generation > generation
+            response = await client.post("/api/staff/checkin", json={"confirmation_code": code}, headers=staff)
+            assert response.status_code == 409
+        finally:
+            await asgi_app.async_app.extensions["async_engine"].dispose()
+
+    asyncio.run(run())
+    history = flask_client.get("/api/bookings", headers={"Authorization": f"Bearer {user}"}).get_json()
+    assert history[0]["checked_in"] is True
+
+
+@pytest.mark.parametrize("origin", ["https://www.example.org", "https://evil.example"])
+def test_cors_origins_match_the_flask_side(tmp_path, origin):
+    asgi_app = build_asgi_app(tmp_path, CORS_ORIGINS=["https://www.example.org"])
+    flask_allowed = asgi_app.flask_app.test_client().get("/api/events", headers={"Origin": origin})
+
+    async def run():
+        try:
+            return await asgi_app.async_app.test_client().get("/api/events", headers={"Origin": origin})
+        finally:
+            await asgi_app.async_app.extensions["async_engine"].dispose()
+
+    response = asyncio.run(run())
+    assert response.headers.get("Access-Control-Allow-Origin") == flask_allowed.headers.get(
+        "Access-Control-Allow-Origin"
+    )
+    allowed = origin == "https://www.example.org"
+    assert (response.headers.get("Access-Control-Allow-Origin") == origin) is allowed
@@ -0,0 +1,126 @@
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.models import Booking
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+class TestBatchCheckout(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        self.event_ids = [self.create_event(i, capacity) for i, capacity in enumerate((10, 3, 10))]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def create_event(self, i, capacity):
+        starts_at = datetime.now() + timedelta(days=i + 1)
+        response = self.client.post("/api/events", json={
+            "title": f"Event {i}",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": capacity,
+        }, headers=self.headers)
+        return response.get_json()["id"]
+
+    def booking_count(self):
+        with self.app.app_context():
+            return Booking.query.count()
+
+    def test_books_all_items(self):
+        response = self.client.post("/api/bookings/batch", json={"items": [
+            {"event_id": self.event_ids[0], "guest_count": 2},
+            {"event_id": self.event_ids[1], "guest_count": 3, "guest_names": ["A", "B"]},
+        ]}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        results = response.get_json()["results"]
+        self.assertEqual([r["ok"] for r in results], [True, True])
+        self.assertEqual(results[1]["booking"]["guest_names"], ["A", "B"])
+        self.assertEqual(results[1]["booking"]["event"]["spots_left"], 0)
+        self.assertEqual(self.booking_count(), 2)
+
+    def test_one_failure_books_nothing(self):
+        response = self.client.post("/api/bookings/batch", json={"items": [
+            {"event_id": self.event_ids[0]},
+            {"event_id": self.event_ids[1], "guest_count": 4},
+            {"event_id": 9999},
+        ]}, headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+        payload = response.get_json()
+        self.assertEqual(payload["message"], "Not enough spaces available")
+        self.assertEqual(
+            [(r["ok"], r["status"]) for r in payload["results"]],
+            [(True, 201), (False, 409), (False, 404)],
+        )
+        self.assertEqual(self.booking_count(), 0)
+
+    def test_duplicate_event_in_cart(self):
+        response = self.client.post("/api/bookings/batch", json={"items": [
+            {"event_id": self.event_ids[0]}, {"event_id": self.event_ids[0]},
+        ]}, headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()["message"], "Booking already exists")
+        self.assertEqual(self.booking_count(), 0)
+
+    def test_capacity_is_shared_across_items(self):
+        self.client.post("/api/bookings/guest", json={
+            "event_id": self.event_ids[1], "email": "a@example.com", "name": "A", "guest_count": 2
+        })
+        response = self.client.post("/api/bookings/batch", json={"items": [
+            {"event_id": self.event_ids[1], "guest_count": 2},
+        ]}, headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+
+    def test_guest_batch(self):
+        response = self.client.post("/api/bookings/guest/batch", json={
+            "email": "Guest@Example.com", "name": "Guest",
+            "items": [{"event_id": event_id} for event_id in self.event_ids],
+        })
+        self.assertEqual(response.status_code, 201)
+        bookings = [r["booking"] for r in response.get_json()["results"]]
+        self.assertEqual({b["guest_email"] for b in bookings}, {"guest@example.com"})
+        self.assertEqual(len({b["confirmation_code"] for b in bookings}), 3)
+
+    def test_guest_batch_requires_contact(self):
+        response = self.client.post("/api/bookings/guest/batch", json={
+            "name": "Guest", "items": [{"event_id": self.event_ids[0]}]
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["message"], "Email is required")
+
+    def test_batch_limits(self):
+        response = self.client.post("/api/bookings/batch", json={"items": []}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/bookings/batch", json={
+            "items": [{"event_id": self.event_ids[0]}] * 21
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_single_endpoint_messages_unchanged(self):
+        response = self.client.post("/api/bookings", json={}, headers=self.headers)
+        self.assertEqual(response.get_json()["message"], "Event id is required")
+        response = self.client.post(
+            "/api/bookings", json={"event_id": self.event_ids[0], "guest_count": 5}, headers=self.headers
+        )
+        self.assertEqual(response.get_json()["message"], "Guest count must be 4 or fewer")
+        response = self.client.post("/api/bookings", json={"event_id": self.event_ids[0]}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post("/api/bookings", json={"event_id": self.event_ids[0]}, headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,20 @@
+import json
+
+from benchmarks import suite
+
+
+def test_suite_runs_on_a_small_dataset(tmp_path):
+    path = tmp_path / "bench.json"
+    report = suite.main([
+        "--users", "50", "--series", "2", "--weeks", "4", "--bookings", "100",
+        "--reads", "2", "--writes", "3", "--clients", "2", "--json", str(path),
+    ])
+    assert json.loads(path.read_text()) == report
+    assert report["dataset"]["rows"]["events"] == 8
+    for result in report["scenarios"]:
+        if "skipped" not in result:
+            assert set(result["statuses"]) <= {"200", "201"}, result
+            assert result["queries_max"] is not None
+
+    # A run compared with itself has nothing to report
+    assert suite.compare(report, report["scenarios"], tolerance=0) == []
@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import re
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.guests import guest_values, migrate_guest_names
+from delapre.models import Booking, BookingGuest
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+def query_count(response):
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers.get("Server-Timing", ""))
+    return int(match.group(1))
+
+
+class TestGuestValues(unittest.TestCase):
+    def test_strings_and_dicts(self):
+        self.assertEqual(guest_values(["  Ann ", {"name": "Bo", "type": "Child"}, "", {"name": "", "type": ""}, 3]), [
+            {"position": 0, "name": "Ann", "ticket_type": None},
+            {"position": 1, "name": "Bo", "ticket_type": "Child"},
+        ])
+
+
+class TestBookingGuests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        starts_at = datetime.now() + timedelta(days=1)
+        response = self.client.post("/api/events", json={
+            "title": "Family Tour",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 100,
+        }, headers=self.headers)
+        self.event_id = response.get_json()["id"]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def guest_booking(self, n, guest_names):
+        return self.client.post("/api/bookings/guest", json={
+            "event_id": self.event_id,
+            "email": f"guest{n}@example.com",
+            "name": f"Guest {n}",
+            "guest_count": len(guest_names),
+            "guest_names": guest_names,
+        })
+
+    def test_guests_are_stored_as_rows(self):
+        guest_names = ["Ann", {"name": "Bo", "type": "Child"}]
+        response = self.guest_booking(0, guest_names)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()["guest_names"], guest_names)
+        with self.app.app_context():
+            booking = db.session.get(Booking, response.get_json()["id"])
+            self.assertIsNone(booking.guest_names)
+            self.assertEqual(
+                [(g.position, g.name, g.ticket_type) for g in booking.guests],
+                [(0, "Ann", None), (1, "Bo", "Child")],
+            )
+
+    def test_guests_for_a_page_load_in_one_query(self):
+        self.guest_booking(0, ["Ann"])
+        url = "/api/staff/bookings?fields=id,guest_names"
+        few = query_count(self.client.get(url, headers=self.headers))
+        for n in range(1, 5):
+            self.guest_booking(n, [f"Guest {n}", {"name": "Child", "type": "Child"}])
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(query_count(response), few)
+        self.assertEqual(
+            sorted(len(b["guest_names"]) for b in response.get_json()),
+            [1, 2, 2, 2, 2],
+        )
+
+    def test_migration_moves_legacy_json(self):
+        with self.app.app_context():
+            staff_id = db.session.execute(db.text("SELECT id FROM users")).scalar()
+            for n, raw in enumerate([
+                json.dumps(["Ann", {"name": "Bo", "type": "Child"}]),
+                json.dumps([]),
+                "not json",
+            ]):
+                db.session.add(Booking(
+                    user_id=staff_id if n == 0 else None,
+                    event_id=self.event_id,
+                    guest_count=2,
+                    guest_names=raw,
+                    guest_email=f"legacy{n}@example.com",
+                    confirmation_code=f"LEGACY{n}",
+                ))
+            db.session.commit()
+
+        # Unmigrated bookings are still read from the column
+        booking = self.client.get("/api/bookings", headers=self.headers).get_json()[0]
+        self.assertEqual(booking["guest_names"], ["Ann", {"name": "Bo", "type": "Child"}])
+
+        with self.app.app_context():
+            self.assertEqual(migrate_guest_names(batch_size=2), 3)
+            self.assertEqual(migrate_guest_names(batch_size=2), 0)
+            self.assertEqual(BookingGuest.query.count(), 2)
+            self.assertEqual(Booking.query.filter(Booking.guest_names.is_not(None)).count(), 0)
+
+        booking = self.client.get("/api/bookings", headers=self.headers).get_json()[0]
+        self.assertEqual(booking["guest_names"], ["Ann", {"name": "Bo", "type": "Child"}])
+
+        url = f"/api/staff/events/{self.event_id}/attendance"
+        rows = list(csv.DictReader(io.StringIO(self.client.get(url, headers=self.headers).get_data(as_text=True))))
+        self.assertEqual(rows[0]["guest_names"], "Ann; Bo (Child)")
+
+
+if __name__ == "__main__":
+    unittest.main()
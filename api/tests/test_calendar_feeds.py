@@ -0,0 +1,137 @@
+import re
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from delapre.calendars import render_calendar
+
+
+def query_count(response):
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers.get("Server-Timing", ""))
+    return int(match.group(1))
+
+
+@pytest.fixture
+def app(app):
+    # Always re-check the database, to see changes as another worker would
+    app.config["CALENDAR_CHECK_SECONDS"] = 0
+    return app
+
+
+def test_catalogue_feed_is_conditional(client, create_event):
+    create_event(title="Garden, Tour; with notes", description="Line one\nLine two " + "x" * 100)
+    response = client.get("/api/calendar/events.ics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/calendar"
+    body = response.get_data(as_text=True)
+    assert body.startswith("BEGIN:VCALENDAR\r\n") and body.endswith("END:VCALENDAR\r\n")
+    assert "SUMMARY:Garden\\, Tour\\; with notes\r\n" in body
+    assert "DESCRIPTION:Line one\\nLine two" in body
+    assert all(len(line.encode()) <= 75 for line in body.split("\r\n"))
+
+    etag = response.headers["ETag"]
+    response = client.get("/api/calendar/events.ics", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert query_count(response) == 1
+
+    create_event(days=3, title="Another")
+    response = client.get("/api/calendar/events.ics", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "SUMMARY:Another" in response.get_data(as_text=True)
+
+
+def test_edits_within_one_second_change_the_etag(client, staff_headers, create_event):
+    event_id = create_event().get_json()["id"]
+    etag = client.get("/api/calendar/events.ics").headers["ETag"]
+    assert etag.startswith('W/"')
+    client.put(f"/api/events/{event_id}", json={"title": "Renamed"}, headers=staff_headers)
+    client.put(f"/api/events/{event_id}", json={"title": "Renamed again"}, headers=staff_headers)
+    response = client.get("/api/calendar/events.ics", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert "SUMMARY:Renamed again" in response.get_data(as_text=True)
+
+    # Compressed and identity bodies share the (weak) tag
+    etag = response.headers["ETag"]
+    response = client.get("/api/calendar/events.ics", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_checks_are_skipped_within_the_window(app, client, create_event):
+    app.config["CALENDAR_CHECK_SECONDS"] = 60
+    app.extensions.pop("calendar_feeds", None)
+    etag = client.get("/api/calendar/events.ics").headers["ETag"]
+    response = client.get("/api/calendar/events.ics", headers={"If-None-Match": etag})
+    assert (response.status_code, query_count(response)) == (304, 0)
+
+    # A change committed by this process is picked up straight away
+    create_event(title="New")
+    response = client.get("/api/calendar/events.ics", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_category_and_location_feeds(client, create_event):
+    create_event(title="Hall talk")
+    create_event(title="Garden walk", location="Garden")
+    locations = {loc["name"]: loc["id"] for loc in client.get("/api/locations").get_json()}
+    body = client.get(f"/api/calendar/locations/{locations['Garden']}.ics").get_data(as_text=True)
+    assert "SUMMARY:Garden walk" in body and "Hall talk" not in body
+    assert client.get("/api/calendar/locations/999.ics").status_code == 404
+    assert client.get("/api/calendar/categories/999.ics").status_code == 404
+
+
+def test_user_feed(client, register, create_event):
+    event_id = create_event(days=3, title="Booked").get_json()["id"]
+    create_event(days=2, title="Not booked")
+    headers = register(1)
+    booking = client.post("/api/bookings", json={"event_id": event_id}, headers=headers).get_json()
+
+    feed = client.get("/api/calendar/feed", headers=headers).get_json()
+    assert feed["webcal_url"].startswith("webcal://")
+    url = feed["url"].split("localhost", 1)[1]
+    response = client.get(url)
+    body = response.get_data(as_text=True)
+    assert "SUMMARY:Booked" in body and "Not booked" not in body
+    assert response.headers["Cache-Control"].startswith("private")
+
+    client.delete(f"/api/bookings/{booking['id']}", headers=headers)
+    response = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 200
+    assert "BEGIN:VEVENT" not in response.get_data(as_text=True)
+
+    assert client.get("/api/calendar/users/forged.ics").status_code == 404
+
+
+def test_rotating_revokes_the_old_feed_url(client, register, create_event):
+    create_event(title="Booked")
+    headers = register(1)
+    old_url = client.get("/api/calendar/feed", headers=headers).get_json()["url"].split("localhost", 1)[1]
+    assert client.get(old_url).status_code == 200
+
+    response = client.post("/api/calendar/feed/rotate", headers=headers)
+    assert response.status_code == 200
+    new_url = response.get_json()["url"].split("localhost", 1)[1]
+    assert new_url != old_url
+    assert client.get(old_url).status_code == 404
+    assert client.get(new_url).status_code == 200
+    assert client.get("/api/calendar/feed", headers=headers).get_json()["url"].endswith(new_url)
+
+
+def test_cached_body_is_per_host(client, create_event):
+    create_event(title="Talk")
+    body = client.get("/api/calendar/events.ics").get_data(as_text=True)
+    assert "@localhost\r\n" in body
+    body = client.get("/api/calendar/events.ics", base_url="http://events.example.org").get_data(as_text=True)
+    assert "@events.example.org\r\n" in body and "@localhost" not in body
+
+
+def test_folding_keeps_utf8_characters_whole():
+    event = SimpleNamespace(
+        id=1, title="é" * 60, description="", location=None, category=None, updated_at=None,
+        starts_at=datetime(2030, 1, 1, 10), ends_at=datetime(2030, 1, 1, 11),
+    )
+    body = render_calendar("Test", [event])
+    assert all(len(line.encode()) <= 75 for line in body.split("\r\n"))
+    assert "SUMMARY:" + "é" * 60 in body.replace("\r\n ", "")
@@ -0,0 +1,26 @@
+from delapre import changes
+from delapre.extensions import db
+from delapre.models import Category, Location
+
+
+def test_callbacks_run_once_per_commit_that_touches_their_models(app, monkeypatch):
+    monkeypatch.setattr(changes, "_hooks", [])
+    calls = []
+    changes.on_commit((Location,), lambda: calls.append("locations"))
+    changes.on_commit((Location, Category), lambda: calls.append("taxonomy"))
+
+    with app.app_context():
+        db.session.add(Location(name="Garden"))
+        db.session.add(Location(name="Chapel"))
+        db.session.commit()
+        assert calls == ["locations", "taxonomy"]
+
+        db.session.add(Category(name="Talks"))
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert calls == ["locations", "taxonomy"]
+
+        Category.query.delete()
+        db.session.commit()
+        assert calls == ["locations", "taxonomy", "taxonomy"]
@@ -0,0 +1,87 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from delapre import compression
+from delapre.compression import choose_encoding
+from delapre.extensions import db
+from delapre.models import Booking
+from delapre.serializers import bookings_to_payload, stream_bookings_payload
+
+
+def accept(header):
+    return parse_accept_header(header, Accept)
+
+
+def test_choose_encoding(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert choose_encoding(accept("gzip, deflate, br")) == "gzip"
+    assert choose_encoding(accept("gzip;q=0, br")) is None
+    assert choose_encoding(accept("")) is None
+    assert choose_encoding(accept("*")) == "gzip"
+
+
+def test_brotli_preferred_when_installed(monkeypatch):
+    brotli = pytest.importorskip("brotli")
+    monkeypatch.setattr(compression, "brotli", brotli)
+    assert choose_encoding(accept("gzip, br")) == "br"
+    assert choose_encoding(accept("gzip, br;q=0.5")) == "gzip"
+
+
+def test_large_json_is_compressed(client, create_event):
+    for day in range(1, 12):
+        create_event(days=day, description="A long description " * 5)
+    plain = client.get("/api/events?free=0")
+    assert "Content-Encoding" not in plain.headers
+    response = client.get("/api/events?free=0", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(plain.get_data())
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+    small = client.get("/api/categories", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+
+def test_streamed_export_is_compressed_in_chunks(client, staff_headers, create_event):
+    for day in range(1, 4):
+        create_event(days=day)
+    headers = {**staff_headers, "Accept-Encoding": "gzip"}
+    response = client.get("/api/staff/events/export?format=csv", headers=headers, buffered=False)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    decompressor = zlib.decompressobj(31)
+    text = b"".join(decompressor.decompress(chunk) for chunk in response.response).decode()
+    assert text.startswith("id,title,") and text.count("Test Event") == 3
+
+
+def test_staff_bookings_stream_in_order(client, register, staff_headers, create_event):
+    event_ids = [create_event(days=day).get_json()["id"] for day in (3, 4)]
+    for n in range(3):
+        headers = register(n)
+        for event_id in event_ids:
+            client.post("/api/bookings", json={"event_id": event_id, "guest_names": [f"G{n}"]}, headers=headers)
+    response = client.get("/api/staff/bookings", headers=staff_headers)
+    assert response.is_streamed
+    bookings = response.get_json()
+    assert [b["event"]["id"] for b in bookings] == [event_ids[1]] * 3 + [event_ids[0]] * 3
+    assert [b["guest_names"] for b in bookings[:3]] == [["G2"], ["G1"], ["G0"]]
+
+
+@pytest.mark.parametrize("normalize", [False, True])
+def test_stream_matches_payload(app, client, register, create_event, normalize):
+    event_ids = [create_event(days=day).get_json()["id"] for day in (3, 4, 5)]
+    for n in range(4):
+        headers = register(n)
+        for event_id in event_ids:
+            client.post("/api/bookings", json={"event_id": event_id}, headers=headers)
+    with app.test_request_context():
+        bookings = Booking.query.order_by(Booking.id).all()
+        chunks = [bookings[i:i + 5] for i in range(0, len(bookings), 5)]
+        streamed = "".join(stream_bookings_payload(iter(chunks), normalize=normalize))
+        assert json.loads(streamed) == json.loads(app.json.dumps(bookings_to_payload(bookings, normalize=normalize)))
+        db.session.remove()
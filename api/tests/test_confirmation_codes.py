@@ -0,0 +1,140 @@
+import os
+import re
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.confirmation_codes import (
+    ALPHABET,
+    BLOCK_SIZE,
+    CodeAllocator,
+    allocator,
+    is_valid_code,
+    new_confirmation_code,
+    normalize_code,
+)
+from delapre.extensions import db
+from delapre.models import Booking
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+def query_count(response):
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers.get("Server-Timing", ""))
+    return int(match.group(1))
+
+
+class TestCodeFormat(unittest.TestCase):
+    def setUp(self):
+        self.codes = CodeAllocator("test-key")
+
+    def test_permutation_gives_distinct_valid_codes(self):
+        codes = {self.codes.encode(n) for n in range(20000)}
+        self.assertEqual(len(codes), 20000)
+        self.assertTrue(all(len(code) == 9 and is_valid_code(code) for code in codes))
+        self.assertNotEqual(self.codes.encode(1), CodeAllocator("other-key").encode(1))
+
+    def test_check_character_catches_typos(self):
+        code = self.codes.encode(123456)
+        for i, char in enumerate(code):
+            for other in ALPHABET.replace(char, ""):
+                self.assertFalse(is_valid_code(code[:i] + other + code[i + 1:]))
+        for i in range(len(code) - 1):
+            if code[i] != code[i + 1]:
+                self.assertFalse(is_valid_code(code[:i] + code[i + 1] + code[i] + code[i + 2:]))
+
+    def test_normalize(self):
+        code = "0" + self.codes.encode(5)[1:]
+        self.assertEqual(normalize_code(f" {code[:4].lower()}-{code[4:]} ".replace("0", "o")), code)
+        self.assertTrue(is_valid_code(normalize_code("abcdef12")))
+        self.assertFalse(is_valid_code("ABCDEFGH"))
+        self.assertFalse(is_valid_code("ABC"))
+
+
+class TestAllocation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        uri = "sqlite:///" + os.path.join(self.tmp.name, "codes.db")
+        # Two workers sharing one database
+        self.apps = [create_app({"SQLALCHEMY_DATABASE_URI": uri, "TESTING": True}) for _ in range(2)]
+
+    def tearDown(self):
+        for app in self.apps:
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_workers_never_issue_the_same_code(self):
+        issued = []
+        for _ in range(3):
+            for app in self.apps:
+                with app.app_context():
+                    issued.extend(new_confirmation_code() for _ in range(BLOCK_SIZE // 2 + 1))
+                    db.session.commit()
+        self.assertEqual(len(set(issued)), len(issued))
+
+    def test_rolled_back_blocks_are_forgotten(self):
+        app = self.apps[0]
+        with app.app_context():
+            new_confirmation_code()
+            db.session.rollback()
+            self.assertIsNone(allocator().take())
+            new_confirmation_code()
+            db.session.commit()
+            self.assertIsNotNone(allocator().take())
+
+
+class TestCheckin(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        starts_at = datetime.now() + timedelta(days=1)
+        response = self.client.post("/api/events", json={
+            "title": "Open Day",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 10,
+        }, headers=self.headers)
+        self.event_id = response.get_json()["id"]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def checkin(self, code):
+        return self.client.post("/api/staff/checkin", json={"confirmation_code": code}, headers=self.headers)
+
+    def test_checksum_is_validated_before_lookup(self):
+        code = self.client.post(
+            "/api/bookings", json={"event_id": self.event_id}, headers=self.headers
+        ).get_json()["confirmation_code"]
+        self.assertTrue(is_valid_code(code))
+
+        typo = code[:-1] + ALPHABET[(ALPHABET.index(code[-1]) + 1) % 32]
+        response = self.checkin(typo)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(query_count(response), query_count(self.checkin("")))
+
+        response = self.checkin(f"{code[:4].lower()}-{code[4:]}")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.get_json()["checked_in"])
+
+    def test_legacy_codes_still_check_in(self):
+        with self.app.app_context():
+            db.session.add(Booking(event_id=self.event_id, confirmation_code="0A1B2C3D"))
+            db.session.commit()
+        self.assertEqual(self.checkin("0a1b2c3d").status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import csv
+import io
+from datetime import datetime, timedelta
+
+from delapre.event_import import EXPORT_COLUMNS
+from delapre.extensions import db
+from delapre.models import Category
+
+
+def at(days, hour):
+    return (datetime.now() + timedelta(days=days)).replace(hour=hour, minute=0, second=0, microsecond=0)
+
+
+def row(title, days, hour=10, hours=2, location="Main Hall", **extra):
+    starts_at = at(days, hour)
+    return {
+        "title": title,
+        "starts_at": starts_at.isoformat(),
+        "ends_at": (starts_at + timedelta(hours=hours)).isoformat(),
+        "location": location,
+        "capacity": 30,
+        **extra,
+    }
+
+
+def to_csv(rows):
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=sorted({key for r in rows for key in r}))
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+def test_json_import_reports_rows_and_keeps_the_rest(client, staff_headers, create_event):
+    existing = create_event(
+        days=3, title="Existing", starts_at=at(3, 10).isoformat(), ends_at=at(3, 12).isoformat()
+    ).get_json()["id"]
+    rows = [
+        row("Tour", 1),
+        row("Clashes with existing", 3, hour=11),
+        row("Clashes with row 1", 1, hour=11),
+        row("Other hall", 1, hour=11, location="Garden"),
+        row("", 2),
+        row("Bad category", 2, category="nope"),
+        row("Backwards", 4, hours=-1),
+    ]
+    response = client.post("/api/staff/events/import", json={"events": rows}, headers=staff_headers)
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body["created"] == 2
+    assert {e["row"]: e["message"] for e in body["errors"]} == {
+        2: f"Overlaps event {existing} at this location",
+        3: "Overlaps row 1 at this location",
+        5: "Title is required",
+        6: "Unknown category: nope",
+        7: "End time must be after start time",
+    }
+    titles = {e["title"] for e in client.get("/api/events").get_json()}
+    assert titles == {"Existing", "Tour", "Other hall"}
+    assert "Garden" in {loc["name"] for loc in client.get("/api/locations").get_json()}
+
+
+def test_numeric_names_are_looked_up_by_name_too(app, client, staff_headers, create_event):
+    hall_id = create_event(location="1851").get_json()["location_id"]
+    with app.app_context():
+        db.session.add(Category(name="1900"))
+        db.session.commit()
+    rows = [
+        row("By name", 5, location="1851", category="1900"),
+        row("By id", 6, location=str(hall_id)),
+        row("Neither", 7, location="999999"),
+    ]
+    body = client.post("/api/staff/events/import", json={"events": rows}, headers=staff_headers).get_json()
+    assert body["created"] == 2
+    assert body["errors"] == [{"row": 3, "message": "Invalid location id"}]
+    events = {e["title"]: e for e in client.get("/api/events").get_json()}
+    assert events["By name"]["location"] == events["By id"]["location"] == "1851"
+    assert events["By name"]["category"]["name"] == "1900"
+
+
+def test_csv_upload_creates_series_and_dry_run_saves_nothing(client, staff_headers):
+    rows = [row(f"Week {week}", 1 + 7 * week, group_id="walks", price="5") for week in range(3)]
+    body = to_csv(rows)
+    response = client.post(
+        "/api/staff/events/import?dry_run=1", data=body, content_type="text/csv", headers=staff_headers
+    )
+    assert response.status_code == 200
+    assert response.get_json() == {"created": 0, "valid": 3, "errors": []}
+    assert client.get("/api/events").get_json() == []
+
+    response = client.post(
+        "/api/staff/events/import",
+        data={"file": (io.BytesIO(body.encode()), "programme.csv")},
+        content_type="multipart/form-data",
+        headers=staff_headers,
+    )
+    assert response.status_code == 201
+    events = client.get("/api/events").get_json()
+    assert len({e["group_id"] for e in events}) == 1
+    assert {(e["recurrence_type"], e["price"], e["is_free"]) for e in events} == {("weekly", 5.0, False)}
+
+
+def test_nothing_valid_is_a_400(client, staff_headers):
+    response = client.post("/api/staff/events/import", json=[{"title": "x"}], headers=staff_headers)
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == [{"row": 1, "message": "Invalid date format"}]
+
+
+def test_export_round_trips(client, staff_headers, create_event):
+    create_event(days=2, title="Talk, with comma")
+    create_event(days=5, title="Later")
+    response = client.get("/api/staff/events/export", headers=staff_headers)
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert tuple(rows[0]) == EXPORT_COLUMNS
+    assert [r["title"] for r in rows] == ["Talk, with comma", "Later"]
+
+    later = client.get(
+        f"/api/staff/events/export?format=json&from={at(4, 0).isoformat()}", headers=staff_headers
+    ).get_json()
+    assert [e["title"] for e in later] == ["Later"]
+
+    # Re-importing the export clashes with the events it came from
+    response = client.post(
+        "/api/staff/events/import", data=response.get_data(), content_type="text/csv", headers=staff_headers
+    )
+    assert [e["message"].split(" ")[0] for e in response.get_json()["errors"]] == ["Overlaps", "Overlaps"]
+
+
+def test_staff_only(client, register):
+    assert client.post("/api/staff/events/import", json=[], headers=register(1)).status_code == 403
+    assert client.get("/api/staff/events/export", headers=register(2)).status_code == 403
@@ -0,0 +1,149 @@
+import re
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.idempotency import ResponseCache
+from delapre.models import Booking, IdempotencyKey
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+def query_count(response):
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers.get("Server-Timing", ""))
+    return int(match.group(1))
+
+
+class TestIdempotency(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        starts_at = datetime.now() + timedelta(days=1)
+        response = self.client.post("/api/events", json={
+            "title": "Open Day",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 10,
+        }, headers=self.headers)
+        self.event_id = response.get_json()["id"]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def book(self, key, **payload):
+        return self.client.post(
+            "/api/bookings",
+            json={"event_id": self.event_id, **payload},
+            headers={**self.headers, "Idempotency-Key": key},
+        )
+
+    def booking_count(self):
+        with self.app.app_context():
+            return Booking.query.count()
+
+    def test_retry_replays_original_response(self):
+        first = self.book("abc")
+        self.assertEqual(first.status_code, 201)
+        retry = self.book("abc")
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.get_json(), first.get_json())
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(query_count(retry), 0)
+        self.assertEqual(self.booking_count(), 1)
+
+    def test_replay_from_database_after_cache_eviction(self):
+        first = self.book("abc", guest_count=2)
+        self.app.extensions["idempotency"] = ResponseCache(16)
+        retry = self.book("abc", guest_count=2)
+        self.assertEqual(retry.get_json(), first.get_json())
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+
+    def test_key_reused_for_different_request(self):
+        self.book("abc")
+        self.assertEqual(self.book("abc", guest_count=2).status_code, 422)
+        # Without a key the handler runs as before
+        self.assertEqual(self.client.post(
+            "/api/bookings", json={"event_id": self.event_id}, headers=self.headers
+        ).status_code, 409)
+
+    def test_guest_and_checkin_retries(self):
+        guest = {"event_id": self.event_id, "email": "guest@example.com", "name": "Guest"}
+        first = self.client.post("/api/bookings/guest", json=guest, headers={"Idempotency-Key": "g1"})
+        retry = self.client.post("/api/bookings/guest", json=guest, headers={"Idempotency-Key": "g1"})
+        self.assertEqual(retry.get_json()["id"], first.get_json()["id"])
+
+        code = {"confirmation_code": first.get_json()["confirmation_code"]}
+        headers = {**self.headers, "Idempotency-Key": "c1"}
+        first = self.client.post("/api/staff/checkin", json=code, headers=headers)
+        retry = self.client.post("/api/staff/checkin", json=code, headers=headers)
+        self.assertEqual((first.status_code, retry.status_code), (200, 200))
+        self.assertEqual(self.client.post("/api/staff/checkin", json=code, headers=self.headers).status_code, 409)
+
+    def test_batch_checkout_retry(self):
+        items = {"items": [{"event_id": self.event_id, "guest_count": 2}]}
+        headers = {**self.headers, "Idempotency-Key": "cart-1"}
+        first = self.client.post("/api/bookings/batch", json=items, headers=headers)
+        retry = self.client.post("/api/bookings/batch", json=items, headers=headers)
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.get_json(), first.get_json())
+        self.assertEqual(self.booking_count(), 1)
+
+    def test_keys_are_scoped_to_the_caller(self):
+        self.book("abc")
+        response = self.client.post("/api/auth/register", json={
+            "email": "user@example.com", "password": "pw", "first_name": "U", "last_name": "Ser"
+        })
+        other = {"Authorization": f"Bearer {response.get_json()['token']}", "Idempotency-Key": "abc"}
+        response = self.client.post("/api/bookings", json={"event_id": self.event_id}, headers=other)
+        self.assertNotIn("Idempotent-Replayed", response.headers)
+        self.assertEqual(self.booking_count(), 2)
+
+    def test_guests_are_not_replayed_each_others_bookings(self):
+        guest = {"event_id": self.event_id, "email": "guest@example.com", "name": "Guest"}
+        first = self.client.post(
+            "/api/bookings/guest", json=guest, headers={"Idempotency-Key": "g1"},
+            environ_base={"REMOTE_ADDR": "10.0.0.1"},
+        )
+        other = self.client.post(
+            "/api/bookings/guest", json=guest, headers={"Idempotency-Key": "g1"},
+            environ_base={"REMOTE_ADDR": "10.0.0.2"},
+        )
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", other.headers)
+        self.assertNotEqual(other.get_json().get("confirmation_code"), first.get_json()["confirmation_code"])
+
+    def test_failed_authentication_is_not_stored(self):
+        headers = {"Authorization": "Bearer nonsense", "Idempotency-Key": "abc"}
+        response = self.client.post("/api/bookings", json={"event_id": self.event_id}, headers=headers)
+        self.assertEqual(response.status_code, 401)
+
+        response = self.client.post("/api/auth/register", json={
+            "email": "user@example.com", "password": "pw", "first_name": "U", "last_name": "Ser"
+        })
+        user = {"Authorization": f"Bearer {response.get_json()['token']}", "Idempotency-Key": "chk"}
+        code = {"confirmation_code": "ABCDEFGH"}
+        self.assertEqual(self.client.post("/api/staff/checkin", json=code, headers=user).status_code, 403)
+        with self.app.app_context():
+            self.assertEqual(IdempotencyKey.query.filter(IdempotencyKey.status_code.isnot(None)).count(), 0)
+
+    def test_purge_expired_keys(self):
+        self.book("abc")
+        with self.app.app_context():
+            IdempotencyKey.query.update({IdempotencyKey.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+        result = self.app.test_cli_runner().invoke(args=["purge-idempotency-keys"])
+        self.assertIn("Deleted 1 expired idempotency key(s).", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
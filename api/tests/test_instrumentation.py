@@ -0,0 +1,119 @@
+import re
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+def query_count(response):
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers.get("Server-Timing", ""))
+    return int(match.group(1))
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True, "METRICS_TOKEN": "scrape",
+        })
+        self.client = self.app.test_client()
+        self.metrics_headers = {"Authorization": "Bearer scrape"}
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def create_events(self, count, offset=0):
+        ids = []
+        for i in range(offset, offset + count):
+            starts_at = datetime.now() + timedelta(days=i + 1)
+            response = self.client.post("/api/events", json={
+                "title": f"Event {i}",
+                "location": "Main Hall",
+                "starts_at": starts_at.isoformat(),
+                "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+                "capacity": 10,
+            }, headers=self.headers)
+            ids.append(response.get_json()["id"])
+        return ids
+
+    def register(self, n):
+        response = self.client.post("/api/auth/register", json={
+            "email": f"user{n}@example.com", "password": "pw", "first_name": "U", "last_name": str(n)
+        })
+        return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+    def test_server_timing_header(self):
+        response = self.client.get("/api/events")
+        self.assertRegex(response.headers["Server-Timing"], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        self.create_events(2)
+        few = query_count(self.client.get("/api/staff/events/upcoming", headers=self.headers))
+        self.create_events(6, offset=2)
+        many = query_count(self.client.get("/api/staff/events/upcoming", headers=self.headers))
+        self.assertEqual(few, many)
+        self.assertEqual(
+            query_count(self.client.get("/api/events")),
+            query_count(self.client.get("/api/events?fields=id,title")) + 1,
+        )
+
+    def test_attendance_export_queries_do_not_grow_with_rows(self):
+        event_id = self.create_events(1)[0]
+        self.client.post("/api/bookings", json={"event_id": event_id}, headers=self.register(0))
+        url = f"/api/staff/events/{event_id}/attendance"
+        few = query_count(self.client.get(url, headers=self.headers))
+        for n in range(1, 5):
+            self.client.post("/api/bookings", json={"event_id": event_id}, headers=self.register(n))
+        self.assertEqual(few, query_count(self.client.get(url, headers=self.headers)))
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/events")
+        self.client.get("/api/events")
+        text = self.client.get("/metrics", headers=self.metrics_headers).get_data(as_text=True)
+        self.assertIn(
+            'http_request_duration_seconds_count{route="/api/events",method="GET",status="200"} 2', text
+        )
+        self.assertIn('db_queries_per_request_bucket{route="/api/events",method="GET",le="+Inf"} 2', text)
+        self.assertIn('db_time_seconds_total{route="/api/events",method="GET"}', text)
+
+    def test_metrics_need_a_token_or_allowed_address(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        self.assertEqual(self.client.get("/metrics", headers=self.headers).status_code, 403)
+
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True,
+            "METRICS_ALLOWED_ADDRESSES": ("10.0.0.5",),
+        })
+        client = app.test_client()
+        self.assertEqual(client.get("/metrics", environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code, 200)
+        self.assertEqual(client.get("/metrics").status_code, 403)
+
+        # Neither set: not served at all
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.assertEqual(app.test_client().get("/metrics").status_code, 404)
+
+    def test_slow_query_log(self):
+        self.app.config["SLOW_QUERY_MS"] = 0.000001
+        with self.assertLogs("delapre.slow_queries", level="WARNING") as logs:
+            self.client.get("/api/categories")
+        self.assertIn("in /api/categories: SELECT", logs.output[0])
+        text = self.client.get("/metrics", headers=self.metrics_headers).get_data(as_text=True)
+        self.assertIn('db_slow_queries_total{route="/api/categories"}', text)
+
+        self.app.config["SLOW_QUERY_MS"] = 0
+        with self.assertNoLogs("delapre.slow_queries", level="WARNING"):
+            self.client.get("/api/categories")
+
+
+if __name__ == "__main__":
+    unittest.main()
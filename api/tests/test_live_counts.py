@@ -0,0 +1,172 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.live import LiveFeed, stream_token
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+def parse_events(chunk):
+    """``[(event name, data)]`` from a chunk of an event stream."""
+    events = []
+    for block in chunk.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class TestLiveFeed(unittest.TestCase):
+    def setUp(self):
+        self.feed = LiveFeed(app=None, interval=3600, refresh=0, history=3)
+        self.assertTrue(self.feed.acquire())
+        self.addCleanup(self.feed.release)
+
+    def test_only_changes_are_logged(self):
+        feed = self.feed
+        start = feed.cursor
+        feed.publish({1: {"spots_left": 5, "checked_in_count": 0}})
+        feed.publish({1: {"spots_left": 5, "checked_in_count": 1}, 2: {"spots_left": 9}})
+        first, second, last = [entry[0] for entry in feed._log]
+        self.assertEqual(feed.wait(start, timeout=0), (last, {
+            1: {"spots_left": 5, "checked_in_count": 1}, 2: {"spots_left": 9}
+        }))
+        self.assertEqual(feed.wait(second, timeout=0), (last, {2: {"spots_left": 9}}))
+        self.assertEqual(feed.wait(last, timeout=0), (last, {}))
+
+        feed.publish({1: {"spots_left": 4}})
+        # The first entry has been dropped from the log, so a client at the start must reload
+        self.assertEqual(feed.wait(start, timeout=0)[1], None)
+        self.assertEqual(feed.wait(first, timeout=0)[1], {1: {"checked_in_count": 1, "spots_left": 4}, 2: {"spots_left": 9}})
+
+    def test_ids_carry_over_between_workers(self):
+        # Ids are times, so one from another worker resumes here at the
+        # same point, replaying LIVE_REFRESH_SECONDS before it
+        feed = self.feed
+        feed.refresh = 60
+        feed.publish({1: {"spots_left": 4}})
+        # This worker saw the change later than the one the browser was on
+        other_worker_id = feed.cursor + 10_000
+        self.assertEqual(feed.wait(feed.resume_cursor(other_worker_id), timeout=0)[1], {1: {"spots_left": 4}})
+        feed.refresh = 0
+        self.assertEqual(feed.wait(feed.resume_cursor(other_worker_id), timeout=0)[1], {})
+        # Ids from before this worker started listening cannot be resumed
+        self.assertEqual(feed.wait(feed.resume_cursor(1), timeout=0)[1], None)
+
+    def test_streams_are_capped(self):
+        self.assertFalse(self.feed.acquire(limit=1))
+        self.assertTrue(self.feed.acquire(limit=2))
+        self.feed.release()
+
+
+class TestLiveStream(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite://",
+            "TESTING": True,
+            "LIVE_PUBLISH_INTERVAL": 0.05,
+            "LIVE_KEEPALIVE_SECONDS": 0.5,
+        })
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        self.event_ids = [self.create_event(days) for days in (1, 2)]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def create_event(self, days):
+        starts_at = datetime.now() + timedelta(days=days)
+        return self.client.post("/api/events", json={
+            "title": f"Tour {days}",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 10,
+        }, headers=self.headers).get_json()["id"]
+
+    def open_stream(self, query="", path="/api/events/live", headers=None):
+        response = self.client.get(f"{path}{query}", headers=headers, buffered=False)
+        self.addCleanup(response.close)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b"retry: 3000\n\n")
+        return chunks
+
+    def test_booking_and_checkin_are_pushed(self):
+        chunks = self.open_stream("", "/api/staff/events/live", self.headers)
+        public = self.open_stream()
+        event_id = self.event_ids[0]
+        booking = self.client.post(
+            "/api/bookings", json={"event_id": event_id, "guest_count": 3}, headers=self.headers
+        ).get_json()
+        self.assertEqual(parse_events(next(chunks)), [
+            ("counts", [{"event_id": event_id, "spots_left": 7, "booked_count": 3, "checked_in_count": 0}])
+        ])
+        self.assertEqual(parse_events(next(public)), [("counts", [{"event_id": event_id, "spots_left": 7}])])
+
+        self.client.post(
+            "/api/staff/checkin", json={"confirmation_code": booking["confirmation_code"]}, headers=self.headers
+        )
+        self.assertEqual(parse_events(next(chunks)), [
+            ("counts", [{"event_id": event_id, "checked_in_count": 3}])
+        ])
+        self.assertEqual(next(public), b": keepalive\n\n")
+
+    def test_attendance_stream_is_for_staff(self):
+        self.assertEqual(self.client.get("/api/staff/events/live").status_code, 401)
+        self.assertEqual(self.client.get("/api/staff/events/live?token=forged").status_code, 401)
+        self.assertEqual(self.client.post("/api/staff/events/live/token").status_code, 401)
+
+        response = self.client.post("/api/auth/register", json={
+            "email": "visitor@example.com", "password": "pw", "first_name": "V", "last_name": "Isitor"
+        })
+        visitor = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        self.assertEqual(self.client.post("/api/staff/events/live/token", headers=visitor).status_code, 403)
+        with self.app.test_request_context():
+            token = stream_token(response.get_json()["user"]["id"])
+        self.assertEqual(self.client.get(f"/api/staff/events/live?token={token}").status_code, 401)
+
+    def test_staff_page_stream_carries_attendance(self):
+        # What the staff dashboard does: fetch a token, then open the
+        # stream with it in the URL, since EventSource sends no headers
+        token = self.client.post("/api/staff/events/live/token", headers=self.headers).get_json()["token"]
+        chunks = self.open_stream(f"?token={token}", "/api/staff/events/live")
+        event_id = self.event_ids[0]
+        self.client.post("/api/bookings", json={"event_id": event_id, "guest_count": 2}, headers=self.headers)
+        self.assertEqual(parse_events(next(chunks)), [
+            ("counts", [{"event_id": event_id, "spots_left": 8, "booked_count": 2, "checked_in_count": 0}])
+        ])
+
+        self.app.config["LIVE_TOKEN_SECONDS"] = -1
+        self.assertEqual(self.client.get(f"/api/staff/events/live?token={token}").status_code, 401)
+
+    def test_streams_can_be_filtered_by_event(self):
+        chunks = self.open_stream(f"?event_ids={self.event_ids[1]}")
+        self.client.post("/api/bookings", json={"event_id": self.event_ids[0]}, headers=self.headers)
+        self.assertEqual(next(chunks), b": keepalive\n\n")
+        self.client.post("/api/bookings", json={"event_id": self.event_ids[1]}, headers=self.headers)
+        self.assertEqual(parse_events(next(chunks))[0][1][0]["spots_left"], 9)
+
+    def test_streams_per_worker_are_capped(self):
+        self.app.config["LIVE_MAX_STREAMS"] = 1
+        self.open_stream()
+        response = self.client.get("/api/events/live")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "10")
+
+    def test_invalid_filter(self):
+        self.assertEqual(self.client.get("/api/events/live?event_ids=x").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+
+from werkzeug.security import generate_password_hash
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.models import User
+from delapre.passwords import LoginThrottle
+from delapre.schema import ensure_staff_user
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+METHOD = "pbkdf2:sha256:1000"
+
+
+class TestLoginThrottle(unittest.TestCase):
+    def test_sliding_window(self):
+        throttle = LoginThrottle(window=60, max_per_email=2, max_per_address=3)
+        throttle.failed("10.0.0.1", "a@example.com", now=0)
+        self.assertIsNone(throttle.retry_after("10.0.0.1", "a@example.com", now=1))
+        throttle.failed("10.0.0.1", "a@example.com", now=10)
+        self.assertEqual(throttle.retry_after("10.0.0.1", "a@example.com", now=10), 50)
+        self.assertIsNone(throttle.retry_after("10.0.0.1", "b@example.com", now=10))
+
+        throttle.failed("10.0.0.1", "b@example.com", now=20)
+        self.assertEqual(throttle.retry_after("10.0.0.1", "c@example.com", now=20), 40)
+        self.assertIsNone(throttle.retry_after("10.0.0.2", "a@example.com", now=70))
+        throttle.failed("10.0.0.2", "a@example.com", now=70)
+        throttle.succeeded("a@example.com")
+        self.assertIsNone(throttle.retry_after("10.0.0.2", "a@example.com", now=70))
+
+    def test_tracked_keys_are_capped(self):
+        throttle = LoginThrottle(window=60, max_per_email=1, max_per_address=100, max_keys=4)
+        for n in range(50):
+            throttle.failed("10.0.0.1", f"user{n}@example.com", now=n / 100)
+        self.assertEqual(len(throttle._failures), 4)
+        # The most recent failures are the ones kept
+        self.assertIsNotNone(throttle.retry_after("10.0.0.2", "user49@example.com", now=1))
+        self.assertIsNone(throttle.retry_after("10.0.0.2", "user0@example.com", now=1))
+
+
+class TestLogin(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite://",
+            "TESTING": True,
+            "PASSWORD_HASH_METHOD": METHOD,
+            "LOGIN_MAX_FAILURES_PER_EMAIL": 3,
+            "LOGIN_MAX_FAILURES_PER_ADDRESS": 5,
+        })
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def login(self, email=STAFF_EMAIL, password=STAFF_PASSWORD):
+        return self.client.post("/api/auth/login", json={"email": email, "password": password})
+
+    def staff_hash(self):
+        with self.app.app_context():
+            return User.query.filter_by(email=STAFF_EMAIL).one().password_hash
+
+    def test_failures_lock_out_the_email_then_the_address(self):
+        for _ in range(3):
+            self.assertEqual(self.login(password="wrong").status_code, 401)
+        response = self.login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers["Retry-After"]), 0)
+
+        self.assertEqual(self.login("nobody@example.com").status_code, 401)
+        self.assertEqual(self.login("nobody2@example.com").status_code, 401)
+        self.assertEqual(self.login("nobody3@example.com").status_code, 429)
+
+    def test_success_resets_the_email_count(self):
+        self.login(password="wrong")
+        self.login(password="wrong")
+        self.assertEqual(self.login().status_code, 200)
+        self.login(password="wrong")
+        self.login(password="wrong")
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_old_hashes_are_upgraded_at_login(self):
+        with self.app.app_context():
+            User.query.filter_by(email=STAFF_EMAIL).update(
+                {User.password_hash: generate_password_hash(STAFF_PASSWORD, "pbkdf2:sha256:2000")}
+            )
+            db.session.commit()
+        self.assertEqual(self.login().status_code, 200)
+        upgraded = self.staff_hash()
+        self.assertTrue(upgraded.startswith(METHOD + "$"))
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.staff_hash(), upgraded)
+
+    def test_registration_uses_the_configured_method(self):
+        response = self.client.post("/api/auth/register", json={
+            "email": "user@example.com", "password": "pw", "first_name": "U", "last_name": "Ser"
+        })
+        self.assertEqual(response.status_code, 201)
+        with self.app.app_context():
+            user = User.query.filter_by(email="user@example.com").one()
+            self.assertTrue(user.password_hash.startswith(METHOD + "$"))
+        self.assertEqual(self.login("user@example.com", "pw").status_code, 200)
+
+    def test_startup_leaves_the_staff_password_alone(self):
+        before = self.staff_hash()
+        with self.app.app_context():
+            ensure_staff_user()
+        self.assertEqual(self.staff_hash(), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
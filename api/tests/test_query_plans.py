@@ -0,0 +1,61 @@
+from sqlalchemy import inspect, text
+
+from delapre.confirmation_codes import is_valid_code
+from delapre.extensions import db
+from delapre.query_plans import SAMPLE_CODE, explain_hot_queries
+from delapre.schema import prepare_database
+
+DROPPED = (
+    "ix_bookings_event_status_guests",
+    "ix_bookings_event_email_status",
+    "ix_bookings_user_event_status",
+    "ix_events_location_starts_ends",
+)
+
+
+def test_hot_queries_use_indexes(app):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["explain-hot-queries"])
+    assert result.exit_code == 0, result.output
+    assert "FULL SCAN" not in result.output
+
+
+def test_unsupported_database_is_reported(app, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, "name", "postgresql")
+    result = app.test_cli_runner().invoke(args=["explain-hot-queries"])
+    assert result.exit_code == 1
+    assert "Error: Checking query plans is not supported on postgresql" in result.output
+    assert result.exception is None or isinstance(result.exception, SystemExit)
+
+
+def test_sample_code_is_current():
+    assert is_valid_code(SAMPLE_CODE)
+
+
+def test_missing_indexes_are_reported_and_recreated(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for name in DROPPED:
+                conn.execute(text(f"DROP INDEX {name}"))
+        scans = explain_hot_queries()
+        assert scans["seats reserved per event"] == ["bookings"]
+        assert scans["booking history"] == ["bookings"]
+        assert scans["location conflict"] == []  # falls back to idx_events_starts_at
+        assert app.test_cli_runner().invoke(args=["explain-hot-queries"]).exit_code == 1
+
+        result = app.test_cli_runner().invoke(args=["ensure-indexes"])
+        assert "Created 4 missing index(es)." in result.output
+        names = {index["name"] for index in inspect(db.engine).get_indexes("bookings")}
+        assert {"ix_bookings_event_status_guests", "ix_bookings_user_event_status"} <= names
+        assert not any(explain_hot_queries().values())
+
+
+def test_app_start_leaves_indexes_to_the_cli(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_bookings_user_event_status"))
+        prepare_database()
+        assert "ix_bookings_user_event_status" not in {
+            index["name"] for index in inspect(db.engine).get_indexes("bookings")
+        }
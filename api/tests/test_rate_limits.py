@@ -0,0 +1,130 @@
+import re
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.ratelimit import MemoryBackend, client_address
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+def query_count(response):
+    match = re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers.get("Server-Timing", ""))
+    return int(match.group(1))
+
+
+class TestMemoryBackend(unittest.TestCase):
+    def test_bucket_refills_at_rate(self):
+        backend = MemoryBackend()
+        self.assertEqual([backend.take("k", 0.5, 2, now=0) for _ in range(2)], [0, 0])
+        self.assertEqual(backend.take("k", 0.5, 2, now=0), 2.0)
+        self.assertEqual(backend.take("k", 0.5, 2, now=1), 1.0)
+        self.assertEqual(backend.take("k", 0.5, 2, now=2), 0)
+        self.assertEqual(backend.take("other", 0.5, 2, now=2), 0)
+
+
+class TestClientAddress(unittest.TestCase):
+    def test_forwarded_address_of_trusted_proxies(self):
+        self.assertEqual(client_address("10.0.0.9", "1.2.3.4, 10.0.0.8", 0), "10.0.0.9")
+        self.assertEqual(client_address("10.0.0.9", "1.2.3.4, 10.0.0.8", 1), "10.0.0.8")
+        self.assertEqual(client_address("10.0.0.9", "1.2.3.4, 10.0.0.8", 2), "1.2.3.4")
+        self.assertEqual(client_address("10.0.0.9", "1.2.3.4", 2), "10.0.0.9")
+        self.assertEqual(client_address("10.0.0.9", None, 1), "10.0.0.9")
+
+    def test_clients_behind_a_proxy_get_their_own_buckets(self):
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite://",
+            "TESTING": True,
+            "TRUSTED_PROXY_COUNT": 1,
+            "RATE_LIMIT_STORAGE": MemoryBackend(),
+            "RATE_LIMITS": {"catalogue.list_events": {"ip": (0.01, 1)}},
+        })
+        client = app.test_client()
+        proxy = {"REMOTE_ADDR": "172.18.0.2"}
+
+        def list_events(forwarded_for):
+            return client.get(
+                "/api/events", headers={"X-Forwarded-For": forwarded_for}, environ_base=proxy
+            ).status_code
+
+        self.assertEqual(list_events("203.0.113.1"), 200)
+        self.assertEqual(list_events("203.0.113.1"), 429)
+        self.assertEqual(list_events("203.0.113.2"), 200)
+        # Only the address the proxy appended counts, not one the client sent
+        self.assertEqual(list_events("203.0.113.3, 203.0.113.2"), 429)
+
+
+class TestRateLimits(unittest.TestCase):
+    def setUp(self):
+        self.backend = MemoryBackend()
+        self.app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite://",
+            "TESTING": True,
+            "RATE_LIMIT_STORAGE": self.backend,
+            "RATE_LIMITS": {
+                "bookings.create_guest_booking": {"ip": (0.01, 2), "route": (0.01, 3)},
+                "bookings.create_booking": {"user": (0.01, 1)},
+            },
+            "RATE_LIMIT_DEFAULT": None,
+        })
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        starts_at = datetime.now() + timedelta(days=1)
+        response = self.client.post("/api/events", json={
+            "title": "Open Day",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 50,
+        }, headers=self.headers)
+        self.event_id = response.get_json()["id"]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def guest_booking(self, n, address="10.0.0.1"):
+        return self.client.post(
+            "/api/bookings/guest",
+            json={"event_id": self.event_id, "email": f"guest{n}@example.com", "name": "Guest"},
+            environ_base={"REMOTE_ADDR": address},
+        )
+
+    def test_ip_and_route_buckets(self):
+        self.assertEqual(self.guest_booking(1).status_code, 201)
+        self.assertEqual(self.guest_booking(2).status_code, 201)
+        response = self.guest_booking(3)
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response.headers["Retry-After"]), 0)
+        self.assertEqual(query_count(response), 0)
+
+        # Another address has its own bucket, until the route-wide one runs dry
+        self.assertEqual(self.guest_booking(4, "10.0.0.2").status_code, 201)
+        self.assertEqual(self.guest_booking(5, "10.0.0.3").status_code, 429)
+
+    def test_user_buckets(self):
+        book = {"event_id": self.event_id}
+        self.assertEqual(self.client.post("/api/bookings", json=book, headers=self.headers).status_code, 201)
+        self.assertEqual(self.client.post("/api/bookings", json=book, headers=self.headers).status_code, 429)
+
+        response = self.client.post("/api/auth/register", json={
+            "email": "user@example.com", "password": "pw", "first_name": "U", "last_name": "Ser"
+        })
+        other = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        self.assertEqual(self.client.post("/api/bookings", json=book, headers=other).status_code, 201)
+
+    def test_preflight_and_unlisted_endpoints_are_not_limited(self):
+        for _ in range(5):
+            self.assertEqual(self.client.options("/api/bookings/guest").status_code, 200)
+            self.assertEqual(self.client.get("/api/events").status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.models import Event
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+class TestReadReplicas(unittest.TestCase):
+    """Primary and replica are two separate SQLite files.
+
+    The replica is seeded with an event the primary does not have, so the
+    listing tells us which database served the request.
+    """
+
+    def make_app(self, create_replica_schema=True, **overrides):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        primary = os.path.join(self.tmpdir.name, "primary.db")
+        replica = os.path.join(self.tmpdir.name, "replica.db")
+        config = {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{primary}",
+            "SQLALCHEMY_REPLICA_URIS": [f"sqlite:///{replica}"],
+            "TESTING": True,
+        }
+        config.update(overrides)
+        self.config = config
+        app = create_app(config)
+        if create_replica_schema:
+            with app.app_context():
+                replica_engine = db.engines["replica_0"]
+                db.metadata.create_all(replica_engine)
+                with replica_engine.begin() as conn:
+                    conn.execute(Event.__table__.insert(), {
+                        "title": "Replica Event",
+                        "description": "Only on the replica",
+                        "starts_at": datetime.now() + timedelta(days=3),
+                        "ends_at": datetime.now() + timedelta(days=3, hours=1),
+                        "capacity": 10,
+                        "is_free": True,
+                        "price": 0,
+                    })
+        return app
+
+    def tearDown(self):
+        self.dispose_engines(self.app)
+        self.tmpdir.cleanup()
+
+    def dispose_engines(self, app):
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+    def login(self):
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+    def create_primary_event(self, headers):
+        starts_at = datetime.now() + timedelta(days=2)
+        response = self.client.post("/api/events", json={
+            "title": "Primary Event",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 5,
+        }, headers=headers)
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()
+
+    def titles(self, headers=None):
+        response = self.client.get("/api/events", headers=headers or {})
+        self.assertEqual(response.status_code, 200)
+        return [e["title"] for e in response.get_json()]
+
+    def test_catalogue_reads_from_replica(self):
+        self.app = self.make_app()
+        self.client = self.app.test_client()
+        staff = self.login()
+        self.create_primary_event(staff)
+        self.assertEqual(self.titles(), ["Replica Event"])
+
+    def test_writer_reads_own_writes_from_primary(self):
+        self.app = self.make_app()
+        self.client = self.app.test_client()
+        staff = self.login()
+        self.create_primary_event(staff)
+        self.assertEqual(self.titles(staff), ["Primary Event"])
+
+    def test_new_users_read_their_account_from_primary(self):
+        # The replica has not seen the new user yet
+        self.app = self.make_app()
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/register", json={
+            "email": "new@example.com", "password": "pw", "first_name": "New", "last_name": "User"
+        })
+        headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        self.assertEqual(self.client.get("/api/bookings", headers=headers).status_code, 200)
+
+    def test_follow_up_reads_on_another_worker_use_primary(self):
+        self.app = self.make_app()
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/register", json={
+            "email": "new@example.com", "password": "pw", "first_name": "New", "last_name": "User"
+        })
+        last_write = response.headers["X-Last-Write"]
+        headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+        # A second worker: same databases, but it never saw the write
+        other = create_app(self.config)
+        self.addCleanup(self.dispose_engines, other)
+        client = other.test_client()
+        self.assertEqual(client.get("/api/bookings", headers=headers).status_code, 401)
+        response = client.get("/api/bookings", headers={**headers, "X-Last-Write": last_write})
+        self.assertEqual(response.status_code, 200)
+        forged = {**headers, "X-Last-Write": last_write[:-2] + "xx"}
+        self.assertEqual(client.get("/api/bookings", headers=forged).status_code, 401)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.app = self.make_app(REPLICA_LAG_PROBE=lambda conn: 30)
+        self.client = self.app.test_client()
+        self.create_primary_event(self.login())
+        self.assertEqual(self.titles(), ["Primary Event"])
+
+    def test_failing_replica_falls_back_to_primary(self):
+        # The replica answers the health probe but has no tables, so the
+        # view's first query fails and is retried on the primary.
+        self.app = self.make_app(create_replica_schema=False)
+        self.client = self.app.test_client()
+        self.create_primary_event(self.login())
+        self.assertEqual(self.titles(), ["Primary Event"])
+        self.assertEqual(self.titles(), ["Primary Event"])
+
+    def test_writes_always_go_to_primary(self):
+        self.app = self.make_app()
+        self.client = self.app.test_client()
+        event = self.create_primary_event(self.login())
+        with self.app.app_context():
+            self.assertIsNotNone(db.session.get(Event, event["id"]))
+            with db.engines["replica_0"].connect() as conn:
+                rows = conn.execute(Event.__table__.select()).fetchall()
+            self.assertEqual(len(rows), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.models import Booking, SeatHold
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+class TestSeatHolds(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        starts_at = datetime.now() + timedelta(days=1)
+        response = self.client.post("/api/events", json={
+            "title": "Small Tour",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 4,
+        }, headers=self.headers)
+        self.event_id = response.get_json()["id"]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def spots_left(self):
+        return self.client.get(f"/api/events/{self.event_id}").get_json()["spots_left"]
+
+    def hold(self, guest_count, headers=None):
+        return self.client.post(
+            "/api/holds", json={"event_id": self.event_id, "guest_count": guest_count}, headers=headers
+        )
+
+    def expire_holds(self):
+        with self.app.app_context():
+            SeatHold.query.update({SeatHold.expires_at: datetime.utcnow() - timedelta(minutes=1)})
+            db.session.commit()
+
+    def test_hold_counts_against_capacity(self):
+        response = self.hold(3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()["spots_left"], 1)
+        self.assertEqual(self.spots_left(), 1)
+        self.assertEqual(self.hold(2).status_code, 409)
+        response = self.client.post(
+            "/api/bookings", json={"event_id": self.event_id, "guest_count": 2}, headers=self.headers
+        )
+        self.assertEqual(response.status_code, 409)
+
+    def test_checkout_converts_hold(self):
+        token = self.hold(4).get_json()["token"]
+        response = self.client.post("/api/bookings/guest", json={
+            "event_id": self.event_id, "guest_count": 4, "hold_token": token,
+            "email": "guest@example.com", "name": "Guest",
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()["event"]["spots_left"], 0)
+        with self.app.app_context():
+            self.assertEqual(SeatHold.query.count(), 0)
+
+    def test_checkout_beyond_hold_checks_remaining_capacity(self):
+        token = self.hold(1).get_json()["token"]
+        self.hold(2)
+        response = self.client.post("/api/bookings", json={
+            "event_id": self.event_id, "guest_count": 3, "hold_token": token
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post("/api/bookings", json={
+            "event_id": self.event_id, "guest_count": 2, "hold_token": token
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.spots_left(), 0)
+
+    def test_user_hold_is_not_transferable(self):
+        token = self.hold(4, headers=self.headers).get_json()["token"]
+        response = self.client.post("/api/bookings/guest", json={
+            "event_id": self.event_id, "hold_token": token, "email": "guest@example.com", "name": "Guest",
+        })
+        self.assertEqual(response.status_code, 409)
+
+    def test_resize_and_release(self):
+        token = self.hold(1).get_json()["token"]
+        response = self.client.patch(f"/api/holds/{token}", json={"guest_count": 4})
+        self.assertEqual(response.get_json()["spots_left"], 0)
+        self.assertEqual(self.client.patch(f"/api/holds/{token}", json={"guest_count": 5}).status_code, 400)
+        self.assertEqual(self.client.delete(f"/api/holds/{token}").status_code, 204)
+        self.assertEqual(self.spots_left(), 4)
+        self.assertEqual(self.client.patch(f"/api/holds/{token}", json={"guest_count": 1}).status_code, 404)
+
+    def test_seats_held_per_caller_are_limited(self):
+        self.app.config["HOLD_MAX_SEATS_PER_CALLER"] = 2
+        guest = {"REMOTE_ADDR": "10.0.0.1"}
+
+        def hold(guest_count, environ_base=guest, headers=None):
+            return self.client.post(
+                "/api/holds", json={"event_id": self.event_id, "guest_count": guest_count},
+                headers=headers, environ_base=environ_base,
+            )
+
+        token = hold(1).get_json()["token"]
+        self.assertEqual(hold(2).status_code, 429)
+        self.assertEqual(self.client.patch(f"/api/holds/{token}", json={"guest_count": 2}).status_code, 200)
+        self.assertEqual(hold(1).status_code, 429)
+        # Other addresses and signed-in users have their own allowance
+        self.assertEqual(hold(1, environ_base={"REMOTE_ADDR": "10.0.0.2"}).status_code, 201)
+        self.assertEqual(hold(1, headers=self.headers).status_code, 201)
+
+        self.expire_holds()
+        self.assertEqual(hold(2).status_code, 201)
+
+    def test_expired_holds_release_seats_and_are_swept(self):
+        for _ in range(4):
+            self.hold(1)
+        self.expire_holds()
+        self.assertEqual(self.spots_left(), 4)
+        result = self.app.test_cli_runner().invoke(args=["sweep-holds", "--batch-size", "3"])
+        self.assertIn("Released 4 expired seat hold(s).", result.output)
+        with self.app.app_context():
+            self.assertEqual(SeatHold.query.count(), 0)
+
+    def test_expired_hold_falls_back_to_capacity_check(self):
+        token = self.hold(2).get_json()["token"]
+        self.expire_holds()
+        response = self.client.post("/api/bookings", json={
+            "event_id": self.event_id, "guest_count": 2, "hold_token": token
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        with self.app.app_context():
+            self.assertEqual(Booking.query.count(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.jsonprovider import OrjsonProvider, orjson
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+class TestSerialization(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True})
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+        starts_at = datetime.now() + timedelta(days=2)
+        response = self.client.post("/api/events", json={
+            "title": "Weekly Talk",
+            "description": "A long description " * 20,
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 10,
+            "recurrence": {
+                "type": "weekly",
+                "end_date": (starts_at + timedelta(weeks=1, days=1)).strftime("%Y-%m-%d")
+            }
+        }, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.event_ids = [e["id"] for e in self.client.get("/api/events").get_json()]
+        for event_id in self.event_ids:
+            self.client.post(
+                "/api/bookings", json={"event_id": event_id, "guest_count": 3}, headers=self.headers
+            )
+        self.client.post("/api/bookings/guest", json={
+            "event_id": self.event_ids[0], "email": "guest@example.com", "name": "Guest", "guest_count": 2
+        })
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+
+    def test_event_sparse_fields(self):
+        events = self.client.get("/api/events?fields=id,title,spots_left").get_json()
+        self.assertEqual([set(e) for e in events], [{"id", "title", "spots_left"}] * 2)
+        self.assertEqual([e["spots_left"] for e in events], [5, 7])
+
+    def test_event_unknown_field(self):
+        response = self.client.get("/api/events?fields=id,nope")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("nope", response.get_json()["message"])
+
+    def test_event_details_fields(self):
+        event = self.client.get(f"/api/events/{self.event_ids[1]}?fields=title").get_json()
+        self.assertEqual(event, {"title": "Weekly Talk"})
+
+    def test_full_booking_payload_unchanged(self):
+        bookings = self.client.get("/api/bookings/history", headers=self.headers).get_json()
+        self.assertEqual(len(bookings), 2)
+        self.assertIn("description", bookings[0]["event"])
+        self.assertEqual(
+            {b["event"]["id"]: b["event"]["spots_left"] for b in bookings},
+            {self.event_ids[0]: 5, self.event_ids[1]: 7},
+        )
+
+    def test_normalized_bookings(self):
+        response = self.client.get(
+            "/api/staff/bookings?normalize=1&fields=id,confirmation_code&event_fields=id,title",
+            headers=self.headers,
+        )
+        payload = response.get_json()
+        self.assertEqual(len(payload["bookings"]), 3)
+        self.assertEqual(set(payload["bookings"][0]), {"id", "confirmation_code", "event_id"})
+        self.assertEqual(sorted(payload["events"]), sorted(str(i) for i in self.event_ids))
+        self.assertEqual(payload["events"][str(self.event_ids[0])], {"id": self.event_ids[0], "title": "Weekly Talk"})
+
+    def test_bookings_without_event(self):
+        bookings = self.client.get("/api/bookings?fields=id,event_id", headers=self.headers).get_json()
+        self.assertEqual([set(b) for b in bookings], [{"id", "event_id"}] * 2)
+
+
+@unittest.skipIf(orjson is None, "orjson not installed")
+class TestOrjsonProvider(unittest.TestCase):
+    def test_provider_in_use(self):
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://", "PREPARE_DATABASE": False})
+        self.assertIsInstance(app.json, OrjsonProvider)
+
+    def test_matches_default_encoding(self):
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite://", "PREPARE_DATABASE": False, "JSON_PROVIDER": "default"
+        })
+        fast = OrjsonProvider(app)
+        data = {"b": Decimal("1.50"), "a": [1, None, True]}
+        self.assertEqual(app.json.loads(fast.dumps(data)), app.json.loads(app.json.dumps(data)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from delapre.snapshots import snapshot_publisher
+
+
+@pytest.fixture
+def app(app, tmp_path):
+    app.config.update(SNAPSHOT_DIR=str(tmp_path / "snapshots"), SNAPSHOT_DEBOUNCE_SECONDS=0.01)
+    return app
+
+
+def publisher(app):
+    with app.app_context():
+        return snapshot_publisher()
+
+
+def test_publish_writes_a_versioned_compressed_catalogue(app, client, create_event):
+    event_id = create_event(title="Talk").get_json()["id"]
+    publisher(app).wait()
+    live = json.loads(client.get("/api/events?free=0").get_data())
+    current = os.path.join(app.config["SNAPSHOT_DIR"], "current")
+    with open(os.path.join(current, "manifest.json")) as f:
+        manifest = json.load(f)
+    assert os.readlink(current) == manifest["version"]
+    with open(os.path.join(current, "events.json"), "rb") as f:
+        assert json.loads(f.read()) == live
+    with open(os.path.join(current, f"events/{event_id}.json.gz"), "rb") as f:
+        assert json.loads(gzip.decompress(f.read()))["title"] == "Talk"
+
+    response = client.get("/api/events")
+    assert response.headers["X-Snapshot-Version"] == manifest["version"]
+    assert json.loads(response.get_data()) == live
+    identity_etag = response.headers["ETag"]
+    gzip_headers = {"Accept-Encoding": "gzip, br"}
+    response = client.get("/api/events", headers=gzip_headers)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.get_data())) == live
+    assert response.headers["ETag"] != identity_etag
+    etag = response.headers["ETag"]
+    assert client.get("/api/events", headers={**gzip_headers, "If-None-Match": etag}).status_code == 304
+    assert client.get("/api/events", headers={"If-None-Match": identity_etag}).status_code == 304
+    for refused in ("gzip;q=0", "identity, x-gzip"):
+        response = client.get("/api/events", headers={"Accept-Encoding": refused})
+        assert "Content-Encoding" not in response.headers
+        assert json.loads(response.get_data()) == live
+    assert client.get(f"/api/events/{event_id}").headers["X-Snapshot-Version"] == manifest["version"]
+    assert "X-Snapshot-Version" in client.get("/api/locations").headers
+
+
+def test_api_answers_live_until_the_snapshot_catches_up(app, client, register, create_event):
+    event_id = create_event().get_json()["id"]
+    publisher(app).wait()
+    before = client.get("/api/events").headers["X-Snapshot-Version"]
+
+    # Slow the publisher down so the change is seen before it runs
+    app.extensions["snapshots"].debounce = 0.2
+    client.post("/api/bookings", json={"event_id": event_id, "guest_count": 3}, headers=register(1))
+    response = client.get("/api/events")
+    assert "X-Snapshot-Version" not in response.headers
+    assert response.get_json()[0]["spots_left"] == 7
+
+    publisher(app).wait()
+    response = client.get("/api/events")
+    assert response.headers["X-Snapshot-Version"] != before
+    assert json.loads(response.get_data())[0]["spots_left"] == 7
+
+
+def test_unchanged_files_are_linked_and_old_versions_pruned(app, client, create_event):
+    create_event()
+    snapshots = publisher(app)
+    snapshots.wait()
+    with app.app_context():
+        first = snapshots.publish()
+        assert snapshots.publish() == first  # nothing changed
+    create_event(days=2, title="Second")
+    snapshots.wait()
+    directory = app.config["SNAPSHOT_DIR"]
+    second = os.readlink(os.path.join(directory, "current"))
+    assert second != first
+    assert os.path.samefile(os.path.join(directory, first, "categories.json"),
+                            os.path.join(directory, second, "categories.json"))
+
+    for days in (3, 4, 5):
+        create_event(days=days)
+        snapshots.wait()
+    versions = [name for name in os.listdir(directory) if name[0].isdigit()]
+    assert len(versions) == app.config["SNAPSHOT_KEEP"] + 1
+
+
+def test_stale_snapshots_are_not_served(app, client, create_event):
+    create_event()
+    publisher(app).wait()
+    snapshots = app.extensions["snapshots"]
+    snapshots.max_age = 0
+    assert "X-Snapshot-Version" not in client.get("/api/events").headers
+    # ... and a new one is on its way
+    snapshots.wait()
+
+
+def test_publish_command(app):
+    result = app.test_cli_runner().invoke(args=["publish-snapshots"])
+    assert result.exit_code == 0, result.output
+    assert os.path.exists(os.path.join(app.config["SNAPSHOT_DIR"], "current", "events.json"))
@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# Configuration
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Total import time budget for building the core API, in microseconds
+IMPORT_BUDGET_US = int(os.getenv("API_IMPORT_BUDGET_US", "1500000"))
+# Only needed by the receipt/confirmation/attendance endpoints
+LAZY_MODULES = ("delapre.documents", "fpdf", "qrcode", "PIL")
+
+STARTUP_SNIPPET = (
+    "from delapre import create_app; "
+    "create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SEED_STAFF_USER': False})"
+)
+
+
+def import_profile(snippet):
+    """Run `snippet` in a fresh interpreter under -X importtime.
+
+    Returns (returncode, {module_name: cumulative_us}, top_level_total_us).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", snippet],
+        cwd=API_DIR,
+        capture_output=True,
+        text=True,
+    )
+    timings = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        cumulative = int(parts[1].strip())
+        name = parts[2][1:]
+        if not name.startswith(" "):
+            total += cumulative
+        timings[name.strip()] = cumulative
+    return result.returncode, timings, total
+
+
+class TestStartupTime(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.returncode, cls.timings, cls.total = import_profile(STARTUP_SNIPPET)
+
+    def test_app_builds(self):
+        self.assertEqual(self.returncode, 0)
+
+    def test_document_dependencies_are_lazy(self):
+        loaded = [
+            name for name in self.timings
+            if any(name == m or name.startswith(m + ".") for m in LAZY_MODULES)
+        ]
+        self.assertEqual(loaded, [], f"Imported at startup: {loaded}")
+
+    def test_import_time_budget(self):
+        print(f"\nstartup imports: {self.total / 1000:.1f} ms (budget {IMPORT_BUDGET_US / 1000:.0f} ms)")
+        self.assertLessEqual(self.total, IMPORT_BUDGET_US)
+
+
+if __name__ == "__main__":
+    unittest.main()
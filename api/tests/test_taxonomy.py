@@ -0,0 +1,65 @@
+from sqlalchemy import event as sa_event
+from sqlalchemy import text
+
+from delapre.extensions import db
+
+
+def insert_elsewhere(app, table, name):
+    """Add a row the way another worker would: unseen by this process's sessions."""
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {table} (name) VALUES (:name)"), {"name": name})
+            return conn.execute(text(f"SELECT id FROM {table} WHERE name = :name"), {"name": name}).scalar()
+
+
+def test_create_event_reads_no_taxonomy_rows_once_cached(app, client, create_event):
+    assert create_event(days=1).status_code == 201
+    assert create_event(days=2).status_code == 201
+
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement.lower())
+
+    with app.app_context():
+        engine = db.engine
+    sa_event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert create_event(days=3).status_code == 201
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", record)
+    assert not [s for s in statements if "from locations" in s or "from categories" in s]
+
+
+def test_other_workers_changes_show_up(app, client, staff_headers, create_event):
+    app.config["TAXONOMY_CHECK_SECONDS"] = 3600
+    assert client.get("/api/locations").get_json() == []
+    location_id = insert_elsewhere(app, "locations", "Garden")
+    assert client.get("/api/locations").get_json() == []
+
+    # A lookup that misses checks the tables again
+    response = create_event(location_id=location_id)
+    assert response.status_code == 201
+    assert response.get_json()["location"] == "Garden"
+    assert [l["name"] for l in client.get("/api/locations").get_json()] == ["Garden"]
+
+    app.config["TAXONOMY_CHECK_SECONDS"] = 0
+    app.extensions.pop("taxonomy")
+    insert_elsewhere(app, "categories", "Talks")
+    assert [c["name"] for c in client.get("/api/categories").get_json()] == ["Talks"]
+
+
+def test_update_event_location_and_category(client, staff_headers, create_event):
+    created = create_event().get_json()
+    event_id = created["id"]
+    response = client.put(f"/api/events/{event_id}", json={"location": "garden room"}, headers=staff_headers)
+    assert response.status_code == 200
+    moved = response.get_json()
+    assert moved["location"] == "garden room" and moved["location_id"] != created["location_id"]
+
+    response = client.put(f"/api/events/{event_id}", json={"location": "Main Hall"}, headers=staff_headers)
+    assert response.get_json()["location"] == "Main Hall"
+    assert client.put(f"/api/events/{event_id}", json={"location": " "}, headers=staff_headers).status_code == 400
+    assert client.put(f"/api/events/{event_id}", json={"location_id": 999}, headers=staff_headers).status_code == 400
+    assert client.put(f"/api/events/{event_id}", json={"category_id": 999}, headers=staff_headers).status_code == 400
+    assert client.get(f"/api/events/{event_id}").get_json()["location"] == "Main Hall"
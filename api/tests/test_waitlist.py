@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from delapre import create_app
+from delapre.extensions import db
+from delapre.models import Notification, SeatHold
+
+STAFF_EMAIL = "staff@example.com"
+STAFF_PASSWORD = "password"
+
+
+class TestWaitlist(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            "SQLALCHEMY_DATABASE_URI": "sqlite://", "TESTING": True, "NOTIFICATIONS_DIR": self.tmp.name
+        })
+        self.client = self.app.test_client()
+        response = self.client.post("/api/auth/login", json={
+            "email": STAFF_EMAIL,
+            "password": STAFF_PASSWORD
+        })
+        self.headers = {"Authorization": f"Bearer {response.get_json()['token']}"}
+        starts_at = datetime.now() + timedelta(days=3)
+        response = self.client.post("/api/events", json={
+            "title": "Garden Tour",
+            "location": "Main Hall",
+            "starts_at": starts_at.isoformat(),
+            "ends_at": (starts_at + timedelta(hours=1)).isoformat(),
+            "capacity": 3,
+        }, headers=self.headers)
+        self.event_id = response.get_json()["id"]
+        response = self.client.post(
+            "/api/bookings", json={"event_id": self.event_id, "guest_count": 3}, headers=self.headers
+        )
+        self.booking_id = response.get_json()["id"]
+        self.users = [self.register(n) for n in range(3)]
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all(bind_key=None)
+        self.tmp.cleanup()
+
+    def register(self, n):
+        response = self.client.post("/api/auth/register", json={
+            "email": f"user{n}@example.com", "password": "pw", "first_name": "U", "last_name": str(n)
+        })
+        return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+    def wait(self, headers, guest_count):
+        return self.client.post(
+            f"/api/events/{self.event_id}/waitlist", json={"guest_count": guest_count}, headers=headers
+        )
+
+    def my_bookings(self, headers):
+        return self.client.get("/api/bookings", headers=headers).get_json()
+
+    def test_only_full_events_have_a_waitlist(self):
+        self.client.delete(f"/api/bookings/{self.booking_id}", headers=self.headers)
+        self.assertEqual(self.wait(self.users[0], 1).status_code, 409)
+
+    def test_cancellation_promotes_in_join_order(self):
+        self.assertEqual(self.wait(self.users[0], 2).get_json()["position"], 1)
+        self.assertEqual(self.wait(self.users[1], 3).get_json()["position"], 2)
+        self.assertEqual(self.wait(self.users[2], 1).get_json()["position"], 3)
+        self.assertEqual(self.wait(self.users[2], 1).status_code, 409)
+
+        response = self.client.delete(f"/api/bookings/{self.booking_id}", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        # The party of three does not fit in the freed seats; the one behind it does
+        self.assertEqual([b["guest_count"] for b in self.my_bookings(self.users[0])], [2])
+        self.assertEqual(self.my_bookings(self.users[1]), [])
+        self.assertEqual([b["guest_count"] for b in self.my_bookings(self.users[2])], [1])
+        waiting = self.client.get("/api/waitlist", headers=self.users[1]).get_json()
+        self.assertEqual([(e["guest_count"], e["position"]) for e in waiting], [(3, 1)])
+
+        with self.app.app_context():
+            self.assertEqual(Notification.query.filter_by(sent_at=None).count(), 2)
+        result = self.app.test_cli_runner().invoke(args=["send-notifications"])
+        self.assertIn("Sent 2 notification(s).", result.output)
+        with open(os.path.join(self.tmp.name, sorted(os.listdir(self.tmp.name))[0]), encoding="utf-8") as f:
+            self.assertIn("To: user0@example.com", f.read())
+
+    def test_capacity_increase_promotes(self):
+        self.wait(self.users[0], 2)
+        self.wait(self.users[1], 2)
+        response = self.client.put(f"/api/events/{self.event_id}", json={"capacity": 6}, headers=self.headers)
+        self.assertEqual(response.get_json()["spots_left"], 1)
+        self.assertEqual(len(self.my_bookings(self.users[0])), 1)
+        self.assertEqual(self.client.get(
+            f"/api/staff/events/{self.event_id}/waitlist", headers=self.headers
+        ).get_json()[0]["guest_count"], 2)
+
+    def test_released_and_expired_holds_promote(self):
+        self.client.delete(f"/api/bookings/{self.booking_id}", headers=self.headers)
+        holds = [self.client.post("/api/holds", json={"event_id": self.event_id}).get_json()["token"] for _ in range(3)]
+        self.wait(self.users[0], 1)
+        self.wait(self.users[1], 1)
+
+        self.assertEqual(self.client.delete(f"/api/holds/{holds[0]}").status_code, 204)
+        self.assertEqual(len(self.my_bookings(self.users[0])), 1)
+
+        with self.app.app_context():
+            SeatHold.query.filter_by(token=holds[1]).update({SeatHold.expires_at: datetime.utcnow()})
+            db.session.commit()
+        result = self.app.test_cli_runner().invoke(args=["sweep-holds"])
+        self.assertIn("Released 1 expired seat hold(s).", result.output)
+        self.assertEqual(len(self.my_bookings(self.users[1])), 1)
+
+    def test_guest_waitlist_and_leaving(self):
+        response = self.client.post(f"/api/events/{self.event_id}/waitlist/guest", json={
+            "email": "Guest@Example.com", "name": "Guest"
+        })
+        self.assertEqual(response.status_code, 201)
+        entry_id = self.wait(self.users[0], 1).get_json()["id"]
+        response = self.client.delete(f"/api/waitlist/{entry_id}", headers=self.users[0])
+        self.assertEqual(response.get_json()["status"], "left")
+
+        self.client.put(f"/api/events/{self.event_id}", json={"capacity": 4}, headers=self.headers)
+        bookings = self.client.get("/api/staff/bookings", headers=self.headers).get_json()
+        self.assertEqual(
+            sorted(b["guest_email"] or "" for b in bookings), ["", "guest@example.com"]
+        )
+        self.assertEqual(self.my_bookings(self.users[0]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,7 @@ CREATE TABLE IF NOT EXISTS users (
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   is_staff BOOLEAN,
+  calendar_feed_version INT NOT NULL DEFAULT 0,
   PRIMARY KEY (id),
   UNIQUE KEY uk_users_email (email)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -45,29 +46,180 @@ CREATE TABLE IF NOT EXISTS events (
   category_id BIGINT UNSIGNED NULL,
   created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  version INT UNSIGNED NOT NULL DEFAULT 1,
   PRIMARY KEY (id),
   KEY idx_events_starts_at (starts_at),
+  KEY ix_events_location_starts_ends (location_id, starts_at, ends_at),
   CONSTRAINT fk_events_category FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE SET NULL,
   CONSTRAINT fk_events_location FOREIGN KEY (location_id) REFERENCES locations (id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 CREATE TABLE IF NOT EXISTS bookings (
   id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
-  user_id BIGINT UNSIGNED NOT NULL,
+  user_id BIGINT UNSIGNED NULL,
   event_id BIGINT UNSIGNED NOT NULL,
   status ENUM('confirmed','cancelled') NOT NULL DEFAULT 'confirmed',
   guest_count INT UNSIGNED NOT NULL DEFAULT 1,
   guest_names TEXT NULL,
+  guest_email VARCHAR(255) NULL,
+  guest_name VARCHAR(255) NULL,
+  guest_phone VARCHAR(50) NULL,
+  confirmation_code VARCHAR(10) NULL,
   booked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
   cancelled_at TIMESTAMP NULL DEFAULT NULL,
+  checked_in TINYINT(1) NOT NULL DEFAULT 0,
+  checked_in_at DATETIME NULL,
   PRIMARY KEY (id),
   UNIQUE KEY uk_bookings_user_event (user_id, event_id),
+  UNIQUE KEY uk_bookings_confirmation_code (confirmation_code),
   KEY idx_bookings_user (user_id),
   KEY idx_bookings_event (event_id),
+  KEY ix_bookings_event_status_guests (event_id, status, guest_count, checked_in),
+  KEY ix_bookings_user_event_status (user_id, event_id, status),
+  KEY ix_bookings_event_email_status (event_id, guest_email, status),
   CONSTRAINT fk_bookings_user FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
   CONSTRAINT fk_bookings_event FOREIGN KEY (event_id) REFERENCES events (id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
+CREATE TABLE IF NOT EXISTS seat_holds (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  token VARCHAR(32) NOT NULL,
+  event_id BIGINT UNSIGNED NOT NULL,
+  user_id BIGINT UNSIGNED NULL,
+  client_address VARCHAR(45) NULL,
+  guest_count INT NOT NULL DEFAULT 1,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  expires_at DATETIME NOT NULL,
+  PRIMARY KEY (id),
+  UNIQUE KEY uk_seat_holds_token (token),
+  KEY ix_seat_holds_event_expires (event_id, expires_at),
+  KEY ix_seat_holds_expires_at (expires_at),
+  CONSTRAINT fk_seat_holds_event FOREIGN KEY (event_id) REFERENCES events (id) ON DELETE CASCADE,
+  CONSTRAINT fk_seat_holds_user FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS waitlist_entries (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  event_id BIGINT UNSIGNED NOT NULL,
+  user_id BIGINT UNSIGNED NULL,
+  guest_email VARCHAR(255) NULL,
+  guest_name VARCHAR(255) NULL,
+  guest_phone VARCHAR(50) NULL,
+  guest_count INT NOT NULL DEFAULT 1,
+  guest_names TEXT NULL,
+  status VARCHAR(20) NOT NULL DEFAULT 'waiting',
+  created_at DATETIME NOT NULL,
+  promoted_at DATETIME NULL,
+  booking_id BIGINT UNSIGNED NULL,
+  PRIMARY KEY (id),
+  KEY ix_waitlist_event_status_joined (event_id, status, created_at),
+  CONSTRAINT fk_waitlist_event FOREIGN KEY (event_id) REFERENCES events (id) ON DELETE CASCADE,
+  CONSTRAINT fk_waitlist_user FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+  CONSTRAINT fk_waitlist_booking FOREIGN KEY (booking_id) REFERENCES bookings (id) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS notifications (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  kind VARCHAR(50) NOT NULL,
+  recipient VARCHAR(255) NOT NULL,
+  subject VARCHAR(255) NOT NULL,
+  body TEXT NOT NULL,
+  booking_id BIGINT UNSIGNED NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  sent_at DATETIME NULL,
+  PRIMARY KEY (id),
+  KEY ix_notifications_sent_at (sent_at),
+  CONSTRAINT fk_notifications_booking FOREIGN KEY (booking_id) REFERENCES bookings (id) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS admission_queues (
+  event_id BIGINT UNSIGNED NOT NULL,
+  rate_per_second DOUBLE NOT NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (event_id),
+  CONSTRAINT fk_admission_queues_event FOREIGN KEY (event_id) REFERENCES events (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS admission_token_uses (
+  jti VARCHAR(36) NOT NULL,
+  event_id BIGINT UNSIGNED NOT NULL,
+  used_at DATETIME NOT NULL,
+  expires_at DATETIME NOT NULL,
+  PRIMARY KEY (jti),
+  KEY ix_admission_token_uses_expires_at (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  scope VARCHAR(255) NOT NULL,
+  `key` VARCHAR(255) NOT NULL,
+  request_hash CHAR(64) NOT NULL,
+  status_code INT NULL,
+  response_body MEDIUMTEXT NULL,
+  created_at DATETIME NOT NULL,
+  expires_at DATETIME NOT NULL,
+  PRIMARY KEY (id),
+  UNIQUE KEY uk_idempotency_scope_key (scope, `key`),
+  KEY ix_idempotency_keys_expires_at (expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS confirmation_code_blocks (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  created_at DATETIME NOT NULL,
+  PRIMARY KEY (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS booking_guests (
+  id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+  booking_id BIGINT UNSIGNED NOT NULL,
+  position INT NOT NULL,
+  name VARCHAR(255) NOT NULL DEFAULT '',
+  ticket_type VARCHAR(50) NULL,
+  checked_in_at DATETIME NULL,
+  PRIMARY KEY (id),
+  UNIQUE KEY uk_booking_guests_position (booking_id, position),
+  KEY ix_booking_guests_name (name),
+  KEY ix_booking_guests_ticket_type (ticket_type),
+  CONSTRAINT fk_booking_guests_booking FOREIGN KEY (booking_id) REFERENCES bookings (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Bookings for long-finished events, moved here by `flask archive`.
+-- Ids are kept from `bookings`, so there is no AUTO_INCREMENT.
+CREATE TABLE IF NOT EXISTS bookings_archive (
+  id BIGINT UNSIGNED NOT NULL,
+  user_id BIGINT UNSIGNED NULL,
+  event_id BIGINT UNSIGNED NOT NULL,
+  status VARCHAR(20) NOT NULL,
+  guest_count INT NOT NULL,
+  guest_names TEXT NULL,
+  guest_email VARCHAR(255) NULL,
+  guest_name VARCHAR(255) NULL,
+  guest_phone VARCHAR(50) NULL,
+  confirmation_code VARCHAR(10) NULL,
+  booked_at DATETIME NULL,
+  cancelled_at DATETIME NULL,
+  checked_in TINYINT(1) NOT NULL DEFAULT 0,
+  checked_in_at DATETIME NULL,
+  archived_at DATETIME NOT NULL,
+  PRIMARY KEY (id),
+  KEY ix_bookings_archive_user_id (user_id),
+  KEY ix_bookings_archive_event_id (event_id),
+  CONSTRAINT fk_bookings_archive_user FOREIGN KEY (user_id) REFERENCES users (id),
+  CONSTRAINT fk_bookings_archive_event FOREIGN KEY (event_id) REFERENCES events (id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS booking_guests_archive (
+  id BIGINT UNSIGNED NOT NULL,
+  booking_id BIGINT UNSIGNED NOT NULL,
+  position INT NOT NULL,
+  name VARCHAR(255) NOT NULL DEFAULT '',
+  ticket_type VARCHAR(50) NULL,
+  checked_in_at DATETIME NULL,
+  PRIMARY KEY (id),
+  KEY ix_booking_guests_archive_booking_id (booking_id),
+  CONSTRAINT fk_booking_guests_archive_booking FOREIGN KEY (booking_id) REFERENCES bookings_archive (id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
 INSERT INTO categories (id, name) VALUES
   (1, 'tours'),
   (2, 'talks'),
@@ -2,6 +2,7 @@ import "bootstrap/dist/css/bootstrap.min.css";
 import "bootstrap/dist/js/bootstrap.bundle.min.js";
 import "./style.css";
 import { router } from "./router.js";
+import { apiFetch } from "./utils/api.js";
 import { state, setAuthState, saveCart } from "./state.js";
 import { renderHomeHTML, initHomePage, showHomePage, hideHomePage } from "./pages/home.js";
 import { renderEventsHTML, initEventsPage, showEventsPage, hideEventsPage, loadEvents } from "./pages/events.js";
@@ -219,7 +220,26 @@ initStaffPage();
 initPreferencesPage();
 
 // --- Global Event Listeners ---
-elements.eventsGrid.addEventListener("click", (event) => {
+elements.eventsGrid.addEventListener("click", async (event) => {
+  const waitlistButton = event.target.closest(".waitlist-btn");
+  if (waitlistButton) {
+    if (!state.token) {
+      router.navigateTo("auth");
+      showAuthView("login");
+      return;
+    }
+    try {
+      const entry = await apiFetch(`/api/events/${waitlistButton.dataset.eventId}/waitlist`, {
+        method: "POST",
+        body: JSON.stringify({ guest_count: 1 }),
+      });
+      window.alert(`You're number ${entry.position} on the waitlist. We'll book you in and email you if a place opens up.`);
+    } catch (error) {
+      window.alert(error.message);
+    }
+    return;
+  }
+
   const button = event.target.closest(".book-btn");
   if (!button) return;
   console.log("Book button clicked for event:", button.dataset.eventId);
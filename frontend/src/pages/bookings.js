@@ -2,6 +2,7 @@ import { state } from "../state.js";
 import { formatDate, formatTime } from "../utils/formatters.js";
 import { apiFetch } from "../utils/api.js";
 import { loadEvents } from "./events.js";
+import { isLive } from "../utils/live.js";
 import QRCode from "qrcode";
 
 export const renderBookingsHTML = () => `
@@ -13,6 +14,7 @@ export const renderBookingsHTML = () => `
       </div>
       <div class="d-flex gap-2 flex-wrap">
         <button class="btn btn-outline-dark btn-sm" id="viewHistoryBtn">View history</button>
+        <button class="btn btn-outline-dark btn-sm" id="calendarFeedBtn">Add to calendar</button>
         <button class="btn btn-dark btn-sm" id="refreshBookings">Refresh bookings</button>
       </div>
     </div>
@@ -27,6 +29,7 @@ export const initBookingsPage = () => {
   const bookingsList = document.querySelector("#bookingsList");
   const viewHistoryBtn = document.querySelector("#viewHistoryBtn");
   const refreshBookings = document.querySelector("#refreshBookings");
+  const calendarFeedBtn = document.querySelector("#calendarFeedBtn");
 
   bookingsList?.addEventListener("click", (event) => {
     const cancelBtn = event.target.closest(".cancel-btn");
@@ -40,6 +43,7 @@ export const initBookingsPage = () => {
 
   viewHistoryBtn?.addEventListener("click", loadHistory);
   refreshBookings?.addEventListener("click", loadBookings);
+  calendarFeedBtn?.addEventListener("click", subscribeToCalendar);
 };
 
 const handleGeneratePDF = async (bookingId, type) => {
@@ -213,7 +217,23 @@ const handleCancel = async (bookingId) => {
   try {
     await apiFetch(`/api/bookings/${bookingId}`, { method: "DELETE" });
     loadBookings();
-    loadEvents();
+    if (!isLive()) loadEvents();
+  } catch (error) {
+    if (bookingStatus) bookingStatus.textContent = error.message;
+  }
+};
+
+// Hands the personal .ics feed to the default calendar app, which keeps it in sync
+const subscribeToCalendar = async () => {
+  if (!state.token) return;
+
+  const bookingStatus = document.querySelector("#bookingStatus");
+  if (bookingStatus) bookingStatus.textContent = "";
+
+  try {
+    const feed = await apiFetch("/api/calendar/feed");
+    window.location.href = feed.webcal_url;
+    if (bookingStatus) bookingStatus.textContent = `Calendar feed: ${feed.url}`;
   } catch (error) {
     if (bookingStatus) bookingStatus.textContent = error.message;
   }
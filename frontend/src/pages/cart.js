@@ -5,6 +5,7 @@ import { apiFetch } from "../utils/api.js";
 import { router } from "../router.js";
 import { loadBookings } from "./bookings.js";
 import { loadEvents } from "./events.js";
+import { isLive } from "../utils/live.js";
 
 export const renderCartHTML = () => `
   <section id="cartSection" class="cart-page d-none">
@@ -46,7 +47,7 @@ export const initCartPage = () => {
   const stripePayBtn = document.querySelector("#stripePayBtn");
   const checkoutBtn = document.querySelector("#checkoutBtn");
 
-  cartList?.addEventListener("change", (event) => {
+  cartList?.addEventListener("change", async (event) => {
     const cartItem = event.target.closest(".cart-item");
     if (!cartItem) return;
 
@@ -55,7 +56,15 @@ export const initCartPage = () => {
     if (!item) return;
 
     if (event.target.hasAttribute("data-cart-guests")) {
+      const previousCount = item.guest_count;
       item.guest_count = Number(event.target.value);
+      try {
+        await holdSeats(item);
+      } catch (error) {
+        item.guest_count = previousCount;
+        const cartStatus = document.querySelector("#cartStatus");
+        if (cartStatus) cartStatus.textContent = error.message;
+      }
     }
     if (event.target.hasAttribute("data-cart-names")) {
       item.guest_names = event.target.value
@@ -113,6 +122,7 @@ export const initCartPage = () => {
 
     if (event.target.hasAttribute("data-cart-remove")) {
       const eventId = Number(cartItem.dataset.cartId);
+      state.cart.filter((item) => item.event.id === eventId).forEach(releaseHold);
       state.cart = state.cart.filter((item) => item.event.id !== eventId);
       saveCart();
       renderCart();
@@ -120,6 +130,7 @@ export const initCartPage = () => {
   });
 
   clearCart?.addEventListener("click", () => {
+    state.cart.forEach(releaseHold);
     state.cart = [];
     saveCart();
     renderCart();
@@ -292,7 +303,66 @@ export const renderCart = () => {
   }
 };
 
-export const addToCart = (eventId) => {
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// High-demand events sit behind a waiting room: join the queue, wait for
+// the admission time on the token, then carry the token on every request.
+const waitForAdmission = async (item) => {
+  const cartStatus = document.querySelector("#cartStatus");
+  let ticket = await apiFetch(`/api/events/${item.event.id}/queue`, { method: "POST" });
+  while (!ticket.admitted) {
+    if (cartStatus) {
+      cartStatus.textContent = `You're in the queue for ${item.event.title} (about ${ticket.wait_seconds}s)...`;
+    }
+    await sleep(Math.min(ticket.wait_seconds, 5) * 1000);
+    ticket = await apiFetch(`/api/queue/status?token=${encodeURIComponent(ticket.token)}`);
+  }
+  if (cartStatus) cartStatus.textContent = "";
+  item.queue_token = ticket.token;
+};
+
+// Seats are held on the server while an event sits in the cart, so the
+// availability shown here is still there at checkout.
+const holdSeats = async (item) => {
+  try {
+    return await placeHold(item);
+  } catch (error) {
+    if (error.status !== 428) throw error;
+    await waitForAdmission(item);
+    return placeHold(item);
+  }
+};
+
+const placeHold = async (item) => {
+  const body = JSON.stringify({
+    event_id: item.event.id,
+    guest_count: item.guest_count,
+    queue_token: item.queue_token,
+  });
+  let hold = null;
+  if (item.hold_token) {
+    try {
+      hold = await apiFetch(`/api/holds/${item.hold_token}`, { method: "PATCH", body });
+    } catch (error) {
+      // The hold expired and was swept; place a new one below
+      if (error.message !== "Hold not found") throw error;
+    }
+  }
+  if (!hold) {
+    hold = await apiFetch("/api/holds", { method: "POST", body });
+    item.hold_token = hold.token;
+  }
+  // spots_left excludes our own hold; add it back for the cart's limits
+  item.event = { ...item.event, spots_left: hold.spots_left + hold.guest_count };
+  return hold;
+};
+
+const releaseHold = (item) => {
+  if (!item.hold_token) return;
+  apiFetch(`/api/holds/${item.hold_token}`, { method: "DELETE" }).catch(() => {});
+};
+
+export const addToCart = async (eventId) => {
   const event = state.events.find((item) => item.id === Number(eventId));
   if (!event) return;
   const available = event.spots_left ?? event.capacity ?? 0;
@@ -302,23 +372,64 @@ export const addToCart = (eventId) => {
   }
   const maxGuests = available;
   const existing = state.cart.find((item) => item.event.id === event.id);
-
+  const item = existing || {
+    event,
+    guest_count: 1,
+    guest_names: [],
+    maxGuests: Math.max(1, maxGuests),
+  };
+  const previousCount = item.guest_count;
   if (existing) {
-    existing.guest_count = Math.min(existing.guest_count + 1, maxGuests);
-  } else {
-    state.cart.push({
-      event,
-      guest_count: 1,
-      guest_names: [],
-      maxGuests: Math.max(1, maxGuests),
-    });
+    item.guest_count = Math.min(item.guest_count + 1, maxGuests);
+  }
+
+  try {
+    await holdSeats(item);
+  } catch (error) {
+    item.guest_count = previousCount;
+    window.alert(error.message);
+    return;
   }
+  if (!existing) state.cart.push(item);
 
   saveCart();
   renderCart();
   router.navigateTo("cart");
 };
 
+const cartItemsPayload = () =>
+  state.cart.map((item) => ({
+    event_id: item.event.id,
+    guest_count: item.guest_count,
+    guest_names: item.guest_names,
+    hold_token: item.hold_token,
+    queue_token: item.queue_token,
+  }));
+
+// Kept while a checkout may not have reached the server, so a retry of the
+// same cart reuses its key and the API replays the first result
+let pendingCheckout = null;
+
+const submitCheckout = async (path, payload) => {
+  const body = JSON.stringify(payload);
+  if (!pendingCheckout || pendingCheckout.path !== path || pendingCheckout.body !== body) {
+    pendingCheckout = { path, body, key: crypto.randomUUID() };
+  }
+  try {
+    const data = await apiFetch(path, {
+      method: "POST",
+      body,
+      headers: { "Idempotency-Key": pendingCheckout.key },
+    });
+    pendingCheckout = null;
+    return data;
+  } catch (error) {
+    // Only network failures leave the outcome unknown
+    if (error.status) pendingCheckout = null;
+    throw error;
+  }
+};
+
 const checkoutCart = async () => {
   const cartStatus = document.querySelector("#cartStatus");
 
@@ -337,21 +448,13 @@ const checkoutCart = async () => {
       if (available <= 0) throw new Error(`${item.event.title} is sold out`);
       if (item.guest_count > available) throw new Error(`Not enough spaces available for ${item.event.title}`);
     }
-    for (const item of state.cart) {
-      await apiFetch("/api/bookings", {
-        method: "POST",
-        body: JSON.stringify({
-          event_id: item.event.id,
-          guest_count: item.guest_count,
-          guest_names: item.guest_names,
-        }),
-      });
-    }
+    // One request for the whole cart: either every event is booked or none are
+    await submitCheckout("/api/bookings/batch", { items: cartItemsPayload() });
     state.cart = [];
     saveCart();
     renderCart();
     loadBookings();
-    loadEvents();
+    if (!isLive()) loadEvents();
 
     // Show confirmation modal
     const modalEl = document.getElementById('confirmationModal');
@@ -406,23 +509,11 @@ const checkoutAsGuest = async () => {
       if (available <= 0) throw new Error(`${item.event.title} is sold out`);
       if (item.guest_count > available) throw new Error(`Not enough spaces available for ${item.event.title}`);
     }
-    for (const item of state.cart) {
-      await apiFetch("/api/bookings/guest", {
-        method: "POST",
-        body: JSON.stringify({
-          event_id: item.event.id,
-          guest_count: item.guest_count,
-          guest_names: item.guest_names,
-          email,
-          name,
-          phone,
-        }),
-      });
-    }
+    await submitCheckout("/api/bookings/guest/batch", { email, name, phone, items: cartItemsPayload() });
     state.cart = [];
     saveCart();
     renderCart();
-    loadEvents();
+    if (!isLive()) loadEvents();
 
     // Show confirmation modal
     const modalEl = document.getElementById('confirmationModal');
@@ -1,5 +1,6 @@
 import { state } from "../state.js";
 import { formatDate, formatTime } from "../utils/formatters.js";
+import { onLiveCounts } from "../utils/live.js";
 
 const apiBaseUrl = import.meta.env.VITE_API_BASE_URL || "http://localhost:8080";
 
@@ -47,6 +48,22 @@ export const initEventsPage = () => {
     currentSearch = e.target.value;
     renderEvents(state.events);
   });
+
+  // Availability changes are pushed, so the listing is not re-fetched
+  onLiveCounts((updates) => {
+    if (document.querySelector("#eventsSection")?.classList.contains("d-none")) return;
+    if (!updates) {
+      loadEvents();
+      return;
+    }
+    const spotsLeft = new Map(
+      updates.filter((update) => update.spots_left !== undefined).map((update) => [update.event_id, update.spots_left])
+    );
+    if (!state.events.some((event) => spotsLeft.has(event.id))) return;
+    renderEvents(state.events.map((event) =>
+      spotsLeft.has(event.id) ? { ...event, spots_left: spotsLeft.get(event.id) } : event
+    ));
+  });
 };
 
 export const showEventsPage = () => {
@@ -169,8 +186,11 @@ const renderEvents = (events) => {
               <span>${(event.spots_left !== undefined ? event.spots_left : event.capacity)} spaces left</span>
               ${state.user && state.user.is_staff
           ? `<button class="btn btn-outline-dark btn-sm edit-event-btn" data-event-id="${event.id}">Edit Event</button>`
-          : `<button class="btn btn-dark btn-sm book-btn px-4" data-event-id="${event.id}" ${(event.spots_left === 0) ? "disabled" : ""
-          }>
+          : event.spots_left === 0
+            ? `<button class="btn btn-outline-dark btn-sm waitlist-btn px-4" data-event-id="${event.id}">
+                    Join waitlist
+                   </button>`
+            : `<button class="btn btn-dark btn-sm book-btn px-4" data-event-id="${event.id}">
                     Add to cart
                    </button>`
         }
@@ -1,5 +1,6 @@
 import { state } from "../state.js";
 import { Html5Qrcode } from "html5-qrcode";
+import { onStaffLiveCounts } from "../utils/live.js";
 
 const apiBaseUrl = import.meta.env.VITE_API_BASE_URL || "http://localhost:8080";
 
@@ -277,6 +278,7 @@ export const initStaffPage = () => {
     dashboardView?.classList.add("d-none");
     analyticsView?.classList.remove("d-none");
     loadUpcomingEvents();
+    watchAttendance();
   });
 
   document.querySelectorAll(".back-to-dashboard").forEach(btn => {
@@ -286,6 +288,7 @@ export const initStaffPage = () => {
       analyticsView?.classList.add("d-none");
       dashboardView?.classList.remove("d-none");
       stopScanner();
+      unwatchAttendance();
     });
   });
 
@@ -515,6 +518,7 @@ export const editEvent = async (eventId) => {
 
 export const showStaffPage = () => {
   document.querySelector("#staffSection")?.classList.remove("d-none");
+  unwatchAttendance();
   // Reset view to dashboard
   document.querySelector("#staffDashboardView")?.classList.remove("d-none");
   document.querySelector("#staffAddEventView")?.classList.add("d-none");
@@ -537,6 +541,7 @@ export const showStaffPage = () => {
 
 export const hideStaffPage = () => {
   document.querySelector("#staffSection")?.classList.add("d-none");
+  unwatchAttendance();
 };
 
 const loadCategories = async () => {
@@ -639,6 +644,31 @@ const loadAllBookings = async () => {
   }
 };
 
+// Booked and checked-in counts arrive over the staff live stream instead
+// of polling, while the analytics table is open
+let stopAttendanceUpdates = null;
+
+const watchAttendance = () => {
+  stopAttendanceUpdates?.();
+  stopAttendanceUpdates = onStaffLiveCounts((updates) => {
+    if (!updates) {
+      loadUpcomingEvents();
+      return;
+    }
+    updates.forEach((update) => {
+      const booked = document.querySelector(`[data-booked-for="${update.event_id}"]`);
+      const checkedIn = document.querySelector(`[data-checked-in-for="${update.event_id}"]`);
+      if (booked && update.booked_count !== undefined) booked.textContent = update.booked_count;
+      if (checkedIn && update.checked_in_count !== undefined) checkedIn.textContent = update.checked_in_count;
+    });
+  });
+};
+
+const unwatchAttendance = () => {
+  stopAttendanceUpdates?.();
+  stopAttendanceUpdates = null;
+};
+
 const loadUpcomingEvents = async () => {
   const container = document.querySelector("#upcomingEventsList");
   if (!container) return;
@@ -670,8 +700,8 @@ const loadUpcomingEvents = async () => {
           </td>
           <td>${new Date(event.starts_at).toLocaleString()}</td>
           <td>${event.location || ""}</td>
-          <td>${booked}</td>
-          <td>${checkedIn}</td>
+          <td data-booked-for="${event.id}">${booked}</td>
+          <td data-checked-in-for="${event.id}">${checkedIn}</td>
           <td>${event.capacity ?? ""}</td>
           <td>
             <button class="btn btn-outline-dark btn-sm report-btn" data-event-id="${event.id}">Attendance CSV</button>
@@ -0,0 +1,89 @@
+import { apiFetch } from "./api.js";
+
+const apiBaseUrl = import.meta.env.VITE_API_BASE_URL || "http://localhost:8080";
+
+// One shared stream of count changes per endpoint. Listeners get an array
+// of updates, or null when the stream fell too far behind and the listing
+// should be reloaded. `streamToken` fetches a token for `?token=`, for
+// streams that need signing in (EventSource cannot send headers).
+const createStream = (path, streamToken = null) => {
+  const listeners = new Set();
+  let source = null;
+  let connecting = false;
+  let lastEventId = "";
+  let retryDelay = 3000;
+
+  const notify = (updates) => listeners.forEach((listener) => listener(updates));
+
+  const reconnectLater = () => {
+    source?.close();
+    source = null;
+    if (!listeners.size) return;
+    setTimeout(connect, retryDelay);
+    retryDelay = Math.min(retryDelay * 2, 60000);
+  };
+
+  const connect = async () => {
+    if (source || connecting || !listeners.size) return;
+    connecting = true;
+    const params = new URLSearchParams();
+    if (lastEventId) params.set("last_event_id", lastEventId);
+    try {
+      if (streamToken) params.set("token", await streamToken());
+    } catch (err) {
+      connecting = false;
+      // Not signed in as staff (any more): wait for the next subscriber
+      if (err.status !== 401 && err.status !== 403) reconnectLater();
+      return;
+    }
+    connecting = false;
+    if (!listeners.size) return;
+    source = new EventSource(`${apiBaseUrl}${path}?${params}`);
+    source.addEventListener("open", () => {
+      retryDelay = 3000;
+    });
+    source.addEventListener("counts", (message) => {
+      lastEventId = message.lastEventId || lastEventId;
+      notify(JSON.parse(message.data));
+    });
+    source.addEventListener("reset", (message) => {
+      lastEventId = message.lastEventId || lastEventId;
+      notify(null);
+    });
+    // The browser reconnects dropped streams by itself but gives up on an
+    // error status (an expired token, a worker with no streams to spare)
+    source.addEventListener("error", () => {
+      if (source?.readyState === EventSource.CLOSED) reconnectLater();
+    });
+  };
+
+  const subscribe = (listener) => {
+    listeners.add(listener);
+    if (typeof EventSource !== "undefined") connect();
+    return () => {
+      listeners.delete(listener);
+      if (!listeners.size && source) {
+        source.close();
+        source = null;
+      }
+    };
+  };
+
+  const isOpen = () => source !== null && source.readyState === EventSource.OPEN;
+
+  return { subscribe, isOpen };
+};
+
+const publicCounts = createStream("/api/events/live");
+const staffCounts = createStream("/api/staff/events/live", async () => {
+  const { token } = await apiFetch("/api/staff/events/live/token", { method: "POST" });
+  return token;
+});
+
+// spots_left changes, for everyone
+export const onLiveCounts = publicCounts.subscribe;
+
+export const isLive = publicCounts.isOpen;
+
+// spots_left, booked_count and checked_in_count changes, for staff
+export const onStaffLiveCounts = staffCounts.subscribe;